@@ -0,0 +1,153 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from domain import SearchResult
+from infrastructure.chunking import count_tokens
+
+# Shortest word overlap treated as a repeated span rather than coincidence
+MIN_OVERLAP_WORDS = 3
+
+
+@dataclass
+class _Passage:
+    """One or more contiguous chunks of the same source, overlaps removed"""
+    words: List[str]
+    tokens: int
+    rank: int  # best (lowest) relevance rank among its chunks
+    chunk_ids: List[str]
+    last_index: int
+
+
+@dataclass
+class BuiltContext:
+    text: str
+    tokens: int
+    chunk_ids: List[str] = field(default_factory=list)
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+
+class ContextBuilder:
+    """
+    Turns ranked search results into a prompt context within a token budget.
+
+    Chunks overlap their neighbours (the chunker repeats trailing text), so
+    adjacent chunks of the same source are merged into one passage with the
+    repeated span removed. Passages are then packed by relevance until the
+    budget is spent. Token counts come from chunk metadata (stored at
+    ingestion); only chunks ingested before that are tokenized here.
+    """
+
+    def __init__(self, token_budget: int, separator: str = "\n\n"):
+        self.token_budget = token_budget
+        self.separator = separator
+        self._separator_tokens = count_tokens(separator) if separator.strip() else 0
+
+    def build(self, results: List[SearchResult]) -> BuiltContext:
+        raw_tokens = 0
+        seen_content = set()
+        chunks: List[Tuple[int, SearchResult, int]] = []
+        for rank, result in enumerate(results):
+            tokens = self._chunk_tokens(result)
+            raw_tokens += tokens
+            if result.chunk.content in seen_content:
+                continue  # same text stored under another source
+            seen_content.add(result.chunk.content)
+            chunks.append((rank, result, tokens))
+
+        passages = self._merge(chunks)
+        packed, used_tokens = self._pack(passages)
+
+        text = self.separator.join(" ".join(passage.words) for passage in packed)
+        chunk_ids = [chunk_id for passage in packed for chunk_id in passage.chunk_ids]
+        naive_tokens = raw_tokens + self._separator_tokens * max(len(results) - 1, 0)
+        return BuiltContext(
+            text=text,
+            tokens=used_tokens,
+            chunk_ids=chunk_ids,
+            stats={
+                "tokens": used_tokens,
+                "token_budget": self.token_budget,
+                "tokens_saved": max(naive_tokens - used_tokens, 0),
+                "chunks_used": len(chunk_ids),
+                "chunks_dropped": len(results) - len(chunk_ids),
+                "passages": len(packed),
+            }
+        )
+
+    @staticmethod
+    def _chunk_tokens(result: SearchResult) -> int:
+        tokens = result.chunk.metadata.get("token_count")
+        return int(tokens) if tokens is not None else count_tokens(result.chunk.content)
+
+    def _merge(self, chunks: List[Tuple[int, SearchResult, int]]) -> List[_Passage]:
+        """Merge chunks of the same source whose chunk_index values are consecutive"""
+        by_source: Dict[str, List[Tuple[int, SearchResult, int]]] = {}
+        passages: List[_Passage] = []
+        for item in chunks:
+            index = item[1].chunk.metadata.get("chunk_index")
+            if index is None:
+                passages.append(self._passage(*item))
+            else:
+                by_source.setdefault(item[1].source, []).append(item)
+
+        for items in by_source.values():
+            items.sort(key=lambda item: int(item[1].chunk.metadata["chunk_index"]))
+            current: Optional[_Passage] = None
+            for rank, result, tokens in items:
+                index = int(result.chunk.metadata["chunk_index"])
+                if current is not None and index == current.last_index + 1:
+                    self._append(current, rank, result, tokens)
+                else:
+                    if current is not None:
+                        passages.append(current)
+                    current = self._passage(rank, result, tokens)
+            passages.append(current)
+
+        passages.sort(key=lambda passage: passage.rank)
+        return passages
+
+    @staticmethod
+    def _passage(rank: int, result: SearchResult, tokens: int) -> _Passage:
+        return _Passage(
+            words=result.chunk.content.split(),
+            tokens=tokens,
+            rank=rank,
+            chunk_ids=[result.chunk.id],
+            last_index=int(result.chunk.metadata.get("chunk_index", -1))
+        )
+
+    @staticmethod
+    def _append(passage: _Passage, rank: int, result: SearchResult, tokens: int):
+        words = result.chunk.content.split()
+        overlap = _overlap(passage.words, words)
+        passage.words.extend(words[overlap:])
+        # Scale the stored count instead of tokenizing the merged text
+        passage.tokens += round(tokens * (len(words) - overlap) / len(words)) if words else 0
+        passage.rank = min(passage.rank, rank)
+        passage.chunk_ids.append(result.chunk.id)
+        passage.last_index += 1
+
+    def _pack(self, passages: List[_Passage]) -> Tuple[List[_Passage], int]:
+        """Most relevant first; skip passages that no longer fit, trim the first if it alone is too long"""
+        packed: List[_Passage] = []
+        used = 0
+        for passage in passages:
+            cost = passage.tokens + (self._separator_tokens if packed else 0)
+            if used + cost <= self.token_budget:
+                packed.append(passage)
+                used += cost
+            elif not packed:
+                keep = max(1, int(len(passage.words) * self.token_budget / passage.tokens))
+                passage.words = passage.words[:keep]
+                passage.tokens = min(passage.tokens, self.token_budget)
+                packed.append(passage)
+                used = passage.tokens
+        return packed, used
+
+
+def _overlap(left: List[str], right: List[str]) -> int:
+    """Length of the longest suffix of left that is also a prefix of right (in words)"""
+    for size in range(min(len(left), len(right)), MIN_OVERLAP_WORDS - 1, -1):
+        if left[-size:] == right[:size]:
+            return size
+    return 0
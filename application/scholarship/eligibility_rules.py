@@ -0,0 +1,204 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from infrastructure.eligibility_criteria import CriteriaTable, ScholarshipRule, normalise_academic_level
+
+GPA_SCALE_MAX = 4.0
+
+DEFAULT_NEXT_STEPS = [
+    "Submit required documents",
+    "Complete scholarship application form",
+    "Contact financial aid office"
+]
+
+
+@dataclass
+class RuleMatch:
+    rule: ScholarshipRule
+    # eligible, conditional (criteria met, subject to documents/conditions),
+    # unverified (some criteria not checkable against the student data), ineligible
+    status: str
+    waiver_percent: Optional[int] = None
+    reasons: List[str] = field(default_factory=list)
+
+    def label(self) -> str:
+        if self.waiver_percent is not None and self.rule.gpa_bands:
+            return f"{self.rule.name} ({self.waiver_percent}% waiver)"
+        if self.rule.waiver:
+            return f"{self.rule.name} ({self.rule.waiver} waiver)"
+        return self.rule.name
+
+
+@dataclass
+class EligibilityDecision:
+    matches: List[RuleMatch]  # every checkable criterion met (some subject to documents)
+    rejected: List[RuleMatch]
+    ambiguous: List[str] = field(default_factory=list)
+    # Not ruled out, but the student data cannot settle them (no GPA/income/nationality given, ...)
+    to_verify: List[RuleMatch] = field(default_factory=list)
+
+    @property
+    def eligible(self) -> bool:
+        return bool(self.matches)
+
+    def recommended_scholarships(self) -> List[str]:
+        return [match.label() for match in self.matches]
+
+    def needs_verification(self) -> List[str]:
+        return [match.label() for match in self.to_verify]
+
+    def next_steps(self) -> List[str]:
+        steps = []
+        for match in self.matches + self.to_verify:
+            for condition in match.rule.conditions:
+                if _is_application_step(condition) and condition not in steps:
+                    steps.append(condition)
+        return steps[:5] or list(DEFAULT_NEXT_STEPS)
+
+    def analysis(self) -> str:
+        lines = []
+        if self.matches:
+            lines.append("Based on the scholarship policy, the student meets the criteria for:")
+            for match in self.matches:
+                requirements = _requirements(match.rule)
+                lines.append(f"- {match.label()}" + (f" - subject to: {'; '.join(requirements)}"
+                                                     if requirements else ""))
+        elif not self.to_verify:
+            lines.append("The student data alone does not qualify for any scholarship in the policy.")
+        if self.to_verify:
+            lines.append("May qualify, subject to verification:")
+            for match in self.to_verify:
+                to_check = _requirements(match.rule) + match.reasons
+                lines.append(f"- {match.label()} - " + ("; ".join(to_check) if to_check
+                                                         else "no criteria that the student data can be checked against"))
+        if self.rejected:
+            lines.append("Not eligible for:")
+            lines.extend(f"- {match.rule.name}: {'; '.join(match.reasons)}" for match in self.rejected)
+        if self.ambiguous:
+            lines.append("Could not be decided by the rules: " + "; ".join(self.ambiguous))
+        return "\n".join(lines)
+
+    def to_result(self) -> Dict[str, Any]:
+        return {
+            "eligible": self.eligible,
+            "analysis": self.analysis(),
+            "recommended_scholarships": self.recommended_scholarships(),
+            "needs_verification": self.needs_verification(),
+            "next_steps": self.next_steps()
+        }
+
+
+class EligibilityRuleEngine:
+    """
+    Deterministic eligibility check against the parsed criteria table.
+
+    Pure in-memory comparisons, so a check takes microseconds. Anything the
+    rules cannot decide (unknown academic level, GPA not on a 4.0 scale, no
+    schemes for the level) is reported as ambiguous for the LLM to handle.
+    Only schemes whose criteria were all checked against the student data
+    count as eligible (subject to any documents or conditions the policy
+    lists); schemes with criteria the student data has no value for go in
+    to_verify.
+    """
+
+    def __init__(self, table: CriteriaTable):
+        self.table = table
+
+    def evaluate(self, student_data: Dict[str, Any]) -> EligibilityDecision:
+        ambiguous: List[str] = []
+        gpa = _as_float(student_data.get("gpa"))
+        income = _as_float(student_data.get("income"))
+        nationality = (student_data.get("nationality") or "").strip().lower()
+        level = normalise_academic_level(student_data.get("academic_level"))
+
+        if gpa is None or not 0.0 <= gpa <= GPA_SCALE_MAX:
+            ambiguous.append(f"GPA {student_data.get('gpa')} is not on a 0-{GPA_SCALE_MAX} scale")
+        if level is None:
+            ambiguous.append(f"unrecognised academic level '{student_data.get('academic_level')}'")
+
+        rules = [rule for rule in self.table.rules
+                 if rule.academic_level is None or level is None or rule.academic_level == level]
+        if not rules:
+            ambiguous.append(f"no schemes found for {level or 'this academic level'}")
+
+        matches, to_verify, rejected = [], [], []
+        for rule in rules:
+            match = self._evaluate_rule(rule, gpa if not ambiguous else None, income, nationality)
+            {"eligible": matches, "conditional": matches, "ineligible": rejected}.get(
+                match.status, to_verify).append(match)
+
+        # Highest waiver first, then the fewest criteria/conditions left to confirm
+        matches.sort(key=lambda match: (-(match.waiver_percent or 0), len(_requirements(match.rule))))
+        to_verify.sort(key=lambda match: (len(match.reasons), len(_requirements(match.rule)),
+                                          -(match.waiver_percent or 0)))
+        return EligibilityDecision(matches=matches, rejected=rejected, ambiguous=ambiguous, to_verify=to_verify)
+
+    @staticmethod
+    def _evaluate_rule(rule: ScholarshipRule, gpa: Optional[float], income: Optional[float],
+                       nationality: str) -> RuleMatch:
+        reasons = []
+        checked = False
+        unchecked = []  # criteria the student data has no value for
+        waiver = rule.max_waiver_percent
+
+        if rule.min_gpa is not None or rule.gpa_bands:
+            if gpa is None:
+                unchecked.append("CGPA")
+            else:
+                checked = True
+                if rule.min_gpa is not None and gpa < rule.min_gpa:
+                    reasons.append(f"requires CGPA {rule.min_gpa:.2f}")
+                if rule.gpa_bands:
+                    bands = sorted(rule.gpa_bands, key=lambda band: band.low)
+                    reached = [band for band in bands if gpa >= band.low]
+                    band_reason = f"requires CGPA {bands[0].low:.2f}"
+                    if reached:
+                        waiver = reached[-1].waiver_percent
+                    elif band_reason not in reasons:
+                        reasons.append(band_reason)
+        if rule.max_income is not None:
+            if income is None:
+                unchecked.append(f"income up to {rule.max_income:,.0f}")
+            else:
+                checked = True
+                if income > rule.max_income:
+                    reasons.append(f"income above {rule.max_income:,.0f}")
+        if rule.nationalities:
+            allowed = f"open to {', '.join(rule.nationalities)} students only"
+            if not nationality:
+                unchecked.append(allowed)
+            else:
+                checked = True
+                if not _nationality_allowed(rule.nationalities, nationality):
+                    reasons.append(allowed)
+
+        if reasons:
+            return RuleMatch(rule, "ineligible", reasons=reasons)
+        if unchecked or not checked:
+            # Criteria the student data has no value for, or no parsed criteria at all
+            return RuleMatch(rule, "unverified", waiver_percent=waiver, reasons=unchecked)
+        status = "conditional" if _requirements(rule) else "eligible"
+        return RuleMatch(rule, status, waiver_percent=waiver)
+
+
+def _is_application_step(condition: str) -> bool:
+    return condition.lower().startswith("application")
+
+
+def _requirements(rule: ScholarshipRule) -> List[str]:
+    """Conditions a person has to verify (application steps are not requirements)"""
+    return [condition for condition in rule.conditions if not _is_application_step(condition)]
+
+
+def _as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _nationality_allowed(allowed: List[str], nationality: str) -> bool:
+    domestic = nationality in ("bangladeshi", "bangladesh")
+    return (domestic and "bangladeshi" in allowed) or (
+        not domestic and ("international" in allowed or "foreign" in allowed)
+    )
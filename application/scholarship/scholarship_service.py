@@ -1,92 +1,454 @@
-from typing import List, Dict, Any, TYPE_CHECKING
-from domain import RAGResponse, DocumentType
+import asyncio
+import logging
+import time
+import numpy as np
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple, TYPE_CHECKING
+from domain import RAGResponse, DocumentType, SearchResult
 from infrastructure.llm_service import LLMService
 from infrastructure.vector_store_service import VectorStoreService
 from infrastructure.cache_service import CacheService
+from infrastructure.semantic_cache import SemanticCache
+from infrastructure.reranker import CrossEncoderReranker
+from infrastructure.metrics import cache_lookups, increment, observe_stage, stage
+from core.config import settings
+from application.scholarship.context_builder import ContextBuilder
+from application.scholarship.eligibility_rules import EligibilityDecision, EligibilityRuleEngine
+from infrastructure.eligibility_criteria import CRITERIA_QUERY, CriteriaStore, CriteriaTable
 from application.scholarship.prompts.scholarship_qa import SCHOLARSHIP_QA_PROMPT
 from application.scholarship.prompts.eligibility_check import ELIGIBILITY_CHECK_PROMPT
 
 if TYPE_CHECKING:
     from infrastructure.llm_service import LLMService
 
+logger = logging.getLogger(__name__)
+
+# Chunks answered from when reranking is off or skipped
+ASK_TOP_K = 5
+
 class ScholarshipService:
-    def __init__(self):
-        self.llm_service: 'LLMService' = LLMService()
-        self.vector_store = VectorStoreService()
+    def __init__(self, llm_service: Optional['LLMService'] = None,
+                 vector_store: Optional[VectorStoreService] = None):
+        self.llm_service: 'LLMService' = llm_service or LLMService()
+        self.vector_store = vector_store or VectorStoreService()
         self.cache_service = CacheService()
+        self.semantic_cache = SemanticCache()
+        self.reranker = CrossEncoderReranker()
+        self.ask_context = ContextBuilder(settings.ASK_CONTEXT_TOKEN_BUDGET)
+        self.eligibility_context = ContextBuilder(settings.ELIGIBILITY_CONTEXT_TOKEN_BUDGET)
+        self.criteria_store = CriteriaStore()
     
     async def ask_question(self, question: str) -> RAGResponse:
         # Check cache first
         cache_key = self.cache_service.generate_question_key(question)
-        cached_response = await self.cache_service.get(cache_key)
+        cached_response, query_embedding = await self._cached_answer(question, cache_key)
         if cached_response:
-            print(f"   📋 Cache hit for question: {question[:50]}...")
-            return RAGResponse(**cached_response)
+            return cached_response
 
         # Search for relevant documents
-        search_results = await self.vector_store.search(
-            question,
-            document_type=DocumentType.SCHOLARSHIP,
-            limit=5
-        )
-
-        # Build context from search results
-        context = "\n\n".join([result.chunk.content for result in search_results])
+        search_results, context, retrieval_metadata = await self._retrieve(question, query_embedding)
 
         # Generate answer using LLM
+        response = await self._generate_answer(question, search_results, context, retrieval_metadata)
+
+        await self._store_answer(question, cache_key, query_embedding, response)
+        return response
+
+    async def ask_many(self, questions: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer many questions, yielding results as each one completes
+
+        Identical questions (after normalisation) are answered once and
+        cached answers come from one MGET. All remaining questions are
+        embedded in a single encode call, retrieved in multi-query batches,
+        and the LLM calls fan out with at most ASK_BATCH_CONCURRENCY in flight.
+
+        Yields:
+            {"index", "question", "response": RAGResponse} or {"index", "question", "error"}
+        """
+        groups: Dict[str, List[int]] = {}
+        for index, question in enumerate(questions):
+            groups.setdefault(self.cache_service.generate_question_key(question), []).append(index)
+        first_question = {key: questions[indices[0]] for key, indices in groups.items()}
+
+        def expand(key: str, item: Dict[str, Any]) -> List[Dict[str, Any]]:
+            return [{"index": index, "question": questions[index], **item} for index in groups[key]]
+
+        # Exact cache hits
+        keys = list(groups)
+        if settings.STARTUP_REPLAY_TOP_N:
+            self.cache_service.record_questions([first_question[key] for key in keys])
+        pending = []
+        with stage("cache"):
+            cached_responses = await self.cache_service.get_many(keys)
+        for key, cached_response in zip(keys, cached_responses):
+            increment(cache_lookups, "exact", "hit" if cached_response else "miss")
+            if cached_response:
+                for result in expand(key, {"response": RAGResponse(**{**cached_response, "metadata": {"cache": "hit"}})}):
+                    yield result
+            else:
+                pending.append(key)
+        if not pending:
+            return
+
+        # One encode call for every remaining question, then the semantic cache
+        embeddings = await self.vector_store.embedding_service.get_embeddings([first_question[key] for key in pending])
+        to_answer = []
+        for key, embedding in zip(pending, embeddings):
+            semantic_hit = None
+            if settings.SEMANTIC_CACHE_ENABLED:
+                with stage("semantic_cache"):
+                    semantic_hit = self.semantic_cache.lookup(embedding, first_question[key])
+                increment(cache_lookups, "semantic", "hit" if semantic_hit else "miss")
+            if semantic_hit:
+                cached_response, similarity = semantic_hit
+                response = RAGResponse(**{
+                    **cached_response,
+                    "metadata": {"cache": "semantic", "similarity": round(similarity, 4)}
+                })
+                for result in expand(key, {"response": response}):
+                    yield result
+            else:
+                to_answer.append((key, embedding))
+
+        semaphore = asyncio.Semaphore(settings.ASK_BATCH_CONCURRENCY)
+        completed: asyncio.Queue = asyncio.Queue()
+        tasks: List[asyncio.Task] = []
+
+        async def answer(key: str, embedding: np.ndarray, search_results: List[SearchResult],
+                         retrieval_metadata: Dict[str, Any]):
+            question = first_question[key]
+            try:
+                search_results = await self._rerank(question, search_results, retrieval_metadata)
+                async with semaphore:
+                    context = self._build_context(search_results, retrieval_metadata)
+                    response = await self._generate_answer(question, search_results, context, retrieval_metadata)
+                await self._store_answer(question, key, embedding, response)
+                await completed.put((key, {"response": response}))
+            except Exception as e:
+                await completed.put((key, {"error": str(e)}))
+
+        async def retrieve_and_dispatch():
+            # Retrieval runs in slices, so the first LLM calls start while later slices are searched
+            try:
+                for start in range(0, len(to_answer), settings.ASK_BATCH_RETRIEVAL_SIZE):
+                    batch = to_answer[start:start + settings.ASK_BATCH_RETRIEVAL_SIZE]
+                    try:
+                        searches = await self.vector_store.hybrid_search_many(
+                            [first_question[key] for key, _ in batch],
+                            np.stack([embedding for _, embedding in batch]),
+                            document_type=DocumentType.SCHOLARSHIP,
+                            limit=self._retrieval_limit()
+                        )
+                    except Exception as e:
+                        for key, _ in batch:
+                            await completed.put((key, {"error": str(e)}))
+                        continue
+                    for (key, embedding), (search_results, retrieval_metadata) in zip(batch, searches):
+                        tasks.append(asyncio.create_task(answer(key, embedding, search_results, retrieval_metadata)))
+                await asyncio.gather(*tasks)
+            finally:
+                await completed.put(None)
+
+        dispatcher = asyncio.create_task(retrieve_and_dispatch())
+        try:
+            while True:
+                item = await completed.get()
+                if item is None:
+                    break
+                for result in expand(*item):
+                    yield result
+        finally:
+            # The client went away (or we are done): stop outstanding work
+            for task in [dispatcher, *tasks]:
+                task.cancel()
+
+    async def ask_question_stream(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer a question as a stream of events
+
+        Yields {"event": ..., "data": ...} dicts: one "sources" event, then
+        "token" events as the LLM produces them, then "done". The finished
+        answer is cached once the stream completes.
+        """
+        cache_key = self.cache_service.generate_question_key(question)
+        cached_response, query_embedding = await self._cached_answer(question, cache_key)
+        if cached_response:
+            yield {"event": "sources", "data": self._sources_payload(cached_response.sources)}
+            yield {"event": "token", "data": {"text": cached_response.answer}}
+            yield {"event": "done", "data": {
+                "confidence": cached_response.confidence,
+                "metadata": cached_response.metadata
+            }}
+            return
+
+        search_results, context, retrieval_metadata = await self._retrieve(question, query_embedding)
+        yield {"event": "sources", "data": self._sources_payload(search_results)}
+
         prompt = SCHOLARSHIP_QA_PROMPT.format(question=question, context=context)
-        answer = await self.llm_service.generate_response(prompt)
+        answer_parts = []
+        # Timed by hand: a span must not stay current across the yields to the client
+        started = time.perf_counter()
+        async for token in self.llm_service.stream_response(prompt):
+            if not answer_parts:
+                observe_stage("llm_first_token", time.perf_counter() - started)
+            answer_parts.append(token)
+            yield {"event": "token", "data": {"text": token}}
+        observe_stage("llm", time.perf_counter() - started)
 
         response = RAGResponse(
+            answer="".join(answer_parts),
+            sources=search_results,
+            context=context,
+            confidence=self._confidence(search_results, retrieval_metadata),
+            metadata=retrieval_metadata
+        )
+        await self._store_answer(question, cache_key, query_embedding, response)
+        yield {"event": "done", "data": {"confidence": response.confidence, "metadata": response.metadata}}
+
+    async def _cached_answer(self, question: str,
+                             cache_key: str) -> Tuple[Optional[RAGResponse], Optional[np.ndarray]]:
+        """
+        Look the question up in the exact and semantic caches
+
+        Returns:
+            (cached response or None, question embedding if it was computed)
+        """
+        if settings.STARTUP_REPLAY_TOP_N:
+            self.cache_service.record_questions([question])
+        with stage("cache"):
+            cached_response = await self.cache_service.get(cache_key)
+        increment(cache_lookups, "exact", "hit" if cached_response else "miss")
+        if cached_response:
+            logger.debug("Cache hit for question: %.50s", question)
+            return RAGResponse(**{**cached_response, "metadata": {"cache": "hit"}}), None
+
+        if not settings.SEMANTIC_CACHE_ENABLED:
+            # Retrieval embeds the question itself, alongside its BM25 search
+            return None, None
+
+        # Embed once - used for the semantic cache and for dense retrieval
+        query_embedding = (await self.vector_store.embedding_service.get_embeddings([question]))[0]
+
+        with stage("semantic_cache"):
+            semantic_hit = self.semantic_cache.lookup(query_embedding, question)
+        increment(cache_lookups, "semantic", "hit" if semantic_hit else "miss")
+        if semantic_hit:
+            cached_response, similarity = semantic_hit
+            logger.debug("Semantic cache hit (%.3f) for question: %.50s", similarity, question)
+            return RAGResponse(**{
+                **cached_response,
+                "metadata": {"cache": "semantic", "similarity": round(similarity, 4)}
+            }), query_embedding
+
+        return None, query_embedding
+
+    async def warm_up(self, query: str, replay_top_n: int = 0) -> Dict[str, Any]:
+        """
+        Run the request path once before traffic and prime this worker's caches
+
+        One uncached encode, then retrieval and reranking of `query` (everything
+        but the LLM call), a Redis round trip, and the cached answers of the
+        replay_top_n most-asked questions loaded into the L1 and semantic
+        caches. A failed step is logged and reported; serving still works.
+
+        Returns:
+            {step: {"seconds": ...} or {"error": ...}}
+        """
+        report: Dict[str, Any] = {}
+
+        async def run_step(name: str, step):
+            started = time.perf_counter()
+            try:
+                result = await step
+            except Exception as e:
+                logger.warning("Warm-up step %s failed: %s", name, e)
+                report[name] = {"error": str(e)}
+                return None
+            report[name] = {"seconds": round(time.perf_counter() - started, 3)}
+            return result
+
+        await run_step("encode", self.vector_store.embedding_service.warm_up(query))
+        await run_step("retrieval", self._retrieve(query, None))
+        await run_step("redis", self.cache_service.ping())
+        if replay_top_n:
+            primed = await run_step("replay", self.prime_caches(replay_top_n))
+            if primed is not None:
+                report["replay"]["questions"] = primed
+        return report
+
+    async def prime_caches(self, top_n: int) -> int:
+        """Load the cached answers of the top_n most-asked questions into the L1 and semantic caches"""
+        questions = await self.cache_service.popular_questions(top_n)
+        if not questions:
+            return 0
+        # get_many fills the L1 cache as a side effect
+        answers = await self.cache_service.get_many(
+            [self.cache_service.generate_question_key(question) for question in questions]
+        )
+        answered = [(question, answer) for question, answer in zip(questions, answers) if answer]
+        if answered and settings.SEMANTIC_CACHE_ENABLED:
+            embeddings = await self.vector_store.embedding_service.get_embeddings(
+                [question for question, _ in answered]
+            )
+            for (question, answer), embedding in zip(answered, embeddings):
+                self.semantic_cache.add(question, embedding, answer)
+        return len(answered)
+
+    async def _retrieve(self, question: str,
+                        query_embedding: Optional[np.ndarray]) -> Tuple[List[SearchResult], str, Dict[str, Any]]:
+        """Hybrid retrieval plus the context string built from it"""
+        with stage("retrieval"):
+            search_results, retrieval_metadata = await self.vector_store.search_with_metadata(
+                question,
+                document_type=DocumentType.SCHOLARSHIP,
+                limit=self._retrieval_limit(),
+                query_embedding=query_embedding
+            )
+        search_results = await self._rerank(question, search_results, retrieval_metadata)
+
+        return search_results, self._build_context(search_results, retrieval_metadata), retrieval_metadata
+
+    def _retrieval_limit(self) -> int:
+        """Fused candidates to retrieve - more when the reranker will pick from them"""
+        return max(settings.RERANKER_CANDIDATES, ASK_TOP_K) if self.reranker.enabled else ASK_TOP_K
+
+    async def _rerank(self, question: str, search_results: List[SearchResult],
+                      retrieval_metadata: Dict[str, Any]) -> List[SearchResult]:
+        """Cross-encoder order when reranking ran (fewer, better chunks), else the top fused results"""
+        if not self.reranker.enabled:
+            return search_results[:ASK_TOP_K]
+        with stage("rerank"):
+            search_results, rerank_stats = await self.reranker.rerank(question, search_results)
+        retrieval_metadata["rerank"] = rerank_stats
+        return search_results[:settings.RERANKER_TOP_K if rerank_stats["status"] == "ok" else ASK_TOP_K]
+
+    def _build_context(self, search_results: List[SearchResult], retrieval_metadata: Dict[str, Any]) -> str:
+        # Build context from search results (overlaps removed, within the token budget)
+        with stage("context"):
+            context = self.ask_context.build(search_results)
+        retrieval_metadata["context"] = context.stats
+        return context.text
+
+    async def _generate_answer(self, question: str, search_results: List[SearchResult], context: str,
+                               retrieval_metadata: Dict[str, Any]) -> RAGResponse:
+        prompt = SCHOLARSHIP_QA_PROMPT.format(question=question, context=context)
+        with stage("llm"):
+            answer = await self.llm_service.generate_response(prompt)
+
+        return RAGResponse(
             answer=answer,
             sources=search_results,
             context=context,
-            confidence=min([result.score for result in search_results]) if search_results else 0.0
+            confidence=self._confidence(search_results, retrieval_metadata),
+            metadata=retrieval_metadata
         )
 
+    @staticmethod
+    def _confidence(search_results: List[SearchResult], retrieval_metadata: Dict[str, Any]) -> float:
+        """
+        Relevance of the best chunk in [0, 1]: the cross-encoder's probability
+        when reranking ran, else the normalised fused score of the top result
+        (1.0 = ranked first by both retrieval legs)
+        """
+        if not search_results:
+            return 0.0
+        if retrieval_metadata.get("rerank", {}).get("status") == "ok":
+            return search_results[0].score
+        return retrieval_metadata.get("fusion", {}).get("top_score", 0.0)
+
+    async def _store_answer(self, question: str, cache_key: str,
+                            query_embedding: Optional[np.ndarray], response: RAGResponse):
         # Cache the response
-        await self.cache_service.set(cache_key, response.dict())
-        print(f"   💾 Cached response for question: {question[:50]}...")
+        with stage("cache_store"):
+            await self.cache_service.set(cache_key, response.dict())
+            if settings.SEMANTIC_CACHE_ENABLED and query_embedding is not None:
+                self.semantic_cache.add(question, query_embedding, response.dict())
+        logger.debug("Cached response for question: %.50s", question)
 
-        return response
+    @staticmethod
+    def _sources_payload(search_results: List[SearchResult]) -> List[Dict[str, Any]]:
+        return [
+            {"source": result.source, "chunk_id": result.chunk.id, "score": result.score}
+            for result in search_results
+        ]
     
-    async def check_eligibility(self, student_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def check_eligibility(self, student_data: Dict[str, Any], explain: bool = False) -> Dict[str, Any]:
+        """
+        Decide eligibility with the rule engine when possible
+
+        The LLM is only called when an explanation is requested, the rules
+        are ambiguous for this student, or no up-to-date criteria table exists.
+        """
+        with stage("eligibility_rules"):
+            table = self.criteria_store.current()
+            decision = EligibilityRuleEngine(table).evaluate(student_data) if table else None
+        if decision is not None and not explain and not decision.ambiguous:
+            return {**decision.to_result(), "metadata": {"engine": "rules", "schemes": len(table.rules)}}
+
+        reason = "explain" if explain else "ambiguous" if decision is not None else "no_criteria_table"
+
         # Check cache first
-        cache_key = self.cache_service.generate_eligibility_key(student_data)
-        cached_result = await self.cache_service.get(cache_key)
+        cache_key = self.cache_service.generate_eligibility_key(student_data, table.fingerprint if table else "")
+        with stage("cache"):
+            cached_result = await self.cache_service.get(cache_key)
+        increment(cache_lookups, "eligibility", "hit" if cached_result else "miss")
         if cached_result:
-            print(f"   📋 Cache hit for eligibility check: {student_data}")
+            logger.debug("Cache hit for eligibility check: %s", student_data)
             return cached_result
 
-        # Search for eligibility criteria
-        search_results = await self.vector_store.search(
-            "eligibility criteria requirements GPA income",
-            document_type=DocumentType.SCHOLARSHIP,
-            limit=10
-        )
+        with stage("criteria_retrieval"):
+            search_results = await self._eligibility_criteria_results(table)
+        with stage("context"):
+            eligibility_context = self.eligibility_context.build(search_results)
 
-        eligibility_context = "\n\n".join([result.chunk.content for result in search_results])
+        eligibility_criteria = eligibility_context.text
+        if decision is not None:
+            eligibility_criteria += "\n\nRule-based assessment:\n" + decision.analysis()
 
         prompt = ELIGIBILITY_CHECK_PROMPT.format(
             student_data=str(student_data),
-            eligibility_criteria=eligibility_context
+            eligibility_criteria=eligibility_criteria
         )
 
-        analysis = await self.llm_service.generate_response(prompt)
+        with stage("llm"):
+            analysis = await self.llm_service.generate_response(prompt)
+
+        result = self._llm_eligibility_result(analysis, decision)
+        result["metadata"] = {"engine": "llm", "reason": reason, "context": eligibility_context.stats}
+
+        # Cache the result
+        await self.cache_service.set(cache_key, result)
+        logger.debug("Cached eligibility result for: %s", student_data)
+
+        return result
+
+    async def _eligibility_criteria_results(self, table: Optional[CriteriaTable]) -> List[SearchResult]:
+        """Criteria chunks recorded at ingestion, or a live search if there is no table"""
+        if table is not None and table.context_chunks:
+            scores = dict(table.context_chunks)
+            chunks = await self.vector_store.get_chunks(
+                [chunk_id for chunk_id, _ in table.context_chunks], DocumentType.SCHOLARSHIP
+            )
+            return [SearchResult(chunk=chunk, score=scores[chunk.id], source=chunk.source) for chunk in chunks]
+
+        # Search for eligibility criteria
+        return await self.vector_store.search(
+            CRITERIA_QUERY,
+            document_type=DocumentType.SCHOLARSHIP,
+            limit=10
+        )
 
-        result = {
+    def _llm_eligibility_result(self, analysis: str, decision: Optional[EligibilityDecision]) -> Dict[str, Any]:
+        if decision is not None and not decision.ambiguous:
+            # The LLM only explains; the verdict stays the deterministic one
+            return {**decision.to_result(), "analysis": analysis}
+        return {
             "eligible": "eligible" in analysis.lower(),
             "analysis": analysis,
             "recommended_scholarships": self._extract_recommended_scholarships(analysis),
             "next_steps": self._generate_next_steps(analysis)
         }
 
-        # Cache the result
-        await self.cache_service.set(cache_key, result)
-        print(f"   💾 Cached eligibility result for: {student_data}")
-
-        return result
-    
     def _extract_recommended_scholarships(self, analysis: str) -> List[str]:
         # Implement logic to extract scholarship names from analysis
         return ["Merit Scholarship", "Need-Based Scholarship"]
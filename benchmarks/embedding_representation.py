@@ -0,0 +1,112 @@
+"""
+Microbenchmark: nested Python lists vs contiguous float32 arrays for embeddings.
+
+Replays what happens to one ingestion batch after the model has encoded it:
+the vectors are written to the embedding cache and upserted into Chroma,
+once the old way (embeddings.tolist() handed from layer to layer) and once
+as a float32 array. Reports the objects and bytes each representation keeps
+alive, the peak traced memory and the wall time per stage.
+
+Runs offline against throwaway stores in a temp directory:
+
+    python -m benchmarks.embedding_representation --chunks 4096 --dim 384
+"""
+import argparse
+import shutil
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import chromadb
+import numpy as np
+
+from infrastructure.embedding_cache import EmbeddingCache
+
+
+def _measure_representation(make: Callable[[], object]) -> Dict[str, float]:
+    """Blocks and bytes retained by the value make() returns, plus the peak while building it"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    value = make()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    diff = after.compare_to(before, "filename")
+    del value
+    return {
+        "blocks": sum(stat.count_diff for stat in diff),
+        "retained_mb": sum(stat.size_diff for stat in diff) / 2 ** 20,
+        "peak_mb": peak / 2 ** 20,
+    }
+
+
+def _time(function: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def run(chunks: int, dim: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    rng = np.random.default_rng(0)
+    encoded = rng.standard_normal((chunks, dim), dtype=np.float32)  # what model.encode returns
+    texts = [f"chunk {index}" for index in range(chunks)]
+    ids = [f"id-{index}" for index in range(chunks)]
+    directory = tempfile.mkdtemp(prefix="embedding-bench-")
+
+    try:
+        cache = EmbeddingCache(f"{directory}/cache.sqlite3", max_items=chunks * 4)
+        client = chromadb.PersistentClient(path=f"{directory}/chroma")
+
+        def lists():
+            return encoded.tolist()
+
+        def array():
+            return np.ascontiguousarray(encoded, dtype=np.float32)
+
+        results = {}
+        for name, convert in (("lists", lists), ("float32", array)):
+            vectors = convert()
+            row = {**_measure_representation(convert),
+                   "convert_ms": _time(convert, repeat)}
+
+            def cache_put():
+                cache.clear()
+                cache.put_many(name, texts, vectors)
+
+            row["cache_put_ms"] = _time(cache_put, repeat)
+            # A fresh collection per run, so every variant measures inserts rather than updates
+            collections = iter([client.create_collection(f"bench_{name}_{run}") for run in range(repeat)])
+            row["chroma_upsert_ms"] = _time(
+                lambda: next(collections).upsert(ids=ids, embeddings=vectors, documents=texts), repeat
+            )
+            row["total_ms"] = row["convert_ms"] + row["cache_put_ms"] + row["chroma_upsert_ms"]
+            row["chunks_per_s"] = chunks / (row["total_ms"] / 1000)
+            results[name] = row
+        cache.close()
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _print_table(results: Dict[str, Dict[str, float]]):
+    columns: List[str] = list(next(iter(results.values())))
+    print(f"{'':10}" + "".join(f"{column:>18}" for column in columns))
+    for name, row in results.items():
+        print(f"{name:10}" + "".join(f"{row[column]:>18,.2f}" for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chunks", type=int, default=4096)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    _print_table(run(args.chunks, args.dim, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Cold-start footprint per process role: import time, startup time and RSS.
+
+Each role is measured in a fresh interpreter, because only a new process
+shows what importing the app costs:
+
+- api: `import main`, which is what every uvicorn worker pays before its
+  lifespan runs
+- api-ready: the same plus the lifespan startup (services built and warmed)
+- ingestion-worker: `import ingestion_worker` plus the ingestion service
+  with its embedding model loaded
+
+    python -m benchmarks.footprint --embedder hash
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+ROLES = ("api", "api-ready", "ingestion-worker")
+# Modules worth knowing about when they end up in a process
+HEAVY_MODULES = ("fitz", "PyPDF2", "docx", "chromadb", "langchain_core", "torch", "sentence_transformers")
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _run_lifespan(app):
+    async with app.router.lifespan_context(app):
+        pass
+
+
+def measure(role: str, embedder: str) -> Dict[str, Any]:
+    """Footprint of this (fresh) process in the given role"""
+    started = time.perf_counter()
+    if role == "ingestion-worker":
+        import ingestion_worker as entry_point
+    else:
+        import main as entry_point
+    result: Dict[str, Any] = {"import_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    # After the timed import, so registering the encoder does not count towards it
+    from benchmarks.offline import use_hash_encoder
+    from infrastructure.model_registry import current_rss_bytes
+    if embedder == "hash":
+        use_hash_encoder()
+
+    started = time.perf_counter()
+    if role == "api-ready":
+        asyncio.run(_run_lifespan(entry_point.app))
+    elif role == "ingestion-worker":
+        service = entry_point.DocumentIngestionService()
+        asyncio.run(service.embedding_service.warm_up())
+    if role != "api":
+        result["ready_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    result["rss_mb"] = round(current_rss_bytes() / 2 ** 20, 1)
+    result["heavy_modules"] = [module for module in HEAVY_MODULES if module in sys.modules]
+    return result
+
+
+def measure_all(embedder: str = "model", runs: int = 3) -> Dict[str, Dict[str, Any]]:
+    """Median footprint of each role over `runs` fresh processes (against empty temp stores)"""
+    from benchmarks.offline import store_paths
+
+    directory = tempfile.mkdtemp(prefix="footprint-")
+    env = {**os.environ, **store_paths(directory), "LOG_LEVEL": "ERROR", "HF_HUB_OFFLINE": "1"}
+    results = {}
+    try:
+        for role in ROLES:
+            samples: List[Dict[str, Any]] = []
+            for _ in range(runs):
+                completed = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.footprint", "--role", role, "--embedder", embedder],
+                    cwd=_PROJECT_ROOT, env=env, capture_output=True, text=True, check=True
+                )
+                samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            results[role] = {
+                key: round(statistics.median(sample[key] for sample in samples), 1)
+                for key in samples[0] if key != "heavy_modules"
+            }
+            results[role]["heavy_modules"] = samples[-1]["heavy_modules"]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--role", choices=ROLES, help="measure this process in one role (used by the child processes)")
+    parser.add_argument("--embedder", choices=("model", "hash"), default="model",
+                        help="configured EMBEDDING_MODEL (must be cached locally) or the hashing encoder")
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per role")
+    args = parser.parse_args()
+
+    if args.role:
+        print(json.dumps(measure(args.role, args.embedder)))
+    else:
+        print(json.dumps(measure_all(args.embedder, args.runs), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Helpers shared by the offline benchmark and evaluation tools: throwaway
+stores in a temp directory and an embedding model that needs no download.
+"""
+import os
+import re
+import zlib
+from typing import Dict, List
+
+import numpy as np
+
+# Settings that locate on-disk state, and their file names inside the temp directory
+_STORE_PATHS = {
+    "CHROMA_DB_PATH": "chroma",
+    "BM25_INDEX_PATH": "bm25",
+    "INGESTION_MANIFEST_PATH": "manifest.json",
+    "ELIGIBILITY_CRITERIA_PATH": "criteria.json",
+    "EMBEDDING_CACHE_PATH": "embedding_cache.sqlite3",
+}
+
+
+class HashEncoder:
+    """Deterministic bag-of-words hashing encoder - no model download, identical vectors on every run"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                vectors[row, zlib.crc32(token.encode("utf-8")) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def set_setting(name: str, value):
+    """Override a setting here and in the environment (read by the extraction worker processes)"""
+    from core.config import settings
+
+    os.environ[name] = str(value)
+    setattr(settings, name, value)
+
+
+def store_paths(directory: str) -> Dict[str, str]:
+    """Store settings pointing into the temp directory, e.g. as environment for a child process"""
+    return {name: os.path.join(directory, file_name) for name, file_name in _STORE_PATHS.items()}
+
+
+def isolate_stores(directory: str):
+    """Point every store at the temp directory (call before the services read their settings)"""
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    for name, path in store_paths(directory).items():
+        set_setting(name, path)
+
+
+def use_hash_encoder():
+    """Serve the "local" embedding provider from HashEncoder"""
+    from infrastructure.model_registry import model_registry
+
+    model_registry.register_loader("local", lambda model_name, device: HashEncoder())
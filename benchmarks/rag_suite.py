@@ -0,0 +1,330 @@
+"""
+Offline benchmark suite: ingestion throughput, retrieval latency and /scholarship/ask QPS.
+
+Everything runs in-process against throwaway stores in a temp directory.
+The bundled PDFs in data/raw_documents are ingested, the LLM is a stub
+that answers after --llm-latency-ms, Redis is replaced by fakeredis, and
+requests go through the FastAPI app over an in-memory ASGI transport, so
+no network is used. --embedder hash swaps the embedding model for a
+deterministic hashing encoder when the model is not on disk. The
+footprint section (benchmarks/footprint.py) times the import and startup
+of fresh API and ingestion worker processes and records their RSS.
+
+Results are written as JSON. Pass --compare to check a run against an
+earlier one; metrics that got worse by more than --tolerance are flagged
+and the exit code is 1:
+
+    pip install -r requirements-dev.txt
+    python -m benchmarks.rag_suite --output baseline.json
+    python -m benchmarks.rag_suite --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.footprint import measure_all
+from benchmarks.offline import isolate_stores, use_hash_encoder
+
+try:
+    import fakeredis.aioredis as fakeredis
+except ImportError:
+    fakeredis = None
+
+# Fixed query set - the same questions, in the same order, on every run
+QUESTIONS = [
+    "What CGPA do I need to keep the merit scholarship?",
+    "Who is eligible for the need-based financial aid?",
+    "How do I apply for the freedom fighter quota waiver?",
+    "Is there a sibling discount on tuition fees?",
+    "What documents are required for a financial aid application?",
+    "Can graduate students get a tuition waiver?",
+    "How much waiver do students from economically depressed areas get?",
+    "When is the scholarship application deadline?",
+    "What happens to my scholarship if my GPA drops?",
+    "Are extra-curricular achievements rewarded with a waiver?",
+    "What are the admission requirements for undergraduate programs?",
+    "Which tests are accepted for admission?",
+    "What is the admission test result needed for a scholarship?",
+    "How many credits must I take to keep financial aid?",
+    "Can I hold two scholarships at the same time?",
+    "Where do I submit the financial aid form?",
+]
+
+# Metric names by direction, for --compare
+_HIGHER_IS_BETTER = ("_per_s", "qps")
+_LOWER_IS_BETTER = ("_ms", "_mb", "errors")
+# Changes smaller than this are timer (or allocator) noise, whatever the relative change
+_MIN_DELTA = {"_ms": 1.0, "_mb": 2.0}
+_SECTIONS = ("ingestion", "retrieval", "ask", "footprint")
+
+
+class StubLLM:
+    """Stands in for LLMService: a fixed answer after a fixed latency"""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    async def generate_response(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return "Stub answer based on the retrieved context."
+
+    async def stream_response(self, prompt: str, **kwargs):
+        yield await self.generate_response(prompt, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls}
+
+
+def _summary(samples_ms: List[float]) -> Dict[str, float]:
+    samples = np.asarray(samples_ms)
+    return {
+        "n": len(samples),
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+    }
+
+
+async def bench_ingestion(raw_documents: str):
+    """Ingest the bundled documents from scratch; returns (throughput stats, vector store)"""
+    from domain import DocumentType
+    from infrastructure.document_ingestion import DocumentIngestionService
+
+    service = DocumentIngestionService()
+    files = pages = chunks = 0
+    started = time.perf_counter()
+    for directory, document_type in (("scholarships", DocumentType.SCHOLARSHIP),
+                                     ("admission", DocumentType.ADMISSION)):
+        chunks += await service.ingest_directory(os.path.join(raw_documents, directory), document_type)
+        progress = service.progress()
+        files += len(progress)
+        pages += sum(file["pages"] for file in progress)
+    seconds = time.perf_counter() - started
+
+    return {
+        "files": files,
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "pages_per_s": round(pages / seconds, 2),
+        "chunks_per_s": round(chunks / seconds, 2),
+    }, service.vector_store
+
+
+async def bench_retrieval(vector_store, repeat: int) -> Dict[str, Dict[str, float]]:
+    """Latency of each retrieval call over the query set, after one untimed warm-up pass"""
+    from domain import DocumentType
+
+    scholarship = DocumentType.SCHOLARSHIP
+    # The limits /scholarship/ask uses: 5 fused results from 15 candidates per leg
+    operations = {
+        "dense_search": lambda question: vector_store.dense_search(question, scholarship, 15),
+        "sparse_search": lambda question: vector_store.sparse_search(question, scholarship, 15),
+        "advanced_hybrid_search": lambda question: vector_store.advanced_hybrid_search(question, scholarship, 5),
+    }
+    results = {}
+    for name, operation in operations.items():
+        for question in QUESTIONS:
+            await operation(question)
+        samples = []
+        for _ in range(repeat):
+            for question in QUESTIONS:
+                started = time.perf_counter()
+                await operation(question)
+                samples.append((time.perf_counter() - started) * 1000)
+        results[name] = _summary(samples)
+    return results
+
+
+async def _run_load(client, questions: List[str], concurrency: int) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def ask(question: str):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/scholarship/ask", json={"question": question})
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(ask(question) for question in questions))
+    seconds = time.perf_counter() - started
+    return {"requests": len(questions), "errors": errors, "qps": round(len(questions) / seconds, 2),
+            **_summary(latencies)}
+
+
+async def bench_ask(concurrency_levels: List[int], requests: int, llm_latency_ms: float) -> Dict[str, Any]:
+    """
+    /scholarship/ask throughput per concurrency level
+
+    "uncached" asks distinct questions (semantic cache off), so every
+    request embeds, retrieves and calls the stub LLM; "cached" repeats
+    answered questions and measures the answer cache path.
+    """
+    if fakeredis is None:
+        raise ImportError("fakeredis not installed. Install with: pip install fakeredis")
+    import httpx
+    from core.config import settings
+    from main import app
+    from presentation.dependencies import get_scholarship_service
+
+    results: Dict[str, Any] = {"uncached": {}, "cached": {}}
+    # ASGITransport does not run the lifespan, so the services are started here
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        service = get_scholarship_service()
+        service.llm_service = StubLLM(llm_latency_ms)
+        service.cache_service.redis_client = fakeredis.FakeRedis()
+
+        semantic_cache = settings.SEMANTIC_CACHE_ENABLED
+        settings.SEMANTIC_CACHE_ENABLED = False
+        try:
+            for concurrency in concurrency_levels:
+                questions = [f"{QUESTIONS[i % len(QUESTIONS)]} (run {concurrency}, request {i})"
+                             for i in range(requests)]
+                results["uncached"][str(concurrency)] = await _run_load(client, questions, concurrency)
+        finally:
+            settings.SEMANTIC_CACHE_ENABLED = semantic_cache
+
+        await _run_load(client, QUESTIONS, 1)  # answer each question once, untimed
+        questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(requests)]
+        for concurrency in concurrency_levels:
+            results["cached"][str(concurrency)] = await _run_load(client, questions, concurrency)
+    return results
+
+
+def _environment(args: argparse.Namespace) -> Dict[str, Any]:
+    from core.config import settings
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": {name: value for name, value in vars(args).items() if name not in ("output", "compare", "tolerance")},
+        "settings": {name: getattr(settings, name) for name in (
+            "VECTOR_DB_TYPE", "INMEMORY_INDEX_QUANTIZE", "EMBEDDING_MODEL", "CHUNKER",
+            "CHUNK_MAX_TOKENS", "RERANKER_ENABLED", "SEMANTIC_CACHE_ENABLED",
+        )},
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    directory = tempfile.mkdtemp(prefix="rag-bench-")
+    try:
+        # Before anything reads the settings; no per-request log lines while under load
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        isolate_stores(directory)
+        if args.embedder == "hash":
+            use_hash_encoder()
+        ingestion, vector_store = await bench_ingestion(args.raw_documents)
+        return {
+            "environment": _environment(args),
+            "ingestion": ingestion,
+            "retrieval": await bench_retrieval(vector_store, args.repeat),
+            "ask": await bench_ask(args.concurrency, args.requests, args.llm_latency_ms),
+            # Fresh processes: API import/startup time and RSS, and the ingestion worker's
+            "footprint": measure_all(args.embedder, args.footprint_runs) if args.footprint_runs else {},
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print the change of every comparable metric; returns the ones that regressed beyond tolerance"""
+    if baseline.get("environment", {}).get("args") != current["environment"]["args"]:
+        print("⚠️  Runs used different arguments - differences may not be regressions")
+    before = _flatten({section: baseline.get(section, {}) for section in _SECTIONS})
+    after = _flatten({section: current.get(section, {}) for section in _SECTIONS})
+
+    regressions = []
+    print(f"{'metric':55}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, value in after.items():
+        higher_is_better = name.endswith(_HIGHER_IS_BETTER)
+        if name not in before or not (higher_is_better or name.endswith(_LOWER_IS_BETTER)):
+            continue
+        old = before[name]
+        change = (value - old) / old if old else (0.0 if value == old else float("inf"))
+        noise = next((delta for suffix, delta in _MIN_DELTA.items() if name.endswith(suffix)), 0.0)
+        regressed = change < -tolerance if higher_is_better else (change > tolerance and value - old >= noise)
+        if regressed:
+            regressions.append(name)
+        print(f"{name:55}{old:>14,.2f}{value:>14,.2f}{change:>+10.1%}" + ("  ❌" if regressed else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--embedder", choices=("model", "hash"), default="model",
+                        help="configured EMBEDDING_MODEL (must be cached locally) or the hashing encoder")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--concurrency", type=lambda value: [int(level) for level in value.split(",")],
+                        default=[1, 4, 16], help="comma-separated /scholarship/ask concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="/scholarship/ask requests per level")
+    parser.add_argument("--repeat", type=int, default=5, help="timed passes over the query set per retrieval call")
+    parser.add_argument("--footprint-runs", type=int, default=3,
+                        help="fresh processes per role for import time and RSS (0 = skip)")
+    parser.add_argument("--raw-documents", default="./data/raw_documents")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/rag_suite-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown before flagging")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    output = args.output or os.path.join(
+        "benchmarks", "results", f"rag_suite-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"Results written to {output}")
+
+    regressions: Optional[List[str]] = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            regressions = compare(json.load(baseline_file), results, args.tolerance)
+    else:
+        print(json.dumps({section: results[section] for section in _SECTIONS}, indent=2))
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,10 @@ async def check_storage():
     vector_store = VectorStoreService()
 
     # Check collection stats
-    collection = vector_store.collection
-    count = collection.count()
+    count = vector_store.count()
     print(f"Documents in vector DB: {count}")
+    for document_type, collection in vector_store.collections.items():
+        print(f"  {document_type.value}: {collection.count()}")
 
     # Try a test search
     results = await vector_store.search("scholarship", limit=3)
@@ -13,20 +13,106 @@ class Settings(BaseSettings):
     ANTHROPIC_API_KEY: Optional[str] = None
     GOOGLE_API_KEY: Optional[str] = None
     LLM_PROVIDER: str = "openai"  # openai, anthropic, google
+    LLM_FALLBACK_PROVIDERS: List[str] = []  # Tried in order on timeouts, rate limits and server errors
+    OPENAI_MODEL: str = "nex-agi/deepseek-v3.1-nex-n1:free"
+    ANTHROPIC_MODEL: str = "claude-3-sonnet-20240229"
+    GOOGLE_MODEL: str = "gemini-1.5-flash"
+    LLM_TIMEOUT: float = 30.0  # Seconds per provider attempt
+    LLM_MAX_RETRIES: int = 1  # Client-level retries before failing over
+    LLM_HEDGE_DELAY: float = 8.0  # Start the next provider if no answer after this many seconds (0 = off)
+    LLM_MAX_CONCURRENCY: int = 16  # Calls in flight per provider per worker
+    LLM_MAX_CONNECTIONS: int = 32  # Shared HTTP connection pool size
     
     # Vector Database
-    VECTOR_DB_TYPE: str = "chroma"  # chroma, pinecone, weaviate
+    VECTOR_DB_TYPE: str = "chroma"  # chroma, or inmemory (Chroma-backed, searched in RAM)
     CHROMA_DB_PATH: str = "./data/chroma_db"
+    CHROMA_COLLECTION_PREFIX: str = "university_documents"  # One collection per document type: <prefix>_<type>
+    INMEMORY_INDEX_QUANTIZE: bool = False  # int8 vectors in the inmemory index (4x smaller, approximate scores)
     PINECONE_API_KEY: Optional[str] = None
     PINECONE_ENVIRONMENT: Optional[str] = None
 
+    # Sparse (BM25) index
+    BM25_INDEX_PATH: str = "./data/bm25_index"
+    BM25_K1: float = 1.5
+    BM25_B: float = 0.75
+
+    # Ingestion
+    INGESTION_MANIFEST_PATH: str = "./data/ingestion_manifest.json"
+    INGESTION_EXTRACT_WORKERS: Optional[int] = None  # Extraction processes (None = CPU count)
+    INGESTION_EMBED_BATCH_SIZE: int = 64  # Chunks per encode call
+    INGESTION_EMBED_CONCURRENCY: int = 1  # Encode batches in flight
+    INGESTION_UPSERT_BATCH_SIZE: int = 256  # Chunks per Chroma upsert
+    INGESTION_UPSERT_CONCURRENCY: int = 1  # Upserts in flight (Chroma is a single writer)
+    INGESTION_QUEUE_SIZE: int = 8  # Page ranges buffered between stages
+    INGESTION_PAGES_PER_TASK: int = 16  # Pages extracted per worker task (bounds memory per file)
+    ELIGIBILITY_CRITERIA_PATH: str = "./data/eligibility_criteria.json"  # Parsed from scholarship documents
+    INGESTION_JOB_TTL: int = 7 * 24 * 3600  # Seconds a queued job's status stays readable in Redis
+
+    # Chunking
+    CHUNKER: str = "structured"  # "structured" (sections/paragraphs/sentences) or "words" (150-word windows)
+    CHUNK_MAX_TOKENS: int = 200  # ~150 words
+    CHUNK_OVERLAP_TOKENS: int = 30  # Trailing sentences repeated in the next chunk of a section
+    TOKENIZER_ENCODING: str = "cl100k_base"  # tiktoken encoding (regex estimate if unavailable)
+
+    # Prompt context - token budget per endpoint
+    ASK_CONTEXT_TOKEN_BUDGET: int = 1200
+    ELIGIBILITY_CONTEXT_TOKEN_BUDGET: int = 2000
+
+    # Batch question answering (/scholarship/ask/batch)
+    ASK_BATCH_MAX_QUESTIONS: int = 1000
+    ASK_BATCH_CONCURRENCY: int = 8  # LLM calls in flight per batch
+    ASK_BATCH_RETRIEVAL_SIZE: int = 32  # Questions per multi-query retrieval call
+
+    # Hybrid retrieval - per-leg timeouts in seconds
+    DENSE_SEARCH_TIMEOUT: float = 2.0
+    SPARSE_SEARCH_TIMEOUT: float = 1.0
+    RRF_K: int = 60  # Reciprocal Rank Fusion constant (lower favours the top ranks of each leg)
+    RETRIEVAL_CANDIDATE_MULTIPLIER: int = 3  # Each leg retrieves limit * this many candidates for fusion
+
+    # Reranking - cross-encoder over the fused candidates
+    RERANKER_ENABLED: bool = False
+    RERANKER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"  # FREE local model
+    RERANKER_DEVICE: Optional[str] = None  # "cpu", "cuda", ... (None = auto-detect)
+    RERANKER_CANDIDATES: int = 20  # Fused results scored per question
+    RERANKER_TOP_K: int = 3  # Chunks sent to the LLM after reranking (5 when skipped)
+    RERANKER_LATENCY_BUDGET_MS: float = 150.0  # Skip or abandon reranking beyond this
+    RERANKER_MAX_CONCURRENCY: int = 2  # Reranks in flight per worker; more requests skip it
+    RERANKER_CACHE_SIZE: int = 10_000  # (question hash, chunk id) scores kept per worker
+
     # Cache
     REDIS_URL: str = "redis://localhost:6379"
     CACHE_TTL: int = 3600  # 1 hour in seconds
+    REDIS_MAX_CONNECTIONS: int = 20  # Per-worker connections for cache commands
+    REDIS_POOL_TIMEOUT: float = 0.1  # Seconds a command waits for a free connection before it counts as a miss
+    LOCAL_CACHE_MAX_ITEMS: int = 1024  # In-process L1 entries per worker
+    LOCAL_CACHE_TTL: int = 60  # L1 TTL in seconds (bounds staleness if pub/sub is down)
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    SEMANTIC_CACHE_ENABLED: bool = False  # Off: questions that differ only in a program name match too closely
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92  # Cosine similarity needed to reuse an answer
+    SEMANTIC_CACHE_SIZE: int = 1024  # Recently answered questions kept per worker
     
     # Embeddings
     EMBEDDING_PROVIDER: str = "local"  # "local" (FREE) or "openai" ($$$)
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"  # FREE local model or OpenAI model
+    EMBEDDING_DEVICE: Optional[str] = None  # "cpu", "cuda", ... (None = auto-detect)
+    EMBEDDING_MAX_BATCH_SIZE: int = 32  # Max texts per micro-batched encode call
+    EMBEDDING_MAX_WAIT_MS: float = 5.0  # How long to collect concurrent queries into one batch
+    EMBEDDING_EXECUTOR_WORKERS: int = 1  # Threads running encode (torch already uses intra-op threads)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "./data/embedding_cache.sqlite3"  # Persistent (model, text hash) -> vector store
+    EMBEDDING_CACHE_MAX_ITEMS: int = 200_000  # LRU bound (~1.5 KB per 384-dim vector)
+    
+    # Observability
+    METRICS_ENABLED: bool = True  # Per-stage and per-endpoint latency histograms at /metrics
+    OTEL_ENABLED: bool = False  # Also emit OpenTelemetry spans (needs opentelemetry-api/sdk)
+    LOG_LEVEL: str = "INFO"  # DEBUG shows per-request cache and embedding messages
+    LOG_FORMAT: str = "text"  # "text" or "json" (one object per line)
+
+    # Startup - done before a worker accepts traffic (GET /ready answers 503 until then)
+    STARTUP_WARMUP_ENABLED: bool = True  # Load the models and run one query through retrieval first
+    STARTUP_WARMUP_QUERY: str = "What scholarships are available for undergraduate students?"
+    STARTUP_REPLAY_TOP_N: int = 50  # Most-asked cached answers loaded into the worker's caches (0 = off)
+    STARTUP_REPLAY_TRACKED: int = 1000  # Distinct questions whose ask counts are kept in Redis
     
     # Security
     SECRET_KEY: str
@@ -0,0 +1,56 @@
+import json
+import logging
+import sys
+from typing import Optional
+
+from core.config import settings
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+
+
+class TextFormatter(logging.Formatter):
+    """`time level logger message key=value ...`"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = _extra_fields(record)
+        if extra:
+            line += " " + " ".join(f"{key}={value}" for key, value in extra.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, extra={...} fields included"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_extra_fields(record),
+        }
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def configure_logging(level: Optional[str] = None, log_format: Optional[str] = None):
+    """Route the app's loggers to stderr at LOG_LEVEL in LOG_FORMAT"""
+    log_format = log_format or settings.LOG_FORMAT
+    if log_format not in ("text", "json"):
+        raise ValueError(f"Unsupported log format: {log_format}")
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(
+        JsonFormatter() if log_format == "json"
+        else TextFormatter("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+    )
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel((level or settings.LOG_LEVEL).upper())
@@ -1,3 +1,3 @@
-from .chat import ChatRequest, ChatResponse
+from .chat import BatchChatRequest, ChatRequest, ChatResponse
 from .eligibility import EligibilityRequest, EligibilityResponse
 from .rag_models import DocumentType, DocumentChunk, RetrievalResult, SearchResult, RAGResponse
\ No newline at end of file
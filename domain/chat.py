@@ -1,10 +1,14 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Dict, Any
 
 class ChatRequest(BaseModel):
     question: str
 
+class BatchChatRequest(BaseModel):
+    questions: List[str]
+
 class ChatResponse(BaseModel):
     answer: str
     sources: List[str]
-    confidence: float
\ No newline at end of file
+    confidence: float
+    metadata: Dict[str, Any] = {}
\ No newline at end of file
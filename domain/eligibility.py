@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Any, Dict, List
 
 class EligibilityRequest(BaseModel):
     gpa: float
@@ -7,9 +7,12 @@ class EligibilityRequest(BaseModel):
     program: str
     nationality: str
     academic_level: str
+    explain: bool = False  # Ask the LLM for a written explanation
 
 class EligibilityResponse(BaseModel):
     eligible: bool
     analysis: str
     recommended_scholarships: List[str]
-    next_steps: List[str]
\ No newline at end of file
+    needs_verification: List[str] = []  # schemes the student data cannot settle
+    next_steps: List[str]
+    metadata: Dict[str, Any] = {}
\ No newline at end of file
@@ -37,4 +37,5 @@ class RAGResponse(BaseModel):
     sources: List[SearchResult]
     context: str
     confidence: float
+    metadata: Dict[str, Any] = {}
 
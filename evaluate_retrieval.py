@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Evaluate retrieval quality against latency for several retrieval configurations.
+
+The labelled questions in data/eval/retrieval_queries.json are run through
+advanced_hybrid_search for every combination of chunk size, RRF k,
+candidate multiplier and dense backend. For each combination the tool
+reports recall@k, MRR and nDCG@k next to p50/p95 latency and index size.
+
+A chunk counts as relevant to a question when it comes from one of the
+question's sources and contains one of its answer phrases, so the labels
+stay valid at any chunk size. Each chunk size is ingested from the bundled
+documents into a temp directory; --existing evaluates the configured store
+as it is instead.
+
+    python evaluate_retrieval.py --chunk-tokens 150,200,300 --rrf-k 20,60 --candidates 2,3,5
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.offline import isolate_stores, set_setting, use_hash_encoder
+
+# Dense backend name -> (VECTOR_DB_TYPE, INMEMORY_INDEX_QUANTIZE)
+BACKENDS = {
+    "chroma": ("chroma", False),
+    "inmemory": ("inmemory", False),
+    "inmemory-int8": ("inmemory", True),
+}
+
+
+def _normalise(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+@dataclass
+class LabelledQuery:
+    question: str
+    document_type: Optional[str]
+    sources: List[str]
+    answer_contains: List[str]
+
+    def is_relevant(self, chunk) -> bool:
+        if self.sources and chunk.source not in self.sources:
+            return False
+        content = _normalise(chunk.content)
+        return any(_normalise(phrase) in content for phrase in self.answer_contains)
+
+
+def load_queries(path: str) -> List[LabelledQuery]:
+    with open(path, encoding="utf-8") as queries_file:
+        return [
+            LabelledQuery(
+                question=item["question"],
+                document_type=item.get("document_type"),
+                sources=item.get("sources", []),
+                answer_contains=item["answer_contains"],
+            )
+            for item in json.load(queries_file)
+        ]
+
+
+def _ranking_metrics(relevance: List[bool], relevant_total: int, k: int) -> Dict[str, float]:
+    """recall@k (a relevant chunk in the top k), reciprocal rank and nDCG@k with binary gains"""
+    top = relevance[:k]
+    first = next((rank for rank, relevant in enumerate(top, 1) if relevant), None)
+    dcg = sum(1 / math.log2(rank + 1) for rank, relevant in enumerate(top, 1) if relevant)
+    ideal = sum(1 / math.log2(rank + 1) for rank in range(1, min(k, relevant_total) + 1))
+    return {
+        "recall": 1.0 if first else 0.0,
+        "reciprocal_rank": 1 / first if first else 0.0,
+        "ndcg": dcg / ideal if ideal else 0.0,
+    }
+
+
+def _directory_mb(path: str) -> float:
+    total = 0
+    for directory, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+    return total / 2 ** 20
+
+
+def index_size_mb(vector_store) -> Dict[str, float]:
+    """Dense index (RAM for the in-memory index, on disk for Chroma) and BM25 postings size"""
+    from core.config import settings
+
+    if vector_store.indexes:
+        dense = sum(index.stats()["memory_mb"] for index in vector_store.indexes.values())
+    else:
+        dense = _directory_mb(settings.CHROMA_DB_PATH)
+    return {"dense_mb": round(dense, 2), "bm25_mb": round(_directory_mb(settings.BM25_INDEX_PATH), 2)}
+
+
+async def relevant_counts(vector_store, queries: List[LabelledQuery]) -> List[int]:
+    """How many stored chunks are relevant to each question (the nDCG ideal)"""
+    chunks = []
+    for collection in vector_store.collections.values():
+        records = collection.get(include=["documents", "metadatas"])
+        chunks.extend(
+            vector_store._chunk_from_record(chunk_id, document, metadata)
+            for chunk_id, document, metadata in zip(records['ids'], records['documents'], records['metadatas'])
+        )
+    return [sum(query.is_relevant(chunk) for chunk in chunks) for query in queries]
+
+
+async def evaluate(vector_store, queries: List[LabelledQuery], counts: List[int],
+                   k: int, repeat: int) -> Dict[str, float]:
+    """Quality and latency of advanced_hybrid_search over the labelled set (after one warm-up pass)"""
+    from domain import DocumentType
+
+    def search(query: LabelledQuery):
+        document_type = DocumentType(query.document_type) if query.document_type else None
+        return vector_store.advanced_hybrid_search(query.question, document_type, k)
+
+    for query in queries:
+        await search(query)
+
+    latencies = []
+    per_query = []
+    for query, count in zip(queries, counts):
+        for _ in range(repeat):
+            started = time.perf_counter()
+            results = await search(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+        per_query.append(_ranking_metrics([query.is_relevant(result.chunk) for result in results], count, k))
+
+    return {
+        f"recall@{k}": round(float(np.mean([metrics["recall"] for metrics in per_query])), 4),
+        "mrr": round(float(np.mean([metrics["reciprocal_rank"] for metrics in per_query])), 4),
+        f"ndcg@{k}": round(float(np.mean([metrics["ndcg"] for metrics in per_query])), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+    }
+
+
+async def ingest_bundled_documents(raw_documents: str) -> int:
+    from domain import DocumentType
+    from infrastructure.document_ingestion import DocumentIngestionService
+
+    service = DocumentIngestionService()
+    chunks = 0
+    for directory, document_type in (("scholarships", DocumentType.SCHOLARSHIP),
+                                     ("admission", DocumentType.ADMISSION)):
+        chunks += await service.ingest_directory(os.path.join(raw_documents, directory), document_type)
+    return chunks
+
+
+async def evaluate_chunking(args: argparse.Namespace, queries: List[LabelledQuery],
+                            chunk_tokens: Optional[int]) -> List[Dict[str, Any]]:
+    """Every backend/RRF k/multiplier combination over one store"""
+    from core.config import settings
+    from infrastructure.embedding_service import EmbeddingService
+    from infrastructure.vector_store_service import VectorStoreService
+
+    rows = []
+    embedding_service = EmbeddingService()
+    counts = None
+    for backend in args.backends:
+        set_setting("VECTOR_DB_TYPE", BACKENDS[backend][0])
+        set_setting("INMEMORY_INDEX_QUANTIZE", BACKENDS[backend][1])
+        vector_store = VectorStoreService(embedding_service=embedding_service)
+        if counts is None:
+            counts = await relevant_counts(vector_store, queries)
+            unanswerable = [query.question for query, count in zip(queries, counts) if not count]
+            if unanswerable:
+                print(f"⚠️  {len(unanswerable)} question(s) have no relevant chunk at this chunk size: {unanswerable}")
+
+        for rrf_k, candidates in itertools.product(args.rrf_k, args.candidates):
+            set_setting("RRF_K", rrf_k)
+            set_setting("RETRIEVAL_CANDIDATE_MULTIPLIER", candidates)
+            metrics = await evaluate(vector_store, queries, counts, args.k, args.repeat)
+            row = {
+                "chunk_tokens": chunk_tokens or settings.CHUNK_MAX_TOKENS,
+                "backend": backend,
+                "rrf_k": rrf_k,
+                "candidates": candidates,
+                **metrics,
+                **index_size_mb(vector_store),
+            }
+            rows.append(row)
+            _print_row(row, args.k)
+    return rows
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    queries = load_queries(args.queries)
+    if args.embedder == "hash":
+        use_hash_encoder()
+    if args.existing:
+        return await evaluate_chunking(args, queries, None)
+
+    from infrastructure.chunking import get_chunker
+
+    rows = []
+    for chunk_tokens in args.chunk_tokens:
+        directory = tempfile.mkdtemp(prefix="retrieval-eval-")
+        try:
+            isolate_stores(directory)
+            set_setting("VECTOR_DB_TYPE", "chroma")
+            set_setting("CHUNK_MAX_TOKENS", chunk_tokens)
+            get_chunker.cache_clear()
+            chunks = await ingest_bundled_documents(args.raw_documents)
+            print(f"\nChunk size {chunk_tokens} tokens: {chunks} chunks")
+            rows.extend(await evaluate_chunking(args, queries, chunk_tokens))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return rows
+
+
+_COLUMNS = ("chunk_tokens", "backend", "rrf_k", "candidates")
+
+
+def _print_row(row: Dict[str, Any], k: int):
+    print(f"{row['chunk_tokens']:>6} {row['backend']:>14} {row['rrf_k']:>6} {row['candidates']:>4}  "
+          f"recall@{k} {row[f'recall@{k}']:.3f}  MRR {row['mrr']:.3f}  nDCG@{k} {row[f'ndcg@{k}']:.3f}  "
+          f"p50 {row['p50_ms']:>7.2f}ms  p95 {row['p95_ms']:>7.2f}ms  "
+          f"dense {row['dense_mb']:.2f}MB  bm25 {row['bm25_mb']:.2f}MB")
+
+
+def recommend(rows: List[Dict[str, Any]], k: int, max_quality_drop: float) -> Dict[str, Any]:
+    """Fastest configuration (p95) whose nDCG is within max_quality_drop of the best"""
+    best = max(row[f"ndcg@{k}"] for row in rows)
+    candidates = [row for row in rows if row[f"ndcg@{k}"] >= best - max_quality_drop]
+    return min(candidates, key=lambda row: row["p95_ms"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+
+    def int_list(value: str) -> List[int]:
+        return [int(item) for item in value.split(",")]
+
+    parser.add_argument("--queries", default="./data/eval/retrieval_queries.json")
+    parser.add_argument("--k", type=int, default=5, help="results per question (the /ask limit)")
+    parser.add_argument("--chunk-tokens", type=int_list, default=[200], help="comma-separated CHUNK_MAX_TOKENS values")
+    parser.add_argument("--rrf-k", type=int_list, default=[60], help="comma-separated RRF_K values")
+    parser.add_argument("--candidates", type=int_list, default=[3],
+                        help="comma-separated RETRIEVAL_CANDIDATE_MULTIPLIER values")
+    parser.add_argument("--backends", type=lambda value: value.split(","), default=["chroma"],
+                        help=f"comma-separated dense backends: {', '.join(BACKENDS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="timed searches per question")
+    parser.add_argument("--existing", action="store_true",
+                        help="evaluate the configured store instead of ingesting each chunk size")
+    parser.add_argument("--embedder", choices=("model", "hash"), default="model",
+                        help="configured EMBEDDING_MODEL or the offline hashing encoder")
+    parser.add_argument("--raw-documents", default="./data/raw_documents")
+    parser.add_argument("--max-quality-drop", type=float, default=0.02,
+                        help="nDCG a recommended configuration may give up for speed")
+    parser.add_argument("--output", help="write all results as JSON")
+    args = parser.parse_args()
+    unknown = [backend for backend in args.backends if backend not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown backend(s): {', '.join(unknown)}")
+
+    rows = asyncio.run(run(args))
+
+    choice = recommend(rows, args.k, args.max_quality_drop)
+    print("\nFastest configuration within "
+          f"{args.max_quality_drop} nDCG of the best: " + ", ".join(f"{column}={choice[column]}" for column in _COLUMNS))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump({"args": vars(args), "results": rows, "recommended": choice}, output_file, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+from core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows - single writer is assumed
+    fcntl = None
+
+# Keeps decimals and thousands separators together ("3.50", "50,000") so GPA
+# thresholds and amounts are searchable as exact terms
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+STOP_WORDS = {
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
+    'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did',
+    'will', 'would', 'could', 'should', 'may', 'might', 'must', 'can', 'shall'
+}
+
+# Rewrite the postings without deleted documents once this share is dead
+COMPACT_DELETED_RATIO = 0.25
+# Seconds a replaced version stays on disk, for readers in other processes that
+# read CURRENT just before the switch and have not opened the files yet
+RETIRED_VERSION_GRACE = 60.0
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word/number tokens without stop words"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def _load_array(path: str) -> np.ndarray:
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        # Zero-length arrays cannot be memory-mapped
+        return np.load(path)
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """One immutable load of a committed version; replaced wholesale on reload"""
+    version: Optional[str] = None
+    terms: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    doc_ids: List[str] = field(default_factory=list)
+    id_to_doc: Dict[str, int] = field(default_factory=dict)
+    type_names: List[str] = field(default_factory=list)
+    postings_docs: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    postings_tf: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float32))
+    doc_lengths: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float32))
+    doc_types: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.uint8))
+    deleted: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=bool))
+    live_docs: int = 0
+    avg_doc_length: float = 0.0
+
+
+class BM25Index:
+    """
+    Persistent BM25 inverted index over document chunks.
+
+    Layout on disk (one directory per committed version, CURRENT names the live one):
+        meta.json           vocabulary (term -> postings offset/length), doc ids, type names
+        postings_docs.npy   int32 doc numbers, grouped by term
+        postings_tf.npy     float32 term frequencies aligned with postings_docs
+        doc_lengths.npy     float32 token count per doc
+        doc_types.npy       uint8 index into the type names
+        deleted.npy         bool tombstones (removed on compaction)
+
+    Postings are memory-mapped, so scoring a query touches only the postings
+    of its terms. Writers (ingestion) publish a new version; readers in other
+    processes pick it up on their next query. Every version rewrites the
+    postings, so bulk writers buffer their adds and deletes in a deferred()
+    block and publish them together with flush(). A reload builds a new
+    snapshot and swaps it in with one assignment, so a search running in
+    another thread always scores against a single consistent version.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: Optional[float] = None, b: Optional[float] = None):
+        self.path = path or settings.BM25_INDEX_PATH
+        self.k1 = settings.BM25_K1 if k1 is None else k1
+        self.b = settings.BM25_B if b is None else b
+        self._current_signature: Optional[Tuple[int, int]] = None
+        self._snapshot = _Snapshot()
+        self._reload_lock = threading.Lock()
+        # Writes buffered while a deferred() block is open
+        self._buffer_lock = threading.Lock()
+        self._deferring = 0
+        self._pending_adds: Dict[str, Tuple[str, str]] = {}
+        self._pending_deletes: Set[str] = set()
+        self._maybe_reload()
+
+    def __len__(self) -> int:
+        return self._maybe_reload().live_docs
+
+    # ------------------------------------------------------------------ reading
+
+    @property
+    def _current_file(self) -> str:
+        return os.path.join(self.path, "CURRENT")
+
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            current_stat = os.stat(self._current_file)
+        except FileNotFoundError:
+            return None
+        # CURRENT is replaced (new inode) on every commit, so this is a cheap change check
+        return current_stat.st_ino, current_stat.st_mtime_ns
+
+    def _maybe_reload(self) -> _Snapshot:
+        """The loaded snapshot, switched to the latest committed version first if one was published"""
+        signature = self._signature()
+        if signature is None or signature == self._current_signature:
+            return self._snapshot
+        with self._reload_lock:
+            # Another thread may have reloaded while this one waited
+            signature = self._signature()
+            if signature is not None and signature != self._current_signature:
+                with open(self._current_file) as current:
+                    version = current.read().strip()
+                self._snapshot = self._load(version)
+                self._current_signature = signature
+            return self._snapshot
+
+    def _load(self, version: str) -> _Snapshot:
+        version_dir = os.path.join(self.path, version)
+        with open(os.path.join(version_dir, "meta.json")) as meta_file:
+            meta = json.load(meta_file)
+
+        doc_ids = meta["doc_ids"]
+        doc_lengths = _load_array(os.path.join(version_dir, "doc_lengths.npy"))
+        deleted = np.array(np.load(os.path.join(version_dir, "deleted.npy")))
+        live = ~deleted
+        live_docs = int(live.sum())
+        return _Snapshot(
+            version=version,
+            terms={term: (entry[0], entry[1]) for term, entry in meta["terms"].items()},
+            doc_ids=doc_ids,
+            id_to_doc={doc_id: i for i, doc_id in enumerate(doc_ids)},
+            type_names=meta["type_names"],
+            postings_docs=_load_array(os.path.join(version_dir, "postings_docs.npy")),
+            postings_tf=_load_array(os.path.join(version_dir, "postings_tf.npy")),
+            doc_lengths=doc_lengths,
+            doc_types=_load_array(os.path.join(version_dir, "doc_types.npy")),
+            deleted=deleted,
+            live_docs=live_docs,
+            avg_doc_length=float(doc_lengths[live].mean()) if live_docs else 0.0,
+        )
+
+    def search(self, query: str, limit: int = 10,
+               document_type: Union[str, Sequence[str], None] = None) -> List[Tuple[str, float]]:
+        """
+        Score the query against the index, optionally restricted to one or more document types
+
+        Returns:
+            (chunk id, BM25 score) pairs, best first
+        """
+        snapshot = self._maybe_reload()
+        if not snapshot.live_docs or limit <= 0:
+            return []
+
+        scores = np.zeros(len(snapshot.doc_ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            entry = snapshot.terms.get(term)
+            if entry is None:
+                continue
+            offset, length = entry
+            docs = snapshot.postings_docs[offset:offset + length]
+            live = ~snapshot.deleted[docs]
+            df = int(live.sum())
+            if not df:
+                continue
+
+            docs = docs[live]
+            tf = snapshot.postings_tf[offset:offset + length][live]
+            idf = math.log(1 + (snapshot.live_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * snapshot.doc_lengths[docs] / snapshot.avg_doc_length)
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if document_type is not None:
+            wanted = [document_type] if isinstance(document_type, str) else document_type
+            type_numbers = [snapshot.type_names.index(name) for name in wanted if name in snapshot.type_names]
+            if not type_numbers:
+                return []
+            scores[~np.isin(snapshot.doc_types, type_numbers)] = 0
+
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > limit:
+            hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(snapshot.doc_ids[i], float(scores[i])) for i in hits]
+
+    def document_types(self, ids: Sequence[str]) -> List[Optional[str]]:
+        """Document type of each chunk id (None if not indexed)"""
+        snapshot = self._maybe_reload()
+        types = []
+        for doc_id in ids:
+            doc = snapshot.id_to_doc.get(doc_id)
+            types.append(None if doc is None or snapshot.deleted[doc]
+                         else snapshot.type_names[snapshot.doc_types[doc]])
+        return types
+
+    # ------------------------------------------------------------------ writing
+
+    @contextmanager
+    def _write_lock(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, ".lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Always merge on top of the latest published version
+                self._maybe_reload()
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def deferred(self):
+        """Buffer add() and delete() inside the block; flush() (or leaving the block) publishes them"""
+        with self._buffer_lock:
+            self._deferring += 1
+        try:
+            yield self
+        finally:
+            with self._buffer_lock:
+                self._deferring -= 1
+            self.flush()
+
+    def flush(self):
+        """Publish the buffered adds and deletes as one version"""
+        with self._buffer_lock:
+            batch, delete_ids = self._pending_adds, self._pending_deletes
+            self._pending_adds, self._pending_deletes = {}, set()
+        if batch or delete_ids:
+            with self._write_lock():
+                self._apply_locked(batch, delete_ids)
+
+    def add(self, ids: Sequence[str], texts: Sequence[str], document_types: Sequence[str]):
+        """Add (or replace) chunks and publish a new index version (buffered in a deferred() block)"""
+        if not ids:
+            return
+        # Last occurrence wins if an id appears twice in one batch
+        batch = {doc_id: (text, doc_type) for doc_id, text, doc_type in zip(ids, texts, document_types)}
+
+        with self._buffer_lock:
+            if self._deferring:
+                self._pending_deletes.difference_update(batch)
+                self._pending_adds.update(batch)
+                return
+        with self._write_lock():
+            self._apply_locked(batch)
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Remove chunks from the index; returns how many were live (how many were given when buffered)"""
+        ids = list(ids)
+        with self._buffer_lock:
+            if self._deferring:
+                for doc_id in ids:
+                    self._pending_adds.pop(doc_id, None)
+                self._pending_deletes.update(ids)
+                return len(ids)
+        with self._write_lock():
+            return self._apply_locked({}, ids)
+
+    def rebuild(self, ids: Sequence[str], texts: Sequence[str], document_types: Sequence[str]):
+        """Replace the whole index with the given chunks"""
+        batch = {doc_id: (text, doc_type) for doc_id, text, doc_type in zip(ids, texts, document_types)}
+        with self._write_lock():
+            self._apply_locked(batch, base=_Snapshot())
+
+    def _apply_locked(self, batch: Dict[str, Tuple[str, str]], delete_ids: Iterable[str] = (),
+                      base: Optional[_Snapshot] = None) -> int:
+        """
+        Tombstone delete_ids, append a batch on top of base (the loaded version) and publish;
+        caller holds the write lock
+
+        Returns:
+            How many of delete_ids were live
+        """
+        base = self._snapshot if base is None else base
+        deleted = base.deleted.copy()
+        removed = 0
+        for doc_id in delete_ids:
+            doc = base.id_to_doc.get(doc_id)
+            if doc is not None and not deleted[doc]:
+                deleted[doc] = True
+                removed += 1
+        if not batch:
+            if removed:
+                self._commit(
+                    terms=base.terms,
+                    postings_docs=base.postings_docs,
+                    postings_tf=base.postings_tf,
+                    doc_ids=base.doc_ids,
+                    doc_lengths=base.doc_lengths,
+                    doc_types=base.doc_types,
+                    deleted=deleted,
+                    type_names=base.type_names,
+                )
+            return removed
+
+        for doc_id in batch:
+            existing = base.id_to_doc.get(doc_id)
+            if existing is not None:
+                deleted[existing] = True
+
+        type_names = list(base.type_names)
+        first_doc = len(base.doc_ids)
+        new_postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        lengths, types = [], []
+
+        for i, (text, doc_type) in enumerate(batch.values()):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            if doc_type not in type_names:
+                type_names.append(doc_type)
+            types.append(type_names.index(doc_type))
+            for term, tf in Counter(tokens).items():
+                new_postings[term].append((first_doc + i, tf))
+
+        terms, postings_docs, postings_tf = self._merge_postings(base, new_postings)
+        self._commit(
+            terms=terms,
+            postings_docs=postings_docs,
+            postings_tf=postings_tf,
+            doc_ids=base.doc_ids + list(batch),
+            doc_lengths=np.concatenate([base.doc_lengths, np.array(lengths, dtype=np.float32)]),
+            doc_types=np.concatenate([base.doc_types, np.array(types, dtype=np.uint8)]),
+            deleted=np.concatenate([deleted, np.zeros(len(batch), dtype=bool)]),
+            type_names=type_names,
+        )
+        return removed
+
+    @staticmethod
+    def _merge_postings(base: _Snapshot, new_postings: Dict[str, List[Tuple[int, int]]]):
+        terms: Dict[str, Tuple[int, int]] = {}
+        doc_parts, tf_parts = [], []
+        offset = 0
+        for term in sorted(set(base.terms) | set(new_postings)):
+            length = 0
+            if term in base.terms:
+                start, count = base.terms[term]
+                doc_parts.append(base.postings_docs[start:start + count])
+                tf_parts.append(base.postings_tf[start:start + count])
+                length += count
+            if term in new_postings:
+                added = np.array(new_postings[term], dtype=np.int64)
+                doc_parts.append(added[:, 0].astype(np.int32))
+                tf_parts.append(added[:, 1].astype(np.float32))
+                length += len(added)
+            terms[term] = (offset, length)
+            offset += length
+
+        if not doc_parts:
+            return terms, np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        return terms, np.concatenate(doc_parts), np.concatenate(tf_parts)
+
+    def _commit(self, terms, postings_docs, postings_tf, doc_ids, doc_lengths,
+                doc_types, deleted, type_names):
+        """Compact if needed, write a new version and make it CURRENT"""
+        if len(deleted) and deleted.sum() / len(deleted) > COMPACT_DELETED_RATIO:
+            terms, postings_docs, postings_tf, doc_ids, doc_lengths, doc_types, deleted = self._compact(
+                terms, postings_docs, postings_tf, doc_ids, doc_lengths, doc_types, deleted
+            )
+
+        version = f"v{time.time_ns()}"
+        version_dir = os.path.join(self.path, version)
+        os.makedirs(version_dir)
+        np.save(os.path.join(version_dir, "postings_docs.npy"), np.asarray(postings_docs, dtype=np.int32))
+        np.save(os.path.join(version_dir, "postings_tf.npy"), np.asarray(postings_tf, dtype=np.float32))
+        np.save(os.path.join(version_dir, "doc_lengths.npy"), np.asarray(doc_lengths, dtype=np.float32))
+        np.save(os.path.join(version_dir, "doc_types.npy"), np.asarray(doc_types, dtype=np.uint8))
+        np.save(os.path.join(version_dir, "deleted.npy"), np.asarray(deleted, dtype=bool))
+        with open(os.path.join(version_dir, "meta.json"), "w") as meta_file:
+            json.dump({
+                "terms": {term: list(entry) for term, entry in terms.items()},
+                "doc_ids": list(doc_ids),
+                "type_names": list(type_names),
+                "k1": self.k1,
+                "b": self.b,
+            }, meta_file)
+
+        # Atomic switch: readers see either the old or the new version
+        tmp_current = self._current_file + ".tmp"
+        with open(tmp_current, "w") as current:
+            current.write(version)
+        os.replace(tmp_current, self._current_file)
+
+        self._maybe_reload()
+        self._remove_old_versions(current=version)
+
+    def _remove_old_versions(self, current: str):
+        """
+        Delete versions retired more than RETIRED_VERSION_GRACE seconds ago
+
+        A version is retired when the next one is committed (its name holds the
+        commit time). Readers already mapping a deleted version keep working;
+        the grace period covers readers that read CURRENT before the switch
+        and open the files after it.
+        """
+        versions = sorted((entry for entry in os.listdir(self.path) if entry.startswith("v")),
+                          key=lambda entry: int(entry[1:]))
+        cutoff = time.time_ns() - int(RETIRED_VERSION_GRACE * 1e9)
+        for version, successor in zip(versions, versions[1:]):
+            if version != current and int(successor[1:]) < cutoff:
+                shutil.rmtree(os.path.join(self.path, version), ignore_errors=True)
+
+    @staticmethod
+    def _compact(terms, postings_docs, postings_tf, doc_ids, doc_lengths, doc_types, deleted):
+        """Drop tombstoned documents and renumber the survivors"""
+        keep = ~np.asarray(deleted)
+        remap = (np.cumsum(keep) - 1).astype(np.int32)
+
+        new_terms: Dict[str, Tuple[int, int]] = {}
+        doc_parts, tf_parts = [], []
+        offset = 0
+        for term, (start, count) in terms.items():
+            docs = np.asarray(postings_docs[start:start + count])
+            alive = keep[docs]
+            if not alive.any():
+                continue
+            doc_parts.append(remap[docs[alive]])
+            tf_parts.append(np.asarray(postings_tf[start:start + count])[alive])
+            new_terms[term] = (offset, int(alive.sum()))
+            offset += int(alive.sum())
+
+        return (
+            new_terms,
+            np.concatenate(doc_parts) if doc_parts else np.empty(0, dtype=np.int32),
+            np.concatenate(tf_parts) if tf_parts else np.empty(0, dtype=np.float32),
+            [doc_id for doc_id, alive in zip(doc_ids, keep) if alive],
+            np.asarray(doc_lengths)[keep],
+            np.asarray(doc_types)[keep],
+            np.zeros(int(keep.sum()), dtype=bool),
+        )
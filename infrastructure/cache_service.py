@@ -1,56 +1,266 @@
+import asyncio
 import json
-import redis
-from typing import Optional, Any
+import logging
+import hashlib
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Optional, Any, Dict, List, Tuple
+import redis.asyncio as aioredis
 from core.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Sorted set of normalised questions scored by how often they were asked
+POPULAR_QUESTIONS_KEY = "scholarship:popular_questions"
+# Ask counts are added up in process and written to Redis this often
+QUESTION_COUNT_FLUSH_SECONDS = 5.0
+# Connections held outside request handling: the pub/sub listener and the question count flush
+BACKGROUND_CONNECTIONS = 2
+
+
+class LocalCache:
+    """Size-bounded in-process LRU with per-entry TTL (the L1 tier in front of Redis)"""
+
+    def __init__(self, max_items: int, ttl: int):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        if self.max_items <= 0:
+            return
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def invalidate(self, keys: List[str]):
+        for key in keys:
+            self._items.pop(key, None)
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
 class CacheService:
     def __init__(self):
-        self.redis_client = redis.from_url(settings.REDIS_URL)
+        # One bounded pool per service; connections are reused across requests.
+        # When all are busy a command waits briefly for one instead of failing
+        # outright, which would turn every lookup into a miss under load.
+        self._pool = aioredis.BlockingConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS + BACKGROUND_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT
+        )
+        self.redis_client = aioredis.Redis(connection_pool=self._pool)
         self.ttl = settings.CACHE_TTL
+        self.local_cache = LocalCache(settings.LOCAL_CACHE_MAX_ITEMS, min(settings.LOCAL_CACHE_TTL, self.ttl))
+
+        # Invalidation messages from this instance are ignored by its own listener
+        self._instance_id = uuid.uuid4().hex
+        self._listener_task: Optional[asyncio.Task] = None
+        self._question_counts: Counter = Counter()
+        self._question_count_task: Optional[asyncio.Task] = None
 
     async def get(self, key: str) -> Optional[Any]:
-        """Get value from cache"""
+        """Get value from cache (L1 first, then Redis)"""
+        value = self.local_cache.get(key)
+        if value is not None:
+            return value
+
+        self._ensure_invalidation_listener()
         try:
-            value = self.redis_client.get(key)
-            if value:
-                return json.loads(value)
+            raw = await self.redis_client.get(key)
+            if raw:
+                value = json.loads(raw)
+                self.local_cache.set(key, value)
+                return value
             return None
         except Exception as e:
-            print(f"Cache get error: {e}")
+            logger.warning("Cache get error: %s", e)
             return None
 
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get several values with one MGET for the L1 misses"""
+        values: List[Optional[Any]] = [self.local_cache.get(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if not missing:
+            return values
+
+        self._ensure_invalidation_listener()
+        try:
+            raws = await self.redis_client.mget([keys[i] for i in missing])
+            for i, raw in zip(missing, raws):
+                if raw:
+                    values[i] = json.loads(raw)
+                    self.local_cache.set(keys[i], values[i])
+        except Exception as e:
+            logger.warning("Cache get_many error: %s", e)
+        return values
+
     async def set(self, key: str, value: Any) -> bool:
         """Set value in cache with TTL"""
         try:
             serialized_value = json.dumps(value)
-            return self.redis_client.setex(key, self.ttl, serialized_value)
+            result = await self.redis_client.setex(key, self.ttl, serialized_value)
+            self.local_cache.set(key, value)
+            await self._publish_invalidation([key])
+            return bool(result)
         except Exception as e:
-            print(f"Cache set error: {e}")
+            logger.warning("Cache set error: %s", e)
+            return False
+
+    async def set_many(self, items: Dict[str, Any]) -> bool:
+        """Set several values in one pipelined round trip"""
+        if not items:
+            return True
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.setex(key, self.ttl, json.dumps(value))
+                await pipe.execute()
+            for key, value in items.items():
+                self.local_cache.set(key, value)
+            await self._publish_invalidation(list(items))
+            return True
+        except Exception as e:
+            logger.warning("Cache set_many error: %s", e)
             return False
 
     async def delete(self, key: str) -> bool:
         """Delete value from cache"""
+        self.local_cache.invalidate([key])
         try:
-            return self.redis_client.delete(key) > 0
+            deleted = await self.redis_client.delete(key) > 0
+            await self._publish_invalidation([key])
+            return deleted
         except Exception as e:
-            print(f"Cache delete error: {e}")
+            logger.warning("Cache delete error: %s", e)
             return False
 
+    async def ping(self) -> bool:
+        """Open a pooled connection to Redis (raises if it is unreachable)"""
+        return await self.redis_client.ping()
+
+    def record_questions(self, questions: List[str]):
+        """
+        Count asks per question - the counts pick what a restarting worker primes
+
+        Counts are kept in process and written in one pipeline every
+        QUESTION_COUNT_FLUSH_SECONDS, so asking costs no Redis round trip.
+        """
+        self._question_counts.update(self.normalise_question(question) for question in questions)
+        if self._question_count_task is None or self._question_count_task.done():
+            self._question_count_task = asyncio.get_running_loop().create_task(self._flush_question_counts_later())
+
+    async def _flush_question_counts_later(self):
+        await asyncio.sleep(QUESTION_COUNT_FLUSH_SECONDS)
+        await self._flush_question_counts()
+
+    async def _flush_question_counts(self):
+        counts, self._question_counts = self._question_counts, Counter()
+        if not counts:
+            return
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for question, count in counts.items():
+                    pipe.zincrby(POPULAR_QUESTIONS_KEY, count, question)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("Question count error: %s", e)
+
+    async def popular_questions(self, limit: int) -> List[str]:
+        """Most-asked questions first (the tally is trimmed to STARTUP_REPLAY_TRACKED questions)"""
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.zremrangebyrank(POPULAR_QUESTIONS_KEY, 0, -(settings.STARTUP_REPLAY_TRACKED + 1))
+                pipe.zrevrange(POPULAR_QUESTIONS_KEY, 0, limit - 1)
+                _, questions = await pipe.execute()
+            return [question.decode() if isinstance(question, bytes) else question for question in questions]
+        except Exception as e:
+            logger.warning("Popular questions error: %s", e)
+            return []
+
+    async def close(self):
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            self._listener_task = None
+        if self._question_count_task is not None:
+            self._question_count_task.cancel()
+            self._question_count_task = None
+            await self._flush_question_counts()
+        await self.redis_client.aclose()
+
+    async def _publish_invalidation(self, keys: List[str]):
+        """Tell other workers to drop these keys from their L1"""
+        message = json.dumps({"origin": self._instance_id, "keys": keys})
+        try:
+            await self.redis_client.publish(settings.CACHE_INVALIDATION_CHANNEL, message)
+        except Exception as e:
+            logger.warning("Cache invalidation publish error: %s", e)
+
+    def _ensure_invalidation_listener(self):
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.get_running_loop().create_task(self._listen_for_invalidations())
+
+    async def _listen_for_invalidations(self):
+        """Evict L1 entries that another worker changed; reconnects if Redis drops"""
+        while True:
+            try:
+                async with self.redis_client.pubsub() as pubsub:
+                    await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message.get("type") != "message":
+                            continue
+                        payload = json.loads(message["data"])
+                        if payload.get("origin") != self._instance_id:
+                            self.local_cache.invalidate(payload.get("keys", []))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Without the listener L1 entries can be stale for up to LOCAL_CACHE_TTL
+                self.local_cache.clear()
+                await asyncio.sleep(5)
+
+    @staticmethod
+    def _stable_hash(value: str) -> str:
+        # hash() is salted per process; a content hash is identical in every worker and after restarts
+        return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def normalise_question(question: str) -> str:
+        return " ".join(question.lower().split())
+
     def generate_question_key(self, question: str) -> str:
         """Generate cache key for scholarship questions"""
         # Normalize the question for consistent caching
-        normalized = question.lower().strip()
-        return f"scholarship:question:{hash(normalized)}"
+        return f"scholarship:question:{self._stable_hash(self.normalise_question(question))}"
 
-    def generate_eligibility_key(self, student_data: dict) -> str:
-        """Generate cache key for eligibility checks"""
+    def generate_eligibility_key(self, student_data: dict, criteria_fingerprint: str = "") -> str:
+        """Generate cache key for eligibility checks (criteria_fingerprint: the criteria table it was decided with)"""
         # Create a deterministic key from student data
         key_parts = [
             str(student_data.get('gpa', '')),
             str(student_data.get('income', '')),
             student_data.get('program', ''),
             student_data.get('nationality', ''),
-            student_data.get('academic_level', '')
+            student_data.get('academic_level', ''),
+            criteria_fingerprint
         ]
         key_string = '|'.join(key_parts)
-        return f"scholarship:eligibility:{hash(key_string)}"
\ No newline at end of file
+        return f"scholarship:eligibility:{self._stable_hash(key_string)}"
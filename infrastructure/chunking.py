@@ -0,0 +1,275 @@
+"""
+Chunking for ingestion.
+
+Chunks are sized in LLM tokens and every chunk carries its token count, so
+prompt assembly can pack context to a token budget without tokenizing again.
+Like text_extraction, this module stays free of heavy imports because it
+runs in the extraction worker processes.
+"""
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from core.config import settings
+from infrastructure.text_extraction import extract_page_range
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Rough stand-in for a BPE tokenizer: words, numbers and single punctuation marks
+_TOKEN_ESTIMATE_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+_NUMBERED_HEADING = re.compile(r"^(?:\d+(?:\.\d+)*\.?|[IVX]+\.|(?:section|chapter|part|article)\s+\w+)\s+\S", re.I)
+
+
+class TextChunk(NamedTuple):
+    text: str
+    token_count: int
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:  # e.g. the BPE file cannot be downloaded
+        logger.warning("tiktoken encoding %s unavailable (%s), estimating token counts", name, e.__class__.__name__)
+        return None
+
+
+def tokenizer_name() -> str:
+    """Name of the tokenizer count_tokens uses here"""
+    return settings.TOKENIZER_ENCODING if _encoding(settings.TOKENIZER_ENCODING) else "regex"
+
+
+def count_tokens(text: str) -> int:
+    """LLM token count (tiktoken when available, otherwise a regex estimate)"""
+    encoding = _encoding(settings.TOKENIZER_ENCODING)
+    if encoding is not None:
+        return len(encoding.encode_ordinary(text))
+    return sum(1 for _ in _TOKEN_ESTIMATE_PATTERN.finditer(text))
+
+
+class Chunker:
+    """Splits page text into chunks; subclasses implement chunk()"""
+
+    name = "base"
+
+    def chunk(self, text: str) -> Iterator[TextChunk]:
+        raise NotImplementedError
+
+    @property
+    def signature(self) -> str:
+        """Changes whenever the same text would be chunked differently"""
+        return f"{self.name}:{tokenizer_name()}"
+
+
+class WordWindowChunker(Chunker):
+    """
+    The original fixed word windows:
+    - chunk_size=150: About 1/3 of a page - perfect for precise answers
+    - overlap=30: Ensures context isn't lost between chunks
+    """
+
+    name = "words"
+
+    def __init__(self, chunk_size: int = 150, overlap: int = 30):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}:{self.chunk_size}:{self.overlap}:{tokenizer_name()}"
+
+    def chunk(self, text: str) -> Iterator[TextChunk]:
+        if not text or not text.strip():
+            return
+
+        words = text.split()
+        start = 0
+        while start < len(words):
+            end = min(start + self.chunk_size, len(words))
+            chunk_text = ' '.join(words[start:end])
+            yield TextChunk(chunk_text, count_tokens(chunk_text))
+            if end == len(words):
+                break
+            start = end - self.overlap  # Overlap for context
+
+
+class StructuredChunker(Chunker):
+    """
+    Chunks that follow the document's structure.
+
+    Text is split into sections (at headings), paragraphs (at blank lines)
+    and sentences; table-like blocks of short lines are split per line so
+    rows stay intact. Units are packed greedily up to max_tokens. A new
+    section starts a new chunk once the current one is reasonably full, and
+    consecutive chunks of a section share up to overlap_tokens of trailing
+    sentences. Units longer than max_tokens are cut into equal word windows.
+    """
+
+    name = "structured"
+
+    def __init__(self, max_tokens: int = 200, overlap_tokens: int = 30):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_section_tokens = max_tokens // 4
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}:{self.max_tokens}:{self.overlap_tokens}:{tokenizer_name()}"
+
+    def chunk(self, text: str) -> Iterator[TextChunk]:
+        units: List[Tuple[str, int]] = []
+        tokens = 0
+
+        def flush(keep_overlap: bool) -> Optional[TextChunk]:
+            nonlocal units, tokens
+            if not units:
+                return None
+            chunk = TextChunk(' '.join(unit for unit, _ in units), tokens)
+            carried: List[Tuple[str, int]] = []
+            if keep_overlap:
+                carried_tokens = 0
+                for unit, unit_tokens in reversed(units[1:]):
+                    if carried_tokens + unit_tokens > self.overlap_tokens:
+                        break
+                    carried.insert(0, (unit, unit_tokens))
+                    carried_tokens += unit_tokens
+            units = carried
+            tokens = sum(unit_tokens for _, unit_tokens in carried)
+            return chunk
+
+        for is_heading, unit in self._units(text):
+            if is_heading and tokens >= self.min_section_tokens:
+                chunk = flush(keep_overlap=False)
+                if chunk:
+                    yield chunk
+
+            for piece, piece_tokens in self._fit(unit):
+                if units and tokens + piece_tokens > self.max_tokens:
+                    chunk = flush(keep_overlap=True)
+                    if chunk:
+                        yield chunk
+                    # Drop the overlap if it leaves no room for the next piece
+                    if tokens + piece_tokens > self.max_tokens:
+                        units, tokens = [], 0
+                units.append((piece, piece_tokens))
+                tokens += piece_tokens
+
+        chunk = flush(keep_overlap=False)
+        if chunk:
+            yield chunk
+
+    def _fit(self, unit: str) -> Iterator[Tuple[str, int]]:
+        """The unit itself, or equal word windows if it exceeds max_tokens"""
+        unit_tokens = count_tokens(unit)
+        if unit_tokens <= self.max_tokens:
+            yield unit, unit_tokens
+            return
+        words = unit.split()
+        parts = math.ceil(unit_tokens / self.max_tokens)
+        size = math.ceil(len(words) / parts)
+        for start in range(0, len(words), size):
+            piece = ' '.join(words[start:start + size])
+            yield piece, count_tokens(piece)
+
+    @classmethod
+    def _units(cls, text: str) -> Iterator[Tuple[bool, str]]:
+        """(is_heading, text) for every heading, sentence or table row"""
+        block: List[str] = []
+        for raw_line in text.splitlines():
+            line = raw_line.strip()
+            if not line:
+                yield from cls._block_units(block)
+                block = []
+            elif cls._is_heading(line):
+                yield from cls._block_units(block)
+                block = []
+                yield True, line
+            else:
+                block.append(line)
+        yield from cls._block_units(block)
+
+    @staticmethod
+    def _block_units(lines: List[str]) -> Iterator[Tuple[bool, str]]:
+        if not lines:
+            return
+        # Tables and lists: mostly short lines without sentence punctuation
+        short = sum(1 for line in lines if len(line.split()) <= 6 and not line.endswith(('.', ':', ';', ',')))
+        if len(lines) >= 3 and short * 2 > len(lines):
+            for line in lines:
+                yield False, line
+            return
+        paragraph = _join_lines(lines)
+        for sentence in _SENTENCE_END.split(paragraph):
+            if sentence.strip():
+                yield False, sentence.strip()
+
+    @staticmethod
+    def _is_heading(line: str) -> bool:
+        words = line.split()
+        if not words or len(words) > 12 or line.endswith(('.', ',', ';')):
+            return False
+        if line.startswith('#') or _NUMBERED_HEADING.match(line):
+            return True
+        letters = [c for c in line if c.isalpha()]
+        return len(letters) >= 4 and all(c.isupper() for c in letters)
+
+
+def _join_lines(lines: List[str]) -> str:
+    """Join wrapped lines, re-attaching words hyphenated across a line break"""
+    parts: List[str] = []
+    for line in lines:
+        if parts and parts[-1].endswith('-') and line[:1].islower():
+            parts[-1] = parts[-1][:-1] + line
+        else:
+            parts.append(line)
+    return ' '.join(parts)
+
+
+_CHUNKERS: Dict[str, Callable[[], Chunker]] = {
+    "words": lambda: WordWindowChunker(),
+    "structured": lambda: StructuredChunker(settings.CHUNK_MAX_TOKENS, settings.CHUNK_OVERLAP_TOKENS),
+}
+
+
+def register_chunker(name: str, factory: Callable[[], Chunker]):
+    """Make a custom chunker selectable with CHUNKER=<name>"""
+    _CHUNKERS[name] = factory
+    get_chunker.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def get_chunker(name: Optional[str] = None) -> Chunker:
+    name = name or settings.CHUNKER
+    if name not in _CHUNKERS:
+        raise ValueError(f"Unknown chunker: {name} (available: {', '.join(_CHUNKERS)})")
+    return _CHUNKERS[name]()
+
+
+def iter_page_chunks(pages: Iterable[Tuple[int, str]],
+                     chunker: Optional[Chunker] = None) -> Iterator[Tuple[int, TextChunk]]:
+    """(page number, chunk) for every chunk of every page"""
+    chunker = chunker or get_chunker()
+    for page_number, text in pages:
+        for chunk in chunker.chunk(text):
+            yield page_number, chunk
+
+
+def chunk_page_range(file_path: str, start: int, end: int) -> Tuple[int, List[Tuple[int, TextChunk]]]:
+    """
+    Extract and chunk pages [start, end) in one worker task
+
+    Returns:
+        (number of pages with text, [(page number, chunk), ...])
+    """
+    pages = extract_page_range(file_path, start, end)
+    return len(pages), list(iter_page_chunks(pages))
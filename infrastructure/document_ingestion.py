@@ -1,222 +1,141 @@
+import asyncio
+import logging
 import os
-import hashlib
-from typing import List
-import warnings
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from domain import DocumentChunk, DocumentType
 from infrastructure.vector_store_service import VectorStoreService
 from infrastructure.embedding_service import EmbeddingService  # Local embeddings!
+from infrastructure.chunking import TextChunk
+from infrastructure.eligibility_criteria import CRITERIA_QUERY, CriteriaStore, CriteriaTable, parse_criteria
+from infrastructure.ingestion_manifest import IngestionManifest, chunk_content_hash, document_chunk_id
+from infrastructure.ingestion_pipeline import IngestionJob, IngestionPipeline
+from infrastructure.text_extraction import SUPPORTED_EXTENSIONS, iter_pages
 
-try:
-    import fitz
-except ImportError:
-    fitz = None
-
-try:
-    import PyPDF2
-except ImportError:
-    PyPDF2 = None
-
-try:
-    import docx
-except ImportError:
-    docx = None
+logger = logging.getLogger(__name__)
 
 class DocumentIngestionService:
     def __init__(self):
-        self.vector_store = VectorStoreService()
-        self.embedding_service = EmbeddingService()  # Local embeddings
-        print("✅ Document Ingestion Service initialized with local embeddings")
-
-    async def ingest_document(self, file_path: str, source_name: str, document_type: DocumentType):
+        self.embedding_service = EmbeddingService()  # Local embeddings (shared model)
+        self.vector_store = VectorStoreService(embedding_service=self.embedding_service)
+        self.manifest = IngestionManifest()
+        self.criteria_store = CriteriaStore(manifest_path=self.manifest.path)
+        self.current_pipeline: Optional[IngestionPipeline] = None
+        logger.info("Document ingestion service initialized")
+
+    async def ingest_document(self, file_path: str, source_name: str, document_type: DocumentType,
+                              force: bool = False):
         """
         Ingest a document into vector database
 
+        Unchanged files are skipped, and for changed files only new chunks are
+        embedded; chunks that disappeared from the file are deleted.
+
         Args:
             file_path: Path to PDF/Word/TXT file
             source_name: Name of the document (e.g., "financial_aid_2024")
             document_type: Type of the document
+            force: Re-process the file even if the manifest says it is unchanged
 
         Returns:
-            Number of chunks stored
+            Number of chunks embedded and stored
         """
-        print(f"\n📥 Ingesting document: {source_name} from {file_path}")
-        print(f"📚 Document type: {document_type.value}")
-
-        if not os.path.exists(file_path):
-            print(f"❌ File not found: {file_path}")
-            return 0
-
-        try:
-            # 1. Extract text from file
-            text_chunks = self._extract_text_from_file(file_path)
-            if not text_chunks:
-                print(f"⚠️ No text extracted from {source_name}")
-                return 0
-            print(f"   📄 Extracted {len(text_chunks)} text chunks")
-
-            # 2. Create document chunks
-            document_chunks = self._create_document_chunks(
-                text_chunks,
-                document_type=document_type,
-                source=source_name,
-                file_path=file_path
-            )
-            print(f"   🔧 Created {len(document_chunks)} document chunks")
-
-            # 3. Store in vector database
-            await self.vector_store.add_documents(document_chunks)
-            print(f"✅ Successfully stored {len(document_chunks)} chunks from {source_name}")
-
-            return len(document_chunks)
+        logger.info("Ingesting document %s from %s", source_name, file_path,
+                    extra={"document_type": document_type.value})
+        return await self.ingest_files([IngestionJob(file_path, source_name, document_type)], force=force)
 
-        except Exception as e:
-            print(f"❌ Error ingesting {source_name}: {str(e)}")
-            return 0
-
-    def _extract_text_from_file(self, file_path: str) -> List[str]:
-        """Extract text from various file formats"""
-        text_chunks = []
-        
-        try:
-            if file_path.lower().endswith('.pdf'):
-                # Use pymupdf for better PDF extraction
-                if fitz is not None:
-                    return self._extract_text_with_pymupdf(file_path)
-                else:
-                    print("   ⚠️ pymupdf not available, falling back to PyPDF2")
-                    return self._extract_text_with_pypdf2(file_path)
-                    
-            elif file_path.lower().endswith('.txt'):
-                return self._extract_text_from_txt(file_path)
-                
-            elif file_path.lower().endswith('.docx'):
-                return self._extract_text_from_docx(file_path)
-                
-            else:
-                print(f"   ⚠️ Unsupported file format: {file_path}")
-                return []
-                
-        except Exception as e:
-            print(f"   ❌ Error extracting text from {file_path}: {str(e)}")
-            return []
-
-    def _extract_text_with_pymupdf(self, file_path: str) -> List[str]:
-        """Extract text using pymupdf (more robust)"""
-        text_chunks = []
-        try:
-            doc = fitz.open(file_path)
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text()
-                if text and text.strip():
-                    chunks = self._split_text_into_chunks(text)
-                    text_chunks.extend(chunks)
-            doc.close()
-            print(f"   📖 Read {len(doc)} pages with pymupdf")
-        except Exception as e:
-            print(f"   ⚠️ pymupdf error: {e}")
-            text_chunks = self._extract_text_with_pypdf2(file_path)
-        return text_chunks
-
-    def _extract_text_with_pypdf2(self, file_path: str) -> List[str]:
-        """Extract text using PyPDF2 (fallback)"""
-        text_chunks = []
-        try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page_num, page in enumerate(pdf_reader.pages):
-                    try:
-                        text = page.extract_text()
-                        if text and text.strip():
-                            chunks = self._split_text_into_chunks(text)
-                            text_chunks.extend(chunks)
-                    except Exception as e:
-                        print(f"   ⚠️ Error reading page {page_num}: {e}")
-                print(f"   📖 Read {len(pdf_reader.pages)} pages with PyPDF2")
-        except Exception as e:
-            print(f"   ❌ PyPDF2 error: {e}")
-        return text_chunks
-
-    def _extract_text_from_txt(self, file_path: str) -> List[str]:
-        """Extract text from TXT file"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                text = file.read()
-                if text.strip():
-                    chunks = self._split_text_into_chunks(text)
-                    return chunks
-        except Exception as e:
-            print(f"   ❌ Error reading TXT file: {e}")
-        return []
+    async def ingest_files(self, jobs: List[IngestionJob], force: bool = False) -> int:
+        """
+        Ingest several files concurrently through the staged pipeline
 
-    def _extract_text_from_docx(self, file_path: str) -> List[str]:
-        """Extract text from DOCX file"""
-        if docx is None:
-            print("   ⚠️ python-docx not installed. Install with: pip install python-docx")
+        Returns:
+            Number of chunks embedded and stored
+        """
+        pipeline = IngestionPipeline(self, force=force)
+        self.current_pipeline = pipeline
+        stored = await pipeline.run(jobs)
+        await self.refresh_eligibility_criteria()
+        return stored
+
+    def progress(self) -> List[Dict[str, Any]]:
+        """Per-file progress of the current (or last) ingestion run"""
+        if self.current_pipeline is None:
             return []
-        try:
-            doc = docx.Document(file_path)
-            full_text = []
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    full_text.append(para.text)
-            text = '\n'.join(full_text)
-            if text.strip():
-                chunks = self._split_text_into_chunks(text)
-                return chunks
-        except Exception as e:
-            print(f"   ❌ Error reading DOCX file: {e}")
-        return []
+        return self.current_pipeline.snapshot()
 
-    def _split_text_into_chunks(self, text: str, chunk_size: int = 150, overlap: int = 30) -> List[str]:
-        """
-        OPTIMAL settings for scholarship Q&A:
-        - chunk_size=150: About 1/3 of a page - perfect for precise answers
-        - overlap=30: Ensures context isn't lost between chunks
+    async def remove_missing_files(self, directory_path: str, document_type: DocumentType) -> int:
+        """Delete chunks of manifest files that no longer exist in the directory"""
+        removed = 0
+        for record in self.manifest.files_under(directory_path):
+            if record.document_type != document_type.value or os.path.exists(record.file_path):
+                continue
+            logger.info("%s was removed, deleting %d chunks", os.path.basename(record.file_path), len(record.chunk_ids))
+            await self.vector_store.delete_documents(record.chunk_ids, DocumentType(record.document_type))
+            self.manifest.remove(record.file_path)
+            removed += len(record.chunk_ids)
+        if removed:
+            self.manifest.save()
+            await self.refresh_eligibility_criteria()
+        return removed
+
+    async def refresh_eligibility_criteria(self, force: bool = False) -> CriteriaTable:
         """
-        if not text or not text.strip():
-            return []
-            
-        words = text.split()
-        if len(words) <= chunk_size:
-            return [' '.join(words)]
-        
-        chunks = []
-        start = 0
-        
-        while start < len(words):
-            end = min(start + chunk_size, len(words))
-            chunk = ' '.join(words[start:end])
-            chunks.append(chunk)
-            start = start + chunk_size - overlap  # Overlap for context
-            
-        print(f"   ✂️  Split text into {len(chunks)} chunks (size: {chunk_size}, overlap: {overlap})")
-        return chunks
+        Rebuild the eligibility criteria table if the scholarship documents changed
 
-    def _create_document_chunks(self, text_chunks: List[str],
+        The criteria are parsed from the documents themselves (the chunks
+        lose the line layout the parser relies on), and the chunks retrieved
+        for the criteria query are recorded so explained checks need no
+        search at request time.
+        """
+        fingerprint = self.manifest.fingerprint(document_type=DocumentType.SCHOLARSHIP.value)
+        table = self.criteria_store.load()
+        if table is not None and table.fingerprint == fingerprint and not force:
+            return table
+
+        rules = []
+        for record in self.manifest.records(document_type=DocumentType.SCHOLARSHIP.value):
+            source = os.path.splitext(os.path.basename(record.file_path))[0]
+            pages = (page_text for _, page_text in iter_pages(record.file_path))
+            rules.extend(await asyncio.to_thread(parse_criteria, pages, source))
+
+        context = await self.vector_store.search(CRITERIA_QUERY, document_type=DocumentType.SCHOLARSHIP, limit=10)
+        table = CriteriaTable(
+            fingerprint=fingerprint,
+            rules=rules,
+            context_chunks=[(result.chunk.id, result.score) for result in context]
+        )
+        self.criteria_store.save(table)
+        logger.info("Eligibility criteria table rebuilt: %d schemes", len(rules))
+        return table
+
+    def _iter_document_chunks(self, page_chunks: Iterable[Tuple[int, TextChunk]],
                               document_type: DocumentType,
                               source: str,
-                              file_path: str) -> List[DocumentChunk]:
-        """Convert text chunks to DocumentChunk objects"""
-        if not text_chunks:
-            return []
-            
-        document_chunks = []
+                              file_path: str,
+                              seen_ids: Set[str]) -> Iterator[DocumentChunk]:
+        """
+        Convert (page number, chunk) pairs to DocumentChunk objects lazily
+
+        seen_ids holds the ids already produced for this file; it is updated
+        in place so repeated text is dropped across calls, and its size gives
+        each chunk's index within the file.
+        """
         file_size = os.path.getsize(file_path)
         file_ext = os.path.splitext(file_path)[1].lower()
-        
-        print(f"   📊 File info: {file_ext.upper()} file, {file_size:,} bytes")
-        
-        for i, chunk_text in enumerate(text_chunks):
+
+        for page_number, (chunk_text, token_count) in page_chunks:
             if not chunk_text or not chunk_text.strip():
                 continue
-                
-            # Create unique ID for each chunk
-            content_hash = hashlib.md5(chunk_text.encode()).hexdigest()[:8]
-            chunk_id = f"{source}_{i}_{content_hash}"
-            
-            document_chunk = DocumentChunk(
+
+            # Content-addressed ID: stable across re-runs regardless of position
+            content_hash = chunk_content_hash(chunk_text)
+            chunk_id = document_chunk_id(document_type.value, source, content_hash)
+            if chunk_id in seen_ids:
+                continue  # Identical text repeated within the file (e.g. boilerplate)
+            chunk_index = len(seen_ids)
+            seen_ids.add(chunk_id)
+
+            yield DocumentChunk(
                 id=chunk_id,
                 content=chunk_text,
                 metadata={
@@ -225,51 +144,51 @@ class DocumentIngestionService:
                     "file_path": file_path,
                     "file_size": file_size,
                     "file_type": file_ext,
-                    "chunk_index": i,
-                    "total_chunks": len(text_chunks),
+                    "chunk_index": chunk_index,
+                    "page_number": page_number,
                     "chunk_hash": content_hash,
                     "document_type": document_type.value,
-                    "word_count": len(chunk_text.split())
+                    "word_count": len(chunk_text.split()),
+                    "token_count": token_count
                 },
                 document_type=document_type,
-                source=source
+                source=source,
+                page_number=page_number
             )
-            document_chunks.append(document_chunk)
-        
-        return document_chunks
 
-    async def ingest_directory(self, directory_path: str, document_type: DocumentType):
+    async def ingest_directory(self, directory_path: str, document_type: DocumentType, force: bool = False):
         """
         Ingest all documents in a directory
         
         Args:
             directory_path: Path to directory containing documents
             document_type: Type of documents (e.g., DocumentType.SCHOLARSHIP)
+            force: Re-process files even if unchanged
         """
         if not os.path.exists(directory_path):
-            print(f"❌ Directory not found: {directory_path}")
+            logger.error("Directory not found: %s", directory_path)
             return 0
         
-        print(f"\n📁 Processing directory: {directory_path}")
-        print(f"📚 Document type: {document_type.value}")
-        
-        supported_extensions = ['.pdf', '.txt', '.docx']
-        total_chunks = 0
-        
         files = [f for f in os.listdir(directory_path) 
                 if os.path.isfile(os.path.join(directory_path, f))]
         
-        print(f"📄 Found {len(files)} files in directory")
-        
-        for filename in files:
-            file_ext = os.path.splitext(filename)[1].lower()
-            if file_ext in supported_extensions:
-                file_path = os.path.join(directory_path, filename)
-                source_name = os.path.splitext(filename)[0]
-                
-                chunks = await self.ingest_document(file_path, source_name, document_type)
-                total_chunks += chunks
-        
-        print(f"\n🎉 Directory ingestion complete!")
-        print(f"📊 Total chunks stored: {total_chunks}")
+        logger.info("Processing directory %s: %d files", directory_path, len(files),
+                    extra={"document_type": document_type.value})
+
+        jobs = [
+            IngestionJob(
+                file_path=os.path.join(directory_path, filename),
+                source_name=os.path.splitext(filename)[0],
+                document_type=document_type
+            )
+            for filename in files
+            if os.path.splitext(filename)[1].lower() in SUPPORTED_EXTENSIONS
+        ]
+        # Files that were ingested before but have since been deleted
+        await self.remove_missing_files(directory_path, document_type)
+
+        total_chunks = await self.ingest_files(jobs, force=force)
+
+        logger.info("Directory ingestion complete: %d chunks stored", total_chunks,
+                    extra={"directory": directory_path})
         return total_chunks
\ No newline at end of file
@@ -0,0 +1,275 @@
+"""
+Structured scholarship eligibility criteria.
+
+Policy documents are parsed once, at ingestion time, into a table of
+rules (GPA cut-offs and bands, income limits, academic level,
+nationality, conditions that need a human to verify). The table is saved
+as JSON together with the fingerprint of the scholarship documents it was
+built from, so any change to those documents makes it stale.
+"""
+import itertools
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, asdict, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core.config import settings
+from infrastructure.ingestion_manifest import IngestionManifest
+
+logger = logging.getLogger(__name__)
+
+# Query whose results are kept as LLM context for explained eligibility checks
+CRITERIA_QUERY = "eligibility criteria requirements GPA income"
+
+_CATEGORY = re.compile(r"^([A-E])\.\s+([A-Z][A-Z &/-]{3,})$")
+_ITEM = re.compile(r"^(\d{1,2})\.\s+([A-Za-z].*)$")
+_END_OF_ITEMS = re.compile(r"^(?:\*+\s*)?General Rules", re.I)
+_PAGE_FOOTER = re.compile(r"^Page \d+ of \d+$", re.I)
+_WAIVER = re.compile(r"Tuition Fee Waiver:[ \t]*([^;\n]*%)", re.I)
+_PERCENT = re.compile(r"(\d{1,3})\s*%")
+_MIN_GPA = re.compile(r"CGPA[^:\n]*:\s*[^\n]*?(\d\.\d{2})", re.I)
+_GPA_BAND = re.compile(r"(\d\.\d{2})\s*-\s*(\d\.\d{2})\s*\n\s*(\d{1,3})\s*%")
+_GPA_AND_ABOVE = re.compile(r"(\d\.\d{2}) and above\)?\s*:\s*(\d{1,3})\s*%", re.I)
+_GENERAL_RATE = re.compile(r"\(general\)\s*:\s*(\d{1,3})\s*%", re.I)
+_MAX_INCOME = re.compile(
+    r"income[^.\n]*?(?:below|under|less than|not exceeding|not more than|up to|maximum of)\s*"
+    r"(?:BDT|Tk\.?|USD|\$)?\s*([\d,]+)", re.I
+)
+_NATIONALITY = re.compile(r"\b(bangladeshi|international|foreign)\s+(?:students?|nationals?|citizens?)\b", re.I)
+_CONDITION = re.compile(
+    r"^(?:[a-z]\.\s*)?((?:Pre-?conditions?|Eligibility|Quota based waiver|Application)\s*:.*)$", re.I
+)
+_CREDITS_COMPLETED = re.compile(r"after completion of \d+ credit hours", re.I)
+# PDF bullet glyphs from the private use area
+_BULLETS = re.compile(r"[\ue000-\uf8ff\u2022]")
+
+
+@dataclass
+class GpaBand:
+    low: float
+    high: float
+    waiver_percent: int
+
+
+@dataclass
+class ScholarshipRule:
+    name: str
+    category: str
+    source: str
+    academic_level: Optional[str] = None  # "undergraduate", "graduate" or None (any)
+    waiver: Optional[str] = None  # as written, e.g. "30- 100%"
+    max_waiver_percent: Optional[int] = None
+    min_gpa: Optional[float] = None
+    gpa_bands: List[GpaBand] = field(default_factory=list)
+    max_income: Optional[float] = None
+    nationalities: List[str] = field(default_factory=list)  # empty = any
+    conditions: List[str] = field(default_factory=list)  # not checkable from student data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ScholarshipRule":
+        data = dict(data)
+        data["gpa_bands"] = [GpaBand(**band) for band in data.get("gpa_bands", [])]
+        return cls(**data)
+
+
+@dataclass
+class CriteriaTable:
+    fingerprint: str
+    rules: List[ScholarshipRule]
+    # Chunks retrieved for CRITERIA_QUERY when the table was built: (chunk id, score)
+    context_chunks: List[Tuple[str, float]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CriteriaTable":
+        return cls(
+            fingerprint=data["fingerprint"],
+            rules=[ScholarshipRule.from_dict(rule) for rule in data.get("rules", [])],
+            context_chunks=[tuple(item) for item in data.get("context_chunks", [])]
+        )
+
+
+def normalise_academic_level(value: Optional[str]) -> Optional[str]:
+    """Map free-form levels ("Bachelor", "MBA", "ug", ...) to undergraduate/graduate"""
+    words = re.findall(r"[a-z]+", (value or "").lower())
+    if any(word.startswith(("undergrad", "bachelor", "freshman", "sophomore", "honours"))
+           or word in ("ug", "bsc", "bba", "ba", "bs") for word in words):
+        return "undergraduate"
+    if any(word.startswith(("grad", "postgrad", "master", "doctor", "phd"))
+           or word in ("pg", "mba", "msc", "ma", "ms", "mphil") for word in words):
+        return "graduate"
+    return None
+
+
+def parse_criteria(pages: Iterable[str], source: str) -> List[ScholarshipRule]:
+    """
+    Parse one policy document into rules, a page at a time
+
+    Expects the layout of the financial assistance policies: lettered
+    categories ("A. MERIT SCHOLARSHIP") containing numbered schemes whose
+    bodies list the waiver, maintenance CGPA, CGPA bands and conditions.
+    Only the scheme being parsed is held, and pages after the schemes
+    ("General Rules") are not read.
+    """
+    pages = iter(pages)
+    first_page = next(pages, "")
+    head = first_page[:500].upper()
+    document_level = ("undergraduate" if "UNDERGRADUATE" in head
+                      else "graduate" if "GRADUATE" in head else None)
+
+    rules: List[ScholarshipRule] = []
+    category = ""
+    name: Optional[str] = None
+    body: List[str] = []
+
+    def close():
+        if name is not None:
+            rules.append(_parse_rule(name, category, source, document_level, body))
+
+    for raw_line in (line for page in itertools.chain([first_page], pages) for line in page.splitlines()):
+        line = _BULLETS.sub("", raw_line).strip()
+        if not line or _PAGE_FOOTER.match(line):
+            continue
+        if _END_OF_ITEMS.match(line):
+            break
+        category_match = _CATEGORY.match(line)
+        item_match = _ITEM.match(line)
+        if category_match:
+            close()
+            name, body = None, []
+            category = category_match.group(2).title()
+        elif item_match and category:
+            close()
+            name, body = item_match.group(2).strip(), []
+        elif name is not None:
+            body.append(line)
+    close()
+    return rules
+
+
+def _parse_rule(name: str, category: str, source: str, academic_level: Optional[str],
+                body: List[str]) -> ScholarshipRule:
+    text = "\n".join(body)
+    clauses = [" ".join(clause.split()) for line in _join_wrapped(body) for clause in line.split(";")]
+    rule = ScholarshipRule(name=name, category=category, source=source, academic_level=academic_level)
+
+    # The scheme's title can carry its own requirement, e.g. "Corporate Discount (Minimum 3 students ...)"
+    title_condition = re.search(r"\(([^)]*(?:minimum|only|must|should)[^)]*)\)", name, re.I)
+    if title_condition:
+        rule.conditions.append(title_condition.group(1).strip())
+
+    waiver = _WAIVER.search(text)
+    if waiver:
+        rule.waiver = " ".join(waiver.group(1).split())
+    percents = [int(value) for value in _PERCENT.findall(text)]
+    rule.max_waiver_percent = max(percents) if percents else None
+
+    min_gpa = _MIN_GPA.search("\n".join(clauses))
+    if min_gpa:
+        rule.min_gpa = float(min_gpa.group(1))
+    rule.gpa_bands = [GpaBand(float(low), float(high), int(percent))
+                      for low, high, percent in _GPA_BAND.findall(text)]
+    for low, percent in _GPA_AND_ABOVE.findall(text):
+        rule.gpa_bands.append(GpaBand(float(low), 4.0, int(percent)))
+    general_rate = _GENERAL_RATE.search(text)
+    if general_rate and rule.gpa_bands:
+        # "(general): 10%" is the rate below the lowest listed band
+        lowest = min(band.low for band in rule.gpa_bands)
+        rule.gpa_bands.insert(0, GpaBand(0.0, round(lowest - 0.01, 2), int(general_rate.group(1))))
+
+    income = _MAX_INCOME.search(text)
+    if income:
+        rule.max_income = float(income.group(1).replace(",", ""))
+    rule.nationalities = sorted({match.lower() for match in _NATIONALITY.findall(text)})
+
+    for clause in clauses:
+        condition = _CONDITION.match(clause)
+        if condition:
+            rule.conditions.append(condition.group(1))
+        elif _CREDITS_COMPLETED.search(clause):
+            rule.conditions.append(_CREDITS_COMPLETED.search(clause).group(0).capitalize())
+
+    # Schemes for a group of students (siblings, employees, ...) need that status verified
+    if "merit" not in category.lower() or "discount" in name.lower():
+        if not any(condition.lower().startswith(("pre-condition", "eligibility")) for condition in rule.conditions):
+            rule.conditions.insert(0, f"Open to: {name}")
+    return rule
+
+
+def _join_wrapped(lines: List[str]) -> Iterable[str]:
+    """Re-join labelled lines ("Application: ...") that the PDF wrapped"""
+    current: Optional[str] = None
+    for line in lines:
+        if re.match(r"^(?:[a-z]\.\s*)?[A-Z][A-Za-z -]+:", line) or re.match(r"^[a-z]\.$", line):
+            if current is not None:
+                yield current
+            current = line
+        elif current is not None:
+            current += " " + line
+    if current is not None:
+        yield current
+
+
+class CriteriaStore:
+    """
+    The criteria table on disk.
+
+    current() reloads when the table file or the ingestion manifest changes
+    (one stat of each per call) and returns None while the table is missing
+    or was built from documents that have since changed.
+    """
+
+    def __init__(self, path: Optional[str] = None, manifest_path: Optional[str] = None):
+        self.path = path or settings.ELIGIBILITY_CRITERIA_PATH
+        self.manifest_path = manifest_path or settings.INGESTION_MANIFEST_PATH
+        self._signature: Optional[tuple] = None
+        self._table: Optional[CriteriaTable] = None
+
+    @staticmethod
+    def _stat_signature(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def current(self) -> Optional[CriteriaTable]:
+        signature = (self._stat_signature(self.path), self._stat_signature(self.manifest_path))
+        if signature != self._signature:
+            self._signature = signature
+            self._table = self._load_if_fresh()
+        return self._table
+
+    def _load_if_fresh(self) -> Optional[CriteriaTable]:
+        table = self.load()
+        if table is None:
+            return None
+        fingerprint = IngestionManifest(self.manifest_path).fingerprint(document_type="scholarship")
+        if table.fingerprint != fingerprint:
+            logger.warning("Eligibility criteria table is stale (scholarship documents changed)")
+            return None
+        return table
+
+    def load(self) -> Optional[CriteriaTable]:
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path) as table_file:
+                return CriteriaTable.from_dict(json.load(table_file))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("Could not read eligibility criteria table: %s", e)
+            return None
+
+    def save(self, table: CriteriaTable):
+        """Write atomically so readers never see a half-written table"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as table_file:
+            json.dump(table.to_dict(), table_file, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from core.config import settings
+
+# SQLite's default limit on bound parameters is 999
+_MAX_PARAMS = 900
+# Recency updates from cache hits are buffered and written in one transaction
+# once this many are pending or this many seconds have passed
+_TOUCH_FLUSH_SIZE = 1000
+_TOUCH_FLUSH_INTERVAL = 60.0
+
+
+def text_key(text: str) -> str:
+    """Hash of the whitespace-normalised text (whitespace does not change the embedding)"""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache in front of the embedding provider.
+
+    Vectors are stored as raw float32 blobs in SQLite, keyed by (model,
+    normalised text hash), so they survive restarts and are shared by every
+    worker on the host (WAL mode lets readers and one writer work at once).
+    Least recently used entries are evicted beyond max_items. Lookups only
+    read: the last_used updates of hits are buffered in memory and written
+    in batches (and before every eviction), so concurrent workers do not
+    queue on the SQLite write lock to serve cache hits.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_items: Optional[int] = None):
+        self.path = path or settings.EMBEDDING_CACHE_PATH
+        self.max_items = max_items or settings.EMBEDDING_CACHE_MAX_ITEMS
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+        # (model, text hash) -> last hit time, not yet written
+        self._touched: Dict[Tuple[str, str], float] = {}
+        self._touched_since = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached vectors for the texts (None for misses), in input order"""
+        keys = [text_key(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique_keys), _MAX_PARAMS):
+                batch = unique_keys[start:start + _MAX_PARAMS]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? "
+                    f"AND text_hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._touched.update(((model, text_hash), now) for text_hash in found)
+                if (len(self._touched) >= _TOUCH_FLUSH_SIZE
+                        or time.monotonic() - self._touched_since >= _TOUCH_FLUSH_INTERVAL):
+                    self._flush_touched()
+                    self._conn.commit()
+
+        vectors = [found.get(key) for key in keys]
+        hits = sum(vector is not None for vector in vectors)
+        self.hits += hits
+        self.misses += len(vectors) - hits
+        return vectors
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: np.ndarray):
+        now = time.time()
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        rows = [(model, text_key(text), vector.tobytes(), now) for text, vector in zip(texts, vectors)]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._count += self._conn.total_changes - before
+            # Already writing: publish the buffered hits too, so eviction sees them
+            self._flush_touched()
+            if self._count > self.max_items:
+                self._evict(self._count - self.max_items)
+            self._conn.commit()
+
+    def _flush_touched(self):
+        """Write the buffered last_used updates; caller holds the lock and commits"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(last_used, model, text_hash) for (model, text_hash), last_used in self._touched.items()]
+            )
+            self._touched = {}
+        self._touched_since = time.monotonic()
+
+    def _evict(self, excess: int):
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        # Other workers write to the same file, so recount instead of trusting our own tally
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._touched = {}
+            self._count = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "max_items": self.max_items,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+
+
+_shared_caches: Dict[str, EmbeddingCache] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_embedding_cache(path: Optional[str] = None) -> EmbeddingCache:
+    """One cache (one SQLite connection) per file per process"""
+    path = path or settings.EMBEDDING_CACHE_PATH
+    with _shared_lock:
+        if path not in _shared_caches:
+            _shared_caches[path] = EmbeddingCache(path)
+        return _shared_caches[path]
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+from core.config import settings
+
+EncodeFn = Callable[[List[str]], np.ndarray]
+
+
+class EmbeddingExecutor:
+    """
+    Runs blocking encode calls in a thread pool and micro-batches small requests.
+
+    Query embeddings that arrive within max_wait_ms of each other are merged
+    into a single encode call (up to max_batch_size texts), so concurrent
+    /ask requests share one forward pass instead of queueing behind each
+    other on the event loop. Requests that are already large (ingestion
+    batches) skip the collector and go straight to the pool.
+    """
+
+    def __init__(self, encode_fn: EncodeFn, max_batch_size: Optional[int] = None,
+                 max_wait_ms: Optional[float] = None, workers: Optional[int] = None):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_MAX_BATCH_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.EMBEDDING_MAX_WAIT_MS) / 1000.0
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers or settings.EMBEDDING_EXECUTOR_WORKERS,
+            thread_name_prefix="embedding"
+        )
+        self._pending: List[Tuple[List[str], asyncio.Future]] = []
+        self._pending_count = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+        # Counters for tuning the batch size / wait window
+        self.batches = 0
+        self.batched_texts = 0
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+
+        if len(texts) >= self.max_batch_size:
+            return await loop.run_in_executor(self._pool, self._run_batch, texts)
+
+        future = loop.create_future()
+        self._pending.append((texts, future))
+        self._pending_count += len(texts)
+
+        if self._pending_count >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Send everything collected so far to the pool as one batch"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        self._pending_count = 0
+        if not batch:
+            return
+
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        loop = asyncio.get_running_loop()
+        encoded = loop.run_in_executor(self._pool, self._run_batch, texts)
+        encoded.add_done_callback(lambda done: self._distribute(batch, done))
+
+    def _run_batch(self, texts: List[str]) -> np.ndarray:
+        self.batches += 1
+        self.batched_texts += len(texts)
+        return self.encode_fn(texts)
+
+    @staticmethod
+    def _distribute(batch: List[Tuple[List[str], asyncio.Future]], done: asyncio.Future):
+        """Hand each waiting request its slice of the batch result"""
+        if done.cancelled():
+            for _, future in batch:
+                future.cancel()
+            return
+        error = done.exception()
+        embeddings = None if error else done.result()
+
+        offset = 0
+        for request_texts, future in batch:
+            if future.done():
+                offset += len(request_texts)
+                continue
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(embeddings[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "texts": self.batched_texts,
+            "avg_batch_size": round(self.batched_texts / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+_executors: Dict[Hashable, EmbeddingExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def shared_executor(key: Hashable, encode_fn: EncodeFn) -> EmbeddingExecutor:
+    """One executor per model, shared by every service using that model"""
+    executor = _executors.get(key)
+    if executor is None:
+        with _executors_lock:
+            # Another thread may have created it while this one waited for the lock
+            executor = _executors.get(key)
+            if executor is None:
+                executor = _executors[key] = EmbeddingExecutor(encode_fn)
+    return executor
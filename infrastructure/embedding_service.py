@@ -1,50 +1,84 @@
 import asyncio
-from typing import List
+import logging
+from typing import Dict, List, Optional
 import numpy as np
 from core.config import settings
+from infrastructure.model_registry import model_registry
+from infrastructure.embedding_executor import EmbeddingExecutor, shared_executor
+from infrastructure.embedding_cache import EmbeddingCache, shared_embedding_cache, text_key
+from infrastructure.metrics import stage
+
+logger = logging.getLogger(__name__)
 
 
 class EmbeddingService:
     def __init__(self):
         self.provider = settings.EMBEDDING_PROVIDER  # "local" or "openai"
         self.model_name = settings.EMBEDDING_MODEL
+        self.device = settings.EMBEDDING_DEVICE
 
-        if self.provider == "local":
-            self._load_local_model()
-        elif self.provider == "openai":
-            self._setup_openai()
-        else:
+        if self.provider not in ("local", "openai"):
             raise ValueError(f"Unsupported embedding provider: {self.provider}")
+        if self.provider == "openai" and not settings.OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY not set in environment variables")
 
-    def _load_local_model(self):
-        """Load FREE local embedding model"""
-        try:
-            from sentence_transformers import SentenceTransformer
+        self.cache: Optional[EmbeddingCache] = (
+            shared_embedding_cache() if settings.EMBEDDING_CACHE_ENABLED else None
+        )
+        self.cache_model_key = f"{self.provider}:{self.model_name}"
 
-            print(f"📥 Loading local embedding model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
-            print("✅ Local embedding model loaded (FREE to use!)")
+    @property
+    def model(self):
+        """Shared local model - loaded once per process by the registry"""
+        return model_registry.get("local", self.model_name, self.device)
 
-        except ImportError:
-            print("❌ sentence-transformers not installed!")
-            print("💡 Install with: pip install sentence-transformers")
-            raise
+    @property
+    def client(self):
+        """Shared OpenAI client"""
+        return model_registry.get("openai", self.model_name)
 
-    def _setup_openai(self):
-        """Setup OpenAI embeddings (paid)"""
-        if not settings.OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY not set in environment variables")
-        try:
-            from openai import OpenAI
-            self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        except ImportError:
-            raise ImportError("OpenAI library not installed. Install with: pip install openai")
+    async def warm_up(self, text: str = "warm-up"):
+        """Load the embedding model and run one uncached encode, so the first request pays for neither"""
+        if self.provider == "local":
+            await self._local_embeddings([text])
+        else:
+            # An OpenAI call costs money - building the client is enough
+            self.client
+
+    async def get_embeddings(self, texts: List[str]) -> np.ndarray:
+        """
+        Get embeddings - FREE locally or paid via OpenAI (cached texts are never re-embedded)
 
-    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Get embeddings - FREE locally or paid via OpenAI"""
+        Returns:
+            Contiguous float32 array of shape (len(texts), dim); rows are in input order
+        """
         if not texts:
-            return []
+            return np.empty((0, 0), dtype=np.float32)
+        with stage("embedding"):
+            return await self._get_embeddings(texts)
+
+    async def _get_embeddings(self, texts: List[str]) -> np.ndarray:
+        if self.cache is None:
+            return await self._compute_embeddings(texts)
+
+        cached = await asyncio.to_thread(self.cache.get_many, self.cache_model_key, texts)
+        missing: Dict[str, str] = {}
+        for text, vector in zip(texts, cached):
+            if vector is None:
+                missing.setdefault(text_key(text), text)
+        if not missing:
+            return np.stack(cached)
 
+        # Only the misses are embedded (each distinct normalised text once)
+        computed = await self._compute_embeddings(list(missing.values()))
+        await asyncio.to_thread(self.cache.put_many, self.cache_model_key, list(missing.values()), computed)
+        row_of = {key: row for row, key in enumerate(missing)}
+        embeddings = np.empty((len(texts), computed.shape[1]), dtype=np.float32)
+        for row, (text, vector) in enumerate(zip(texts, cached)):
+            embeddings[row] = vector if vector is not None else computed[row_of[text_key(text)]]
+        return embeddings
+
+    async def _compute_embeddings(self, texts: List[str]) -> np.ndarray:
         if self.provider == "local":
             # ✅ FREE local embeddings
             return await self._local_embeddings(texts)
@@ -52,27 +86,37 @@ class EmbeddingService:
             # ❌ Paid OpenAI embeddings
             return await self._openai_embeddings(texts)
 
-    async def _local_embeddings(self, texts: List[str]) -> List[List[float]]:
+    @property
+    def executor(self) -> EmbeddingExecutor:
+        """Shared thread-pool executor that micro-batches encode calls"""
+        return shared_executor(("local", self.model_name, self.device), self._encode)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Blocking encode - only ever called from the executor's pool"""
+        return self.model.encode(
+            texts,
+            convert_to_numpy=True,
+            show_progress_bar=True if len(texts) > 10 else False
+        )
+
+    async def _local_embeddings(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings locally - NO COST!"""
         try:
-            # Convert to embeddings
-            embeddings = self.model.encode(
-                texts,
-                convert_to_numpy=True,
-                show_progress_bar=True if len(texts) > 10 else False
-            )
+            # Encode off the event loop; concurrent queries are batched together
+            embeddings = await self.executor.encode(texts)
 
-            print(f"🔢 Generated {len(embeddings)} local embeddings (FREE)")
-            return embeddings.tolist()
+            logger.debug("Generated %d local embeddings", len(embeddings))
+            # No copy when the model already returns C-contiguous float32
+            return np.ascontiguousarray(embeddings, dtype=np.float32)
 
         except Exception as e:
-            print(f"❌ Local embedding error: {e}")
+            logger.error("Local embedding error: %s", e)
             raise
 
-    async def _openai_embeddings(self, texts: List[str]) -> List[List[float]]:
+    async def _openai_embeddings(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings using OpenAI (costs money)"""
         # OpenAI embeddings API is synchronous, but we'll wrap it in asyncio
-        loop = asyncio.get_event_loop()
+        loop = asyncio.get_running_loop()
         response = await loop.run_in_executor(
             None,
             lambda: self.client.embeddings.create(
@@ -80,4 +124,4 @@ class EmbeddingService:
                 model=self.model_name
             )
         )
-        return [embedding.embedding for embedding in response.data]
\ No newline at end of file
+        return np.array([embedding.embedding for embedding in response.data], dtype=np.float32)
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, asdict, field
+from typing import Dict, List, Optional
+
+from core.config import settings
+
+
+def file_content_hash(file_path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_content_hash(text: str) -> str:
+    """Content address of a chunk (first 16 hex chars of SHA-256)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+# Recorded with the chunker signature, so changing how ids are built re-ingests every file
+CHUNK_ID_SCHEME = "type_source_hash"
+
+
+def document_chunk_id(document_type: str, source: str, content_hash: str) -> str:
+    """
+    Id of a chunk: the same text in same-named files of different document
+    types stays apart in the BM25 index, which is shared by every partition
+    """
+    return f"{document_type}_{source}_{content_hash}"
+
+
+@dataclass
+class FileRecord:
+    file_path: str
+    size: int
+    mtime_ns: int
+    content_hash: str
+    document_type: str
+    chunk_ids: List[str] = field(default_factory=list)
+    chunker: str = ""  # Chunker signature the chunk ids were produced with
+
+
+class IngestionManifest:
+    """
+    Fingerprints of every ingested file and the chunk ids it produced.
+
+    A file whose size and mtime are unchanged is skipped without being read;
+    one whose bytes hash the same is skipped without being parsed. For
+    changed files the recorded chunk ids tell the ingestion service which
+    chunks became stale.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.INGESTION_MANIFEST_PATH
+        self._files: Dict[str, FileRecord] = {}
+        self.load()
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return os.path.normpath(os.path.abspath(file_path))
+
+    def load(self):
+        if not os.path.exists(self.path):
+            self._files = {}
+            return
+        with open(self.path) as manifest_file:
+            data = json.load(manifest_file)
+        self._files = {key: FileRecord(**record) for key, record in data.get("files", {}).items()}
+
+    def save(self):
+        """Write atomically so a crash never leaves a half-written manifest"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as manifest_file:
+            json.dump({"files": {key: asdict(record) for key, record in self._files.items()}}, manifest_file)
+        os.replace(tmp_path, self.path)
+
+    def get(self, file_path: str) -> Optional[FileRecord]:
+        return self._files.get(self._key(file_path))
+
+    def is_unchanged(self, file_path: str, stat: os.stat_result, chunker: str, document_type: str) -> bool:
+        """Cheap check: same size, mtime, chunker and document type as when it was ingested"""
+        record = self.get(file_path)
+        return (record is not None and record.size == stat.st_size
+                and record.mtime_ns == stat.st_mtime_ns and record.chunker == chunker
+                and record.document_type == document_type)
+
+    def update(self, record: FileRecord):
+        record.file_path = self._key(record.file_path)
+        self._files[record.file_path] = record
+
+    def remove(self, file_path: str) -> Optional[FileRecord]:
+        return self._files.pop(self._key(file_path), None)
+
+    def files_under(self, directory: str) -> List[FileRecord]:
+        prefix = self._key(directory) + os.sep
+        return [record for key, record in self._files.items() if key.startswith(prefix)]
+
+    def records(self, document_type: Optional[str] = None) -> List[FileRecord]:
+        return [record for record in self._files.values()
+                if document_type is None or record.document_type == document_type]
+
+    def fingerprint(self, document_type: Optional[str] = None) -> str:
+        """Hash of the ingested corpus (or one document type of it); changes whenever any file does"""
+        digest = hashlib.sha256()
+        for key in sorted(self._files):
+            record = self._files[key]
+            if document_type is None or record.document_type == document_type:
+                digest.update(f"{key}:{record.content_hash}\n".encode("utf-8"))
+        return digest.hexdigest()
@@ -0,0 +1,413 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from core.config import settings
+from domain import DocumentChunk, DocumentType
+from infrastructure.ingestion_manifest import CHUNK_ID_SCHEME, FileRecord, file_content_hash
+from infrastructure.chunking import TextChunk, chunk_page_range, get_chunker
+from infrastructure.text_extraction import count_pages
+
+logger = logging.getLogger(__name__)
+
+if TYPE_CHECKING:
+    from infrastructure.document_ingestion import DocumentIngestionService
+
+# End-of-stream marker passed between stages
+_DONE = object()
+# Sent after a file's last page range
+_END_OF_FILE = object()
+
+
+@dataclass
+class IngestionJob:
+    file_path: str
+    source_name: str
+    document_type: DocumentType
+
+
+@dataclass
+class FileProgress:
+    file_path: str
+    status: str = "queued"  # queued, extracting, chunking, embedding, done, skipped, failed
+    pages: int = 0
+    chunks: int = 0
+    new_chunks: int = 0
+    stored_chunks: int = 0
+    stale_chunks: int = 0
+    error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+
+@dataclass
+class _FileState:
+    job: IngestionJob
+    progress: FileProgress
+    stat: os.stat_result
+    content_hash: str
+    previous_ids: Optional[Set[str]]
+    previous_type: Optional[DocumentType] = None  # partition previous_ids were written to
+    chunk_ids: List[str] = field(default_factory=list)
+    seen_ids: Set[str] = field(default_factory=set)
+    pending: int = 0  # new chunks not yet written
+    extracted: bool = False  # every page range has been chunked
+    failed: bool = False
+
+
+class IngestionPipeline:
+    """
+    Staged, concurrent ingestion of many files.
+
+        change detection -> extraction + chunking (process pool, by page range)
+            -> chunk diff -> batched embedding -> batched upsert -> per-file finalisation
+
+    Stages are connected by bounded queues, so a fast stage blocks instead
+    of buffering a whole corpus in memory, and every stage works on a
+    different file at the same time. Files travel through the pipeline as
+    page ranges of INGESTION_PAGES_PER_TASK pages, so memory stays flat no
+    matter how long a document is. Finalisation (stale chunk deletion and
+    the manifest entry) happens only after all of a file's chunks are stored,
+    and is also when the BM25 writes buffered for the run are published.
+    """
+
+    def __init__(self, service: "DocumentIngestionService", force: bool = False,
+                 on_progress: Optional[Callable[[FileProgress], None]] = None):
+        self.service = service
+        self.vector_store = service.vector_store
+        self.manifest = service.manifest
+        self.force = force
+        self.on_progress = on_progress
+
+        self.extract_workers = settings.INGESTION_EXTRACT_WORKERS or os.cpu_count() or 1
+        self.embed_batch_size = settings.INGESTION_EMBED_BATCH_SIZE
+        self.embed_concurrency = settings.INGESTION_EMBED_CONCURRENCY
+        self.upsert_batch_size = settings.INGESTION_UPSERT_BATCH_SIZE
+        self.upsert_concurrency = settings.INGESTION_UPSERT_CONCURRENCY
+        self.queue_size = settings.INGESTION_QUEUE_SIZE
+        self.pages_per_task = settings.INGESTION_PAGES_PER_TASK
+        self.chunker_signature = f"{get_chunker().signature}:{CHUNK_ID_SCHEME}"
+
+        self.progress: Dict[str, FileProgress] = {}
+
+    async def run(self, jobs: List[IngestionJob]) -> int:
+        """Ingest the files; returns the number of chunks embedded and stored"""
+        if not jobs:
+            return 0
+
+        plan_queue: asyncio.Queue = asyncio.Queue()
+        for job in jobs:
+            self.progress[job.file_path] = FileProgress(job.file_path)
+            plan_queue.put_nowait(job)
+        plan_queue.put_nowait(_DONE)
+
+        extract_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.embed_batch_size * self.queue_size)
+        upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=self.upsert_batch_size * 2)
+
+        # Files are extracted concurrently; the page ranges of one file keep the rest of the pool busy
+        workers = max(1, min(self.extract_workers, len(jobs)))
+        prefetch = max(1, self.extract_workers // workers)
+        # spawn: workers must not inherit the parent's model/DB threads
+        # BM25 writes are published once per file (in _finish) instead of once per upsert batch
+        with ProcessPoolExecutor(max_workers=self.extract_workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool, \
+                self.vector_store.deferred_bm25_commits():
+            await asyncio.gather(
+                self._stage(1, self._detect_changes, plan_queue, extract_queue),
+                self._stage(workers, lambda state, out: self._extract(pool, prefetch, state, out),
+                            extract_queue, chunk_queue),
+                self._stage(1, self._chunk, chunk_queue, embed_queue),
+                self._batch(embed_queue, upsert_queue, self.embed_batch_size,
+                            self._embed, self.embed_concurrency),
+                self._batch(upsert_queue, None, self.upsert_batch_size,
+                            self._upsert, self.upsert_concurrency),
+            )
+
+        return sum(progress.stored_chunks for progress in self.progress.values())
+
+    # ------------------------------------------------------------ plumbing
+
+    @staticmethod
+    async def _stage(workers: int, handle: Callable[[Any, Optional[asyncio.Queue]], Awaitable[None]],
+                     in_queue: asyncio.Queue, out_queue: Optional[asyncio.Queue]):
+        """Run `workers` consumers of in_queue; signal the next stage when all are done"""
+        async def worker():
+            while True:
+                item = await in_queue.get()
+                if item is _DONE:
+                    await in_queue.put(_DONE)  # let sibling workers see it too
+                    return
+                await handle(item, out_queue)
+
+        await asyncio.gather(*[worker() for _ in range(workers)])
+        if out_queue is not None:
+            await out_queue.put(_DONE)
+
+    @staticmethod
+    async def _batch(in_queue: asyncio.Queue, out_queue: Optional[asyncio.Queue], batch_size: int,
+                     handle: Callable[[list, Optional[asyncio.Queue]], Awaitable[None]], concurrency: int):
+        """
+        Group items into batches of up to batch_size.
+
+        Takes whatever is already queued (never waits to fill a batch), so
+        batches are full under load and small when the producer is slow.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        in_flight: Set[asyncio.Task] = set()
+
+        async def run(batch):
+            try:
+                await handle(batch, out_queue)
+            finally:
+                semaphore.release()
+
+        done = False
+        while not done:
+            # Wait for a free slot first: items keep queueing meanwhile, so the next batch is fuller
+            await semaphore.acquire()
+            item = await in_queue.get()
+            if item is _DONE:
+                semaphore.release()
+                break
+            batch = [item]
+            while len(batch) < batch_size:
+                try:
+                    item = in_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+
+            task = asyncio.create_task(run(batch))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        if out_queue is not None:
+            await out_queue.put(_DONE)
+
+    def _report(self, progress: FileProgress):
+        if self.on_progress is not None:
+            self.on_progress(progress)
+
+    # ------------------------------------------------------------ stages
+
+    async def _detect_changes(self, job: IngestionJob, out_queue: asyncio.Queue):
+        """Skip unchanged files: stat first, content hash only if stat differs"""
+        progress = self.progress[job.file_path]
+        try:
+            if not os.path.exists(job.file_path):
+                raise FileNotFoundError(f"File not found: {job.file_path}")
+
+            stat = os.stat(job.file_path)
+            record = self.manifest.get(job.file_path)
+            if not self.force and self.manifest.is_unchanged(job.file_path, stat, self.chunker_signature,
+                                                             job.document_type.value):
+                logger.info("Unchanged (size/mtime), skipping %s", job.source_name)
+                return self._skip(progress)
+
+            content_hash = await asyncio.to_thread(file_content_hash, job.file_path)
+            if (not self.force and record is not None and record.content_hash == content_hash
+                    and record.document_type == job.document_type.value
+                    and record.chunker == self.chunker_signature):
+                record.size, record.mtime_ns = stat.st_size, stat.st_mtime_ns
+                self.manifest.update(record)
+                self.manifest.save()
+                logger.info("Unchanged content, skipping %s", job.source_name)
+                return self._skip(progress)
+
+            await out_queue.put(_FileState(
+                job=job,
+                progress=progress,
+                stat=stat,
+                content_hash=content_hash,
+                previous_ids=set(record.chunk_ids) if record else None,
+                previous_type=DocumentType(record.document_type) if record else None
+            ))
+        except Exception as e:
+            self._fail(progress, e)
+
+    async def _extract(self, pool: ProcessPoolExecutor, prefetch: int, state: _FileState,
+                       out_queue: asyncio.Queue):
+        """Extract and chunk the file range by range, with up to `prefetch` ranges in flight"""
+        state.progress.status = "extracting"
+        self._report(state.progress)
+        try:
+            loop = asyncio.get_running_loop()
+            page_count = await loop.run_in_executor(pool, count_pages, state.job.file_path)
+            in_flight: deque = deque()
+            for start in range(0, page_count, self.pages_per_task):
+                end = min(start + self.pages_per_task, page_count)
+                in_flight.append(loop.run_in_executor(pool, chunk_page_range, state.job.file_path, start, end))
+                if len(in_flight) >= prefetch:
+                    await self._forward_chunks(state, await in_flight.popleft(), out_queue)
+            while in_flight:
+                await self._forward_chunks(state, await in_flight.popleft(), out_queue)
+        except Exception as e:
+            state.failed = True
+            state.progress.error = str(e)
+        # Always sent (even after a failure) so the chunk stage can settle the file
+        await out_queue.put((state, _END_OF_FILE))
+
+    async def _forward_chunks(self, state: _FileState, result: Tuple[int, List[Tuple[int, TextChunk]]],
+                              out_queue: asyncio.Queue):
+        pages, page_chunks = result
+        state.progress.pages += pages
+        if page_chunks:
+            await out_queue.put((state, page_chunks))
+
+    async def _chunk(self, item: Tuple[_FileState, Any], out_queue: asyncio.Queue):
+        """Diff one page range's chunks against stored ids and queue only new chunks for embedding"""
+        state, page_chunks = item
+        if page_chunks is _END_OF_FILE:
+            state.extracted = True
+            if state.pending == 0:
+                await self._finish(state)
+            return
+        if state.failed:
+            return
+
+        state.progress.status = "chunking"
+        self._report(state.progress)
+        try:
+            document_chunks = list(self.service._iter_document_chunks(
+                page_chunks,
+                document_type=state.job.document_type,
+                source=state.job.source_name,
+                file_path=state.job.file_path,
+                seen_ids=state.seen_ids
+            ))
+            chunk_ids = [chunk.id for chunk in document_chunks]
+            state.chunk_ids.extend(chunk_ids)
+
+            # Ids are content addresses, so stored ids never need re-embedding
+            stored_ids = await self.vector_store.existing_ids(chunk_ids, state.job.document_type)
+            new_chunks = [chunk for chunk in document_chunks if chunk.id not in stored_ids]
+            stored_chunks = [chunk for chunk in document_chunks if chunk.id in stored_ids]
+            await self.vector_store.update_metadata(stored_chunks)
+            await self.vector_store.index_missing_bm25(stored_chunks)
+
+            state.progress.chunks += len(document_chunks)
+            state.progress.new_chunks += len(new_chunks)
+            if not new_chunks:
+                return
+
+            # pending is raised before any chunk is queued so the file cannot finish early
+            state.pending += len(new_chunks)
+            state.progress.status = "embedding"
+            self._report(state.progress)
+            for chunk in new_chunks:
+                await out_queue.put((state, chunk))
+        except Exception as e:
+            state.failed = True
+            state.progress.error = str(e)
+
+    async def _embed(self, batch: List[Tuple[_FileState, DocumentChunk]], out_queue: asyncio.Queue):
+        try:
+            embeddings = await self.service.embedding_service.get_embeddings(
+                [chunk.content for _, chunk in batch]
+            )
+        except Exception as e:
+            for state, _ in batch:
+                state.failed = True
+                state.progress.error = str(e)
+                await self._chunk_settled(state)
+            return
+
+        for (state, chunk), embedding in zip(batch, embeddings):
+            await out_queue.put((state, chunk, embedding))
+
+    async def _upsert(self, batch: List[Tuple[_FileState, DocumentChunk, np.ndarray]],
+                      _: Optional[asyncio.Queue]):
+        try:
+            await self.vector_store.upsert_embeddings(
+                [chunk for _, chunk, _ in batch],
+                np.stack([embedding for _, _, embedding in batch])
+            )
+        except Exception as e:
+            for state, _, _ in batch:
+                state.failed = True
+                state.progress.error = str(e)
+        for state, _, _ in batch:
+            if not state.failed:
+                state.progress.stored_chunks += 1
+            await self._chunk_settled(state)
+
+    # ------------------------------------------------------------ per-file bookkeeping
+
+    async def _chunk_settled(self, state: _FileState):
+        state.pending -= 1
+        if state.pending == 0 and state.extracted:
+            await self._finish(state)
+
+    async def _finish(self, state: _FileState):
+        """All chunks of the file are stored: drop stale chunks and record the file"""
+        if not state.failed and not state.progress.pages:
+            state.failed = True
+            state.progress.error = f"No text extracted from {state.job.source_name}"
+        if state.failed:
+            self._fail(state.progress, state.progress.error or "chunk storage failed")
+            return
+        try:
+            previous_ids = state.previous_ids
+            if previous_ids is None:
+                previous_ids = set(await self.vector_store.ids_for_source(
+                    state.job.source_name, state.job.document_type
+                ))
+            # Ids include the document type, so after a move every old id is stale
+            previous_type = state.previous_type or state.job.document_type
+            stale_ids = previous_ids - state.seen_ids
+            state.progress.stale_chunks = len(stale_ids)
+            await self.vector_store.delete_documents(sorted(stale_ids), previous_type)
+            # The file's chunks must be searchable before the manifest calls it done
+            await self.vector_store.flush_bm25()
+            self.manifest.update(FileRecord(
+                file_path=state.job.file_path,
+                size=state.stat.st_size,
+                mtime_ns=state.stat.st_mtime_ns,
+                content_hash=state.content_hash,
+                document_type=state.job.document_type.value,
+                chunk_ids=state.chunk_ids,
+                chunker=self.chunker_signature
+            ))
+            self.manifest.save()
+        except Exception as e:
+            self._fail(state.progress, e)
+            return
+
+        state.progress.status = "done"
+        state.progress.finished_at = time.time()
+        progress = state.progress
+        logger.info("%s: %d pages, %d new, %d unchanged, %d stale chunks in %.1fs",
+                    state.job.source_name, progress.pages, progress.new_chunks,
+                    progress.chunks - progress.new_chunks, progress.stale_chunks,
+                    progress.finished_at - progress.started_at)
+        self._report(state.progress)
+
+    def _skip(self, progress: FileProgress):
+        progress.status = "skipped"
+        progress.finished_at = time.time()
+        self._report(progress)
+
+    def _fail(self, progress: FileProgress, error: Any):
+        progress.status = "failed"
+        progress.error = str(error)
+        progress.finished_at = time.time()
+        logger.error("Error ingesting %s: %s", progress.file_path, error)
+        self._report(progress)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [asdict(progress) for progress in self.progress.values()]
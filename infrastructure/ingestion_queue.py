@@ -0,0 +1,105 @@
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import redis.asyncio as aioredis
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Job ids waiting for the worker, and the ones it has taken but not finished
+QUEUE_KEY = "ingestion:queue"
+PROCESSING_KEY = "ingestion:processing"
+# Latest job ids first, for the admin endpoints
+RECENT_KEY = "ingestion:recent"
+RECENT_JOBS = 20
+
+
+def _job_key(job_id: str) -> str:
+    return f"ingestion:job:{job_id}"
+
+
+class IngestionQueue:
+    """
+    Ingestion jobs kept in Redis.
+
+    The API only enqueues jobs and reads their status, so its workers never
+    load the document parsers or open a Chroma writer. ingestion_worker.py
+    takes jobs off the queue, runs them and writes their progress back.
+    A job stays in the processing list until it finishes, so a worker that
+    dies mid-job gets it back with requeue_interrupted() when it restarts.
+    """
+
+    def __init__(self, redis_client: Optional[aioredis.Redis] = None):
+        self.redis_client = redis_client or aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        self.ttl = settings.INGESTION_JOB_TTL
+
+    async def enqueue(self, force: bool = False) -> Dict[str, Any]:
+        """Queue a run over the document directories"""
+        job = {"id": uuid.uuid4().hex, "status": "queued", "force": force, "enqueued_at": time.time()}
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.set(_job_key(job["id"]), json.dumps(job), ex=self.ttl)
+            pipe.lpush(QUEUE_KEY, job["id"])
+            pipe.lpush(RECENT_KEY, job["id"])
+            pipe.ltrim(RECENT_KEY, 0, RECENT_JOBS - 1)
+            await pipe.execute()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self.redis_client.get(_job_key(job_id))
+        return json.loads(raw) if raw else None
+
+    async def recent(self, limit: int = RECENT_JOBS) -> List[Dict[str, Any]]:
+        """Latest jobs first (expired ones are left out)"""
+        job_ids = await self.redis_client.lrange(RECENT_KEY, 0, limit - 1)
+        if not job_ids:
+            return []
+        raws = await self.redis_client.mget([_job_key(job_id) for job_id in job_ids])
+        return [json.loads(raw) for raw in raws if raw]
+
+    async def update(self, job: Dict[str, Any], **fields) -> Dict[str, Any]:
+        job.update(fields)
+        await self.redis_client.set(_job_key(job["id"]), json.dumps(job), ex=self.ttl)
+        return job
+
+    async def take(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Next queued job, oldest first (jobs that expired while queued are skipped)
+
+        Args:
+            timeout: Seconds to wait for a job (None = do not wait)
+
+        Returns:
+            The job, or None once the queue is empty (after waiting `timeout`)
+        """
+        while True:
+            if timeout is None:
+                job_id = await self.redis_client.lmove(QUEUE_KEY, PROCESSING_KEY, "RIGHT", "LEFT")
+            else:
+                job_id = await self.redis_client.blmove(QUEUE_KEY, PROCESSING_KEY, timeout, "RIGHT", "LEFT")
+            if job_id is None:
+                return None
+            job = await self.get(job_id)
+            if job is not None:
+                return job
+            logger.warning("Ingestion job %s expired while queued", job_id)
+            await self.redis_client.lrem(PROCESSING_KEY, 0, job_id)
+
+    async def finish(self, job: Dict[str, Any], status: str, **fields) -> Dict[str, Any]:
+        job = await self.update(job, status=status, finished_at=time.time(), **fields)
+        await self.redis_client.lrem(PROCESSING_KEY, 0, job["id"])
+        return job
+
+    async def requeue_interrupted(self) -> int:
+        """Put jobs left in the processing list by a worker that died back at the front of the queue"""
+        requeued = 0
+        while await self.redis_client.lmove(PROCESSING_KEY, QUEUE_KEY, "LEFT", "RIGHT") is not None:
+            requeued += 1
+        if requeued:
+            logger.warning("Requeued %d interrupted ingestion job(s)", requeued)
+        return requeued
+
+    async def close(self):
+        await self.redis_client.aclose()
@@ -0,0 +1,200 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from Chroma per page while loading
+_LOAD_PAGE_SIZE = 4096
+# Rows scored per block on the int8 path (bounds the dequantized temporary)
+_INT8_BLOCK_ROWS = 8192
+
+# (chunk id, cosine similarity, document text, metadata)
+IndexHit = Tuple[str, float, str, Dict[str, Any]]
+
+
+@dataclass
+class _Snapshot:
+    """One immutable load of the collection; replaced wholesale on reload"""
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    vectors: Optional[np.ndarray]  # (n, dim) float32, L2-normalised; None when quantized
+    codes: Optional[np.ndarray]  # (n, dim) int8 when quantized
+    scales: Optional[np.ndarray]  # (n,) float32 per-row dequantization scale
+    type_masks: Dict[str, np.ndarray]  # document_type -> bool row mask
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.vectors, self.codes, self.scales, *self.type_masks.values()]
+        return sum(array.nbytes for array in arrays if array is not None)
+
+
+class InMemoryVectorIndex:
+    """
+    Exact dense search over a copy of the Chroma collection held in RAM.
+
+    All vectors sit in one L2-normalised float32 matrix (or int8 codes with
+    a per-row scale when quantized, a quarter of the memory), so top-k for a
+    batch of queries is one matrix product plus argpartition. Filtering by
+    document_type applies a precomputed boolean mask per type.
+
+    Chroma stays the source of truth: before each search the index stats the
+    Chroma database file and reloads when it changed (written by this
+    process or another one). Every partition shares that file, so only the
+    first load blocks; later reloads run in a background thread and searches
+    keep using the old snapshot until the new one is swapped in.
+    """
+
+    def __init__(self, collection, db_path: str, quantize: bool = False):
+        self.collection = collection
+        self.db_file = os.path.join(db_path, "chroma.sqlite3")
+        self.quantize = quantize
+        self._snapshot: Optional[_Snapshot] = None
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._reload_lock = threading.Lock()
+        self._reloading = False
+        self.reloads = 0
+        self.last_reload_ms = 0.0
+
+    def _stat_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.db_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def refresh(self) -> _Snapshot:
+        """The current snapshot; a change to the collection starts a background reload"""
+        signature = self._stat_signature()
+        snapshot = self._snapshot
+        if snapshot is not None and signature == self._signature:
+            return snapshot
+        if snapshot is None:
+            with self._reload_lock:
+                # Another thread may have loaded it while this one waited
+                if self._snapshot is None:
+                    self._reload(signature)
+            return self._snapshot
+
+        with self._reload_lock:
+            if self._reloading:
+                return snapshot
+            self._reloading = True
+        threading.Thread(target=self._reload_in_background, args=(signature,),
+                         name="inmemory-index-reload", daemon=True).start()
+        return snapshot
+
+    def _reload_in_background(self, signature: Optional[Tuple[int, int, int]]):
+        try:
+            self._reload(signature)
+        except Exception as e:
+            # The old snapshot stays in use; the next search tries again
+            logger.error("In-memory index reload failed: %s", e)
+        finally:
+            self._reloading = False
+
+    def _reload(self, signature: Optional[Tuple[int, int, int]]):
+        """Load the collection and swap the snapshot in (one assignment, so searches never see a partial load)"""
+        started = time.perf_counter()
+        self._snapshot = self._load()
+        self._signature = signature
+        self.reloads += 1
+        self.last_reload_ms = (time.perf_counter() - started) * 1000
+        logger.info("In-memory index loaded %d vectors (%.1f MB) in %.0fms",
+                    len(self._snapshot), self._snapshot.nbytes / 2 ** 20, self.last_reload_ms)
+
+    def _load(self) -> _Snapshot:
+        ids: List[str] = []
+        documents: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        pages: List[np.ndarray] = []
+        offset = 0
+        while True:
+            records = self.collection.get(
+                include=["embeddings", "documents", "metadatas"], limit=_LOAD_PAGE_SIZE, offset=offset
+            )
+            if not records['ids']:
+                break
+            ids.extend(records['ids'])
+            documents.extend(records['documents'])
+            metadatas.extend(records['metadatas'])
+            pages.append(np.asarray(records['embeddings'], dtype=np.float32))
+            offset += len(records['ids'])
+
+        vectors = np.concatenate(pages) if pages else np.empty((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms > 0, norms, 1.0)
+
+        types = np.array([metadata.get('document_type', 'scholarship') for metadata in metadatas])
+        type_masks = {document_type: types == document_type for document_type in np.unique(types)}
+
+        codes = scales = None
+        if self.quantize and len(vectors):
+            # Symmetric per-row int8: row ~= codes * scale
+            scales = (np.abs(vectors).max(axis=1) / 127.0).astype(np.float32)
+            scales[scales == 0] = 1.0
+            codes = np.round(vectors / scales[:, None]).astype(np.int8)
+            vectors = None
+        return _Snapshot(ids, documents, metadatas, vectors, codes, scales, type_masks)
+
+    def search_many(self, query_embeddings: np.ndarray, document_type: Optional[str] = None,
+                    limit: int = 10) -> List[List[IndexHit]]:
+        """Top-limit hits by cosine similarity for each query row"""
+        snapshot = self.refresh()
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        if not len(snapshot) or not len(queries):
+            return [[] for _ in queries]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms > 0, norms, 1.0)
+
+        scores = self._scores(snapshot, queries)
+        if document_type is not None:
+            mask = snapshot.type_masks.get(document_type)
+            if mask is None:
+                return [[] for _ in queries]
+            scores[:, ~mask] = -np.inf
+
+        k = min(limit, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in queries]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        return [
+            [(snapshot.ids[row], float(score), snapshot.documents[row], snapshot.metadatas[row])
+             for row, score in zip(rows, row_scores) if score != -np.inf]
+            for rows, row_scores in zip(top.tolist(), top_scores.tolist())
+        ]
+
+    @staticmethod
+    def _scores(snapshot: _Snapshot, queries: np.ndarray) -> np.ndarray:
+        """(queries, rows) cosine similarities"""
+        if snapshot.vectors is not None:
+            return queries @ snapshot.vectors.T
+        scores = np.empty((len(queries), len(snapshot)), dtype=np.float32)
+        for start in range(0, len(snapshot), _INT8_BLOCK_ROWS):
+            block = slice(start, start + _INT8_BLOCK_ROWS)
+            scores[:, block] = (queries @ snapshot.codes[block].T.astype(np.float32)) * snapshot.scales[block]
+        return scores
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "vectors": len(snapshot) if snapshot else 0,
+            "quantized": self.quantize,
+            "memory_mb": round(snapshot.nbytes / 2 ** 20, 2) if snapshot else 0.0,
+            "reloads": self.reloads,
+            "last_reload_ms": round(self.last_reload_ms, 2),
+        }
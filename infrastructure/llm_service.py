@@ -1,79 +1,306 @@
-from langchain_core.messages import HumanMessage, SystemMessage
+import asyncio
+import hashlib
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
 from core.config import settings
+from infrastructure.metrics import llm_request_seconds, observe
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying on another provider (timeouts, rate limits, server errors)
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+_RETRYABLE_NAMES = ("Timeout", "RateLimit", "Connection", "InternalServer", "ServiceUnavailable", "Overloaded")
+# Latency samples kept per provider for the percentiles
+_LATENCY_WINDOW = 1000
+
+_http_async_client: Optional["httpx.AsyncClient"] = None
+
+
+def shared_http_client() -> Optional["httpx.AsyncClient"]:
+    """One keep-alive connection pool per process for the OpenAI-compatible provider"""
+    global _http_async_client
+    if _http_async_client is None and httpx is not None:
+        _http_async_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=5.0)
+        )
+    return _http_async_client
+
+
+async def close_shared_http_client():
+    """Close the shared connection pool (worker shutdown); the next use opens a new one"""
+    global _http_async_client
+    if _http_async_client is not None:
+        client, _http_async_client = _http_async_client, None
+        await client.aclose()
+
+
+def _build_openai():
+    try:
+        from langchain_openai import ChatOpenAI
+    except ImportError:
+        raise ImportError("LangChain OpenAI library not installed. Install with: pip install langchain-openai")
+    options = {"http_async_client": shared_http_client()} if httpx is not None else {}
+    return ChatOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        model=settings.OPENAI_MODEL,
+        temperature=0.1,
+        max_tokens=1000,
+        max_retries=settings.LLM_MAX_RETRIES,
+        **options
+    )
+
+
+def _build_anthropic():
+    try:
+        from langchain_anthropic import ChatAnthropic
+    except ImportError:
+        raise ImportError("LangChain Anthropic library not installed. Install with: pip install langchain-anthropic")
+    return ChatAnthropic(
+        api_key=settings.ANTHROPIC_API_KEY,
+        model=settings.ANTHROPIC_MODEL,
+        temperature=0.1,
+        max_tokens=1000,
+        max_retries=settings.LLM_MAX_RETRIES
+    )
+
+
+def _build_google():
+    try:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+    except ImportError:
+        raise ImportError("LangChain Google GenAI library not installed. Install with: pip install langchain-google-genai")
+    return ChatGoogleGenerativeAI(
+        api_key=settings.GOOGLE_API_KEY,
+        model=settings.GOOGLE_MODEL,
+        temperature=0.1,
+        max_tokens=1000,
+        max_retries=settings.LLM_MAX_RETRIES
+    )
+
+
+_BUILDERS = {"openai": _build_openai, "anthropic": _build_anthropic, "google": _build_google}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, rate limits, connection and server errors - worth another provider"""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status in _RETRYABLE_STATUS:
+        return True
+    return any(name in type(error).__name__ for name in _RETRYABLE_NAMES)
+
+
+class ProviderClient:
+    """One provider's chat client, its concurrency limit and its counters"""
+
+    def __init__(self, name: str, client: Any, max_concurrency: int):
+        self.name = name
+        self.client = client
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.requests = 0
+        self.errors: Dict[str, int] = {}
+        self.latencies_ms: deque = deque(maxlen=_LATENCY_WINDOW)
+
+    def record(self, started: float, error: Optional[BaseException] = None):
+        elapsed = time.perf_counter() - started
+        self.latencies_ms.append(elapsed * 1000)
+        if error is not None:
+            kind = "timeout" if isinstance(error, asyncio.TimeoutError) else type(error).__name__
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+        outcome = "ok" if error is None else "timeout" if isinstance(error, asyncio.TimeoutError) else "error"
+        observe(llm_request_seconds, elapsed, self.name, outcome)
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies_ms)
+
+        def percentile(p: float) -> Optional[float]:
+            return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)], 2) if latencies else None
+
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "errors": dict(self.errors),
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99)},
+        }
 
 
 class LLMService:
+    """
+    Chat completions with coalescing, per-provider limits and failover.
+
+    - Identical prompts in flight at the same time share one provider call.
+    - Each provider allows at most LLM_MAX_CONCURRENCY calls at once; the
+      OpenAI-compatible client reuses one pooled HTTP client per process.
+    - LLM_PROVIDER is tried first. If it fails with a timeout, rate limit or
+      server error, the next of LLM_FALLBACK_PROVIDERS is tried; if it has
+      not answered after LLM_HEDGE_DELAY seconds, the next provider is
+      started in parallel (hedged) and the first answer wins.
+    """
+
     def __init__(self):
         self.provider = settings.LLM_PROVIDER
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.coalesced = 0
+        self.hedged = 0
+        self.failovers = 0
         self.setup_client()
-        
+
     def setup_client(self):
-        if self.provider == "openai":
-            try:
-                from langchain_openai import ChatOpenAI
-                self.client = ChatOpenAI(
-                    api_key=settings.OPENAI_API_KEY,
-                    base_url=settings.OPENAI_BASE_URL,
-                    model="nex-agi/deepseek-v3.1-nex-n1:free",
-                    temperature=0.1,
-                    max_tokens=1000
-                )
-            except ImportError:
-                raise ImportError("LangChain OpenAI library not installed. Install with: pip install langchain-openai")
-        elif self.provider == "anthropic":
-            try:
-                from langchain_anthropic import ChatAnthropic
-                self.client = ChatAnthropic(
-                    api_key=settings.ANTHROPIC_API_KEY,
-                    model="claude-3-sonnet-20240229",
-                    temperature=0.1,
-                    max_tokens=1000
-                )
-            except ImportError:
-                raise ImportError("LangChain Anthropic library not installed. Install with: pip install langchain-anthropic")
-        elif self.provider == "google":
-            try:
-                from langchain_google_genai import ChatGoogleGenerativeAI
-                self.client = ChatGoogleGenerativeAI(
-                    api_key=settings.GOOGLE_API_KEY,
-                    model="gemini-1.5-flash",
-                    temperature=0.1,
-                    max_tokens=1000
-                )
-            except ImportError:
-                raise ImportError("LangChain Google GenAI library not installed. Install with: pip install langchain-google-genai")
-        else:
+        if self.provider not in _BUILDERS:
             raise ValueError(f"Unsupported LLM provider: {self.provider}")
-        
-    async def generate_response(self, prompt: str, **kwargs) -> str:
-        if self.provider == "openai":
-            return await self._openai_generate(prompt, **kwargs)
-        elif self.provider == "anthropic":
-            return await self._anthropic_generate(prompt, **kwargs)
-        elif self.provider == "google":
-            return await self._google_generate(prompt, **kwargs)
-        
-    async def _openai_generate(self, prompt: str, **kwargs) -> str:
-        messages = [
-            SystemMessage(content="You are a helpful university assistant."),
-            HumanMessage(content=f"Question: {prompt}")
+        self.providers: List[ProviderClient] = [
+            ProviderClient(self.provider, _BUILDERS[self.provider](), settings.LLM_MAX_CONCURRENCY)
         ]
-        response = await self.client.ainvoke(messages)
-        return response.content
-    
+        for name in settings.LLM_FALLBACK_PROVIDERS:
+            if name == self.provider or name in [provider.name for provider in self.providers]:
+                continue
+            if name not in _BUILDERS:
+                raise ValueError(f"Unsupported LLM fallback provider: {name}")
+            try:
+                self.providers.append(ProviderClient(name, _BUILDERS[name](), settings.LLM_MAX_CONCURRENCY))
+            except Exception as e:
+                # A broken fallback must not take the primary down with it
+                logger.warning("LLM fallback provider %s unavailable: %s", name, e)
+        self.client = self.providers[0].client
 
-    async def _anthropic_generate(self, prompt: str, **kwargs) -> str:
-        messages = [
+    @staticmethod
+    def _messages(prompt: str) -> list:
+        # Already loaded by the chat client builders; deferred to keep module import light
+        from langchain_core.messages import HumanMessage, SystemMessage
+        return [
             SystemMessage(content="You are a helpful university assistant."),
             HumanMessage(content=f"Question: {prompt}")
         ]
-        response = await self.client.ainvoke(messages)
-        return response.content
 
-    async def _google_generate(self, prompt: str, **kwargs) -> str:
-        messages = [
-            SystemMessage(content="You are a helpful university assistant."),
-            HumanMessage(content=f"Question: {prompt}")
-        ]
-        response = await self.client.ainvoke(messages)
-        return response.content
\ No newline at end of file
+    async def generate_response(self, prompt: str, **kwargs) -> str:
+        """Answer the prompt; concurrent calls with the same prompt share one completion"""
+        key = hashlib.sha256(f"{prompt}\x00{sorted(kwargs.items())}".encode("utf-8")).hexdigest()
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        task = asyncio.ensure_future(self._generate_with_failover(self._messages(prompt)))
+        self._pending[key] = task
+        task.add_done_callback(lambda _: self._pending.pop(key, None))
+        # Shielded: a caller that gives up must not cancel the call others are waiting on
+        return await asyncio.shield(task)
+
+    async def _generate_with_failover(self, messages: list) -> str:
+        attempts: Dict[asyncio.Task, ProviderClient] = {}
+        remaining = list(self.providers)
+        last_error: Optional[BaseException] = None
+
+        def start_next():
+            provider = remaining.pop(0)
+            attempts[asyncio.ensure_future(self._invoke(provider, messages))] = provider
+
+        start_next()
+        try:
+            while attempts:
+                hedge_delay = settings.LLM_HEDGE_DELAY if remaining and settings.LLM_HEDGE_DELAY > 0 else None
+                done, _ = await asyncio.wait(attempts, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slow, not failed: race the next provider against it
+                    self.hedged += 1
+                    start_next()
+                    continue
+
+                for task in done:
+                    provider = attempts.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                    if not is_retryable(last_error):
+                        raise last_error
+                    logger.warning("LLM provider %s failed (%s), failing over", provider.name, type(last_error).__name__)
+                if not attempts and remaining:
+                    self.failovers += 1
+                    start_next()
+            raise last_error
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    async def _invoke(self, provider: ProviderClient, messages: list) -> str:
+        async with provider.semaphore:
+            provider.requests += 1
+            provider.in_flight += 1
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(provider.client.ainvoke(messages), timeout=settings.LLM_TIMEOUT)
+            except asyncio.CancelledError:
+                raise  # lost a hedge race - not the provider's fault
+            except Exception as e:
+                provider.record(started, e)
+                raise
+            else:
+                provider.record(started)
+                return response.content
+            finally:
+                provider.in_flight -= 1
+
+    async def stream_response(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Yield answer tokens as the provider streams them (fails over until the first token)"""
+        messages = self._messages(prompt)
+        for index, provider in enumerate(self.providers):
+            streamed = False
+            async with provider.semaphore:
+                provider.requests += 1
+                provider.in_flight += 1
+                started = time.perf_counter()
+                stream = provider.client.astream(messages)
+                try:
+                    # A provider that stalls before its first token fails over like _invoke
+                    first = await asyncio.wait_for(self._first_token(stream), timeout=settings.LLM_TIMEOUT)
+                    if first is not None:
+                        streamed = True
+                        yield first
+                        async for chunk in stream:
+                            if chunk.content:
+                                yield chunk.content
+                    provider.record(started)
+                    return
+                except Exception as e:
+                    provider.record(started, e)
+                    if streamed or not is_retryable(e) or index == len(self.providers) - 1:
+                        raise
+                    self.failovers += 1
+                    logger.warning("LLM provider %s failed (%s), failing over", provider.name, type(e).__name__)
+                finally:
+                    provider.in_flight -= 1
+                    if hasattr(stream, "aclose"):
+                        await stream.aclose()
+
+    @staticmethod
+    async def _first_token(stream) -> Optional[str]:
+        """Content of the first non-empty chunk, or None if the stream ends without one"""
+        async for chunk in stream:
+            if chunk.content:
+                return chunk.content
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-provider requests, errors and latency, plus coalescing/hedging counters"""
+        return {
+            "providers": {provider.name: provider.stats() for provider in self.providers},
+            "coalesced": self.coalesced,
+            "hedged": self.hedged,
+            "failovers": self.failovers,
+            "pending": len(self._pending),
+        }
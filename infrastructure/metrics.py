@@ -0,0 +1,237 @@
+import bisect
+import contextvars
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from core.config import settings
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+# Upper bounds in seconds - from a sub-millisecond cache hit to a slow LLM answer
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# ASGI scope of the request being served; stages read their endpoint label from it
+_current_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_scope", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_bound(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Histogram:
+    """Fixed-bucket histogram per label set; an observation is one bisect and three increments"""
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str],
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(series):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                le = _format_labels(self.label_names, labels, f'le="{_format_bound(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, description: str, label_names: Sequence[str]):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_format_labels(self.label_names, labels)} {value}" for labels, value in values)
+        return lines
+
+
+class _NoopStage:
+    """What stage() returns when metrics and tracing are off - entering it costs nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_STAGE = _NoopStage()
+
+
+class _Stage:
+    __slots__ = ("name", "started", "span")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.span = None
+
+    def __enter__(self):
+        if _tracer is not None:
+            self.span = _tracer.start_as_current_span(self.name)
+            self.span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        if settings.METRICS_ENABLED:
+            stage_seconds.observe((self.name, current_endpoint()), elapsed)
+        if self.span is not None:
+            self.span.__exit__(*exc_info)
+        return False
+
+
+def _endpoint_of(scope: dict) -> str:
+    """The matched path, or the route template when it has parameters (bounded label values)"""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # route.path lacks the include_router prefix, so static routes use the request path
+    return getattr(route, "path", "unmatched") if scope.get("path_params") else scope["path"]
+
+
+def current_endpoint() -> str:
+    """Route template of the request being served ("" outside requests, e.g. startup)"""
+    scope = _current_scope.get()
+    return "" if scope is None else _endpoint_of(scope)
+
+
+def stage(name: str):
+    """
+    Time a RAG stage: `with stage("dense_search"): ...`
+
+    Observes rag_stage_seconds{stage, endpoint} and, with OTEL_ENABLED,
+    wraps the block in an OpenTelemetry span of the same name.
+    """
+    if not _active:
+        return _NOOP_STAGE
+    return _Stage(name)
+
+
+def observe_stage(name: str, seconds: float):
+    """Record a stage that was already timed by the caller"""
+    if settings.METRICS_ENABLED:
+        stage_seconds.observe((name, current_endpoint()), seconds)
+
+
+def observe(histogram: Histogram, value: float, *labels: str):
+    if settings.METRICS_ENABLED:
+        histogram.observe(labels, value)
+
+
+def increment(counter: Counter, *labels: str):
+    if settings.METRICS_ENABLED:
+        counter.inc(labels)
+
+
+stage_seconds = Histogram("rag_stage_seconds", "Time spent per RAG stage", ("stage", "endpoint"))
+request_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency including streamed bodies", ("method", "endpoint", "status")
+)
+llm_request_seconds = Histogram(
+    "llm_request_seconds", "LLM provider call latency", ("provider", "outcome")
+)
+cache_lookups = Counter("rag_cache_lookups_total", "Answer cache lookups", ("cache", "result"))
+
+_METRICS = [request_seconds, stage_seconds, llm_request_seconds, cache_lookups]
+
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _setup_tracer():
+    if not settings.OTEL_ENABLED:
+        return None
+    if trace is None:
+        raise ImportError("OpenTelemetry not installed. Install with: pip install opentelemetry-api opentelemetry-sdk")
+    # Exporters are configured by the SDK (e.g. opentelemetry-instrument and OTEL_* variables)
+    return trace.get_tracer("ums-ai-assistant")
+
+
+_tracer = _setup_tracer()
+_active = settings.METRICS_ENABLED or _tracer is not None
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request until its last body chunk is
+    sent (so streamed answers count in full), labelled by route template.
+    It also makes the request visible to stage() for the endpoint label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _active:
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        token = _current_scope.set(scope)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_scope.reset(token)
+            if settings.METRICS_ENABLED:
+                request_seconds.observe((scope["method"], _endpoint_of(scope), status), elapsed)
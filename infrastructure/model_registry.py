@@ -0,0 +1,181 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# (provider, model name, device)
+ModelKey = Tuple[str, str, str]
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process in bytes (0 if unavailable)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in KiB on Linux - the best we have elsewhere
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, AttributeError):
+        return 0
+
+
+@dataclass
+class ModelStats:
+    provider: str
+    model_name: str
+    device: str
+    load_seconds: float
+    rss_delta_bytes: int
+    parameter_bytes: Optional[int]
+    loaded_at: float
+
+
+def _load_sentence_transformer(model_name: str, device: str) -> Any:
+    """Load FREE local embedding model"""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        logger.error("sentence-transformers not installed. Install with: pip install sentence-transformers")
+        raise
+
+    logger.info("Loading local embedding model %s (device: %s)", model_name, device)
+    return SentenceTransformer(model_name, device=None if device == "auto" else device)
+
+
+def _load_cross_encoder(model_name: str, device: str) -> Any:
+    """Load FREE local cross-encoder used for reranking"""
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError:
+        logger.error("sentence-transformers not installed. Install with: pip install sentence-transformers")
+        raise
+
+    logger.info("Loading reranker model %s (device: %s)", model_name, device)
+    return CrossEncoder(model_name, device=None if device == "auto" else device)
+
+
+def _load_openai_client(model_name: str, device: str) -> Any:
+    """Setup OpenAI embeddings client (paid)"""
+    if not settings.OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY not set in environment variables")
+    try:
+        from openai import OpenAI
+    except ImportError:
+        raise ImportError("OpenAI library not installed. Install with: pip install openai")
+    return OpenAI(api_key=settings.OPENAI_API_KEY)
+
+
+def _parameter_bytes(model: Any) -> Optional[int]:
+    """Size of the model weights if the model exposes torch parameters"""
+    parameters = getattr(model, "parameters", None)
+    if not callable(parameters):
+        return None
+    try:
+        return sum(p.numel() * p.element_size() for p in parameters())
+    except Exception:
+        return None
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of loaded models.
+
+    Every service that needs a model asks the registry for it instead of
+    loading its own copy, so a worker holds each model exactly once no matter
+    how many services reference it. Models are loaded on first use or via
+    warm_up().
+    """
+
+    def __init__(self):
+        self._models: Dict[ModelKey, Any] = {}
+        self._stats: Dict[ModelKey, ModelStats] = {}
+        self._key_locks: Dict[ModelKey, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._loaders: Dict[str, Callable[[str, str], Any]] = {
+            "local": _load_sentence_transformer,
+            "cross-encoder": _load_cross_encoder,
+            "openai": _load_openai_client,
+        }
+
+    def register_loader(self, provider: str, loader: Callable[[str, str], Any]):
+        """Register (or replace) the loader used for a provider"""
+        self._loaders[provider] = loader
+
+    def get(self, provider: str, model_name: str, device: Optional[str] = None) -> Any:
+        """Return the shared model for the key, loading it on first use"""
+        key = (provider, model_name, device or "auto")
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Per-key lock: concurrent first requests wait for one load instead of racing
+        with key_lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._load(key)
+        return model
+
+    def _load(self, key: ModelKey) -> Any:
+        provider, model_name, device = key
+        loader = self._loaders.get(provider)
+        if loader is None:
+            raise ValueError(f"Unsupported model provider: {provider}")
+
+        rss_before = current_rss_bytes()
+        started = time.perf_counter()
+        model = loader(model_name, device)
+        load_seconds = time.perf_counter() - started
+
+        self._stats[key] = ModelStats(
+            provider=provider,
+            model_name=model_name,
+            device=device,
+            load_seconds=round(load_seconds, 3),
+            rss_delta_bytes=max(current_rss_bytes() - rss_before, 0),
+            parameter_bytes=_parameter_bytes(model),
+            loaded_at=time.time(),
+        )
+        self._models[key] = model
+        logger.info("Loaded %s:%s in %.2fs", provider, model_name, load_seconds)
+        return model
+
+    def is_loaded(self, provider: str, model_name: str, device: Optional[str] = None) -> bool:
+        return (provider, model_name, device or "auto") in self._models
+
+    def warm_up(self, keys: Optional[List[ModelKey]] = None) -> List[Dict[str, Any]]:
+        """
+        Load models ahead of traffic.
+
+        Args:
+            keys: (provider, model_name, device) tuples; defaults to the
+                configured embedding model (and the reranker when enabled)
+
+        Returns:
+            Stats of the warmed models
+        """
+        if keys is None:
+            keys = [(settings.EMBEDDING_PROVIDER, settings.EMBEDDING_MODEL, settings.EMBEDDING_DEVICE)]
+            if settings.RERANKER_ENABLED:
+                keys.append(("cross-encoder", settings.RERANKER_MODEL, settings.RERANKER_DEVICE))
+        for provider, model_name, device in keys:
+            self.get(provider, model_name, device)
+        return self.stats()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Load time and memory footprint of every loaded model"""
+        return [asdict(stats) for stats in self._stats.values()]
+
+
+model_registry = ModelRegistry()
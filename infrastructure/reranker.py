@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from core.config import settings
+from domain import SearchResult
+from infrastructure.embedding_cache import text_key
+from infrastructure.model_registry import model_registry
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the per-pair latency estimate
+_LATENCY_SMOOTHING = 0.2
+
+
+class CrossEncoderReranker:
+    """
+    Optional cross-encoder reranking of fused retrieval candidates.
+
+    All (question, chunk) pairs of a request are scored in one forward pass
+    and the scores, relevance probabilities in [0, 1], replace the fusion
+    scores. Scores are cached per (question hash, chunk id); chunk ids are
+    content hashes, so a cached score never goes stale.
+
+    Reranking is best effort: it is skipped when the model is not loaded
+    yet (loading starts in the background), when too many reranks are in
+    flight, or when the estimated cost exceeds the latency budget, and it is
+    abandoned on timeout. Callers then keep the fused order.
+    """
+
+    def __init__(self):
+        self.enabled = settings.RERANKER_ENABLED
+        self.model_name = settings.RERANKER_MODEL
+        self.device = settings.RERANKER_DEVICE
+        self.budget_ms = settings.RERANKER_LATENCY_BUDGET_MS
+        self.max_in_flight = settings.RERANKER_MAX_CONCURRENCY
+        self.cache_size = settings.RERANKER_CACHE_SIZE
+
+        self._scores: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._in_flight = 0
+        self._ms_per_pair: Optional[float] = None
+        self._loading: Optional[asyncio.Task] = None
+        self.outcomes: Dict[str, int] = {}
+
+    @property
+    def model(self):
+        return model_registry.get("cross-encoder", self.model_name, self.device)
+
+    def is_ready(self) -> bool:
+        return model_registry.is_loaded("cross-encoder", self.model_name, self.device)
+
+    async def rerank(self, question: str,
+                     results: List[SearchResult]) -> Tuple[List[SearchResult], Dict[str, Any]]:
+        """
+        Reorder results by cross-encoder relevance
+
+        Returns:
+            (results - reranked if status is "ok", otherwise in fused order,
+             {"status", "latency_ms", "candidates", "scored", "cached"})
+        """
+        started = time.perf_counter()
+        stats: Dict[str, Any] = {"candidates": len(results), "scored": 0, "cached": 0}
+
+        def done(status: str, ranked: List[SearchResult]) -> Tuple[List[SearchResult], Dict[str, Any]]:
+            self.outcomes[status] = self.outcomes.get(status, 0) + 1
+            stats.update(status=status, latency_ms=round((time.perf_counter() - started) * 1000, 2))
+            return ranked, stats
+
+        if not self.enabled or not results:
+            return done("disabled" if not self.enabled else "ok", results)
+        if not self.is_ready():
+            self._start_loading()
+            return done("cold", results)
+
+        query_hash = text_key(question)
+        cached = {result.chunk.id: self._scores.get((query_hash, result.chunk.id)) for result in results}
+        missing = [result for result in results if cached[result.chunk.id] is None]
+        stats["cached"] = len(results) - len(missing)
+
+        if missing:
+            estimate = self._ms_per_pair * len(missing) if self._ms_per_pair is not None else 0.0
+            if estimate > self.budget_ms:
+                # Decay the estimate so reranking is tried again once load drops
+                self._ms_per_pair *= 1 - _LATENCY_SMOOTHING
+                return done("over_budget", results)
+            if self._in_flight >= self.max_in_flight:
+                return done("overloaded", results)
+
+            self._in_flight += 1
+            prediction = asyncio.ensure_future(asyncio.to_thread(self._predict, question, missing))
+            prediction.add_done_callback(lambda task: self._predicted(task, query_hash, missing))
+            try:
+                # Shielded: a prediction that overruns still finishes and fills the cache
+                scores = await asyncio.wait_for(asyncio.shield(prediction), timeout=self.budget_ms / 1000)
+            except asyncio.TimeoutError:
+                return done("timeout", results)
+            except Exception as e:
+                logger.error("Reranking failed: %s", e)
+                return done("error", results)
+
+            stats["scored"] = len(missing)
+            cached.update((result.chunk.id, score) for result, score in zip(missing, scores))
+
+        reranked = [
+            SearchResult(chunk=result.chunk, score=cached[result.chunk.id], source=result.source)
+            for result in results
+        ]
+        reranked.sort(key=lambda result: result.score, reverse=True)
+        return done("ok", reranked)
+
+    def _predict(self, question: str, results: List[SearchResult]) -> List[float]:
+        """One forward pass over every pair (runs in a worker thread)"""
+        import torch  # already loaded with the model
+
+        started = time.perf_counter()
+        scores = self.model.predict(
+            [(question, result.chunk.content) for result in results],
+            batch_size=len(results),
+            show_progress_bar=False,
+            # ms-marco cross-encoders return raw logits by default
+            activation_fn=torch.nn.Sigmoid()
+        )
+        per_pair = (time.perf_counter() - started) * 1000 / len(results)
+        self._ms_per_pair = per_pair if self._ms_per_pair is None else (
+            _LATENCY_SMOOTHING * per_pair + (1 - _LATENCY_SMOOTHING) * self._ms_per_pair
+        )
+        return np.asarray(scores, dtype=np.float32).reshape(-1).tolist()
+
+    def _predicted(self, prediction: asyncio.Future, query_hash: str, results: List[SearchResult]):
+        self._in_flight -= 1
+        if prediction.cancelled() or prediction.exception() is not None:
+            return
+        for result, score in zip(results, prediction.result()):
+            key = (query_hash, result.chunk.id)
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+        while len(self._scores) > self.cache_size:
+            self._scores.popitem(last=False)
+
+    def _start_loading(self):
+        if self._loading is None:
+            self._loading = asyncio.create_task(self._load())
+
+    async def _load(self):
+        try:
+            await asyncio.to_thread(lambda: self.model)
+        except Exception as e:
+            # e.g. sentence-transformers not installed - stop trying in this worker
+            logger.error("Could not load reranker %s, reranking disabled: %s", self.model_name, e)
+            self.enabled = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "loaded": self.is_ready(),
+            "ms_per_pair": round(self._ms_per_pair, 3) if self._ms_per_pair is not None else None,
+            "cached_scores": len(self._scores),
+            "outcomes": dict(self.outcomes),
+        }
@@ -0,0 +1,125 @@
+import re
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from core.config import settings
+
+# Buckets for the best-match similarity histogram: [0.0, 0.1), ..., [0.9, 1.0]
+HISTOGRAM_BUCKETS = 10
+
+# GPAs, amounts, years: "3.50", "50,000"
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def _numbers(question: str) -> List[str]:
+    return sorted(number.replace(",", "") for number in _NUMBER.findall(question))
+
+
+class SemanticCache:
+    """
+    In-memory nearest-neighbour cache of recently answered questions.
+
+    Question embeddings live in one preallocated, L2-normalised float32
+    matrix used as a ring buffer; a lookup is a single matrix-vector product
+    plus argmax. At a few thousand entries this exact search is cheaper than
+    maintaining an approximate index, and it never misses a true neighbour.
+    """
+
+    def __init__(self, capacity: Optional[int] = None, threshold: Optional[float] = None,
+                 ttl: Optional[int] = None):
+        self.capacity = capacity or settings.SEMANTIC_CACHE_SIZE
+        self.threshold = settings.SEMANTIC_CACHE_THRESHOLD if threshold is None else threshold
+        self.ttl = ttl or settings.CACHE_TTL
+
+        self._embeddings: Optional[np.ndarray] = None  # allocated on first add (dim unknown until then)
+        self._entries: List[Optional[Tuple[str, Dict[str, Any], float]]] = [None] * self.capacity
+        self._size = 0
+        self._next_slot = 0
+
+        self.hits = 0
+        self.misses = 0
+        self._similarity_histogram = [0] * HISTOGRAM_BUCKETS
+
+    @staticmethod
+    def _normalise(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding: Sequence[float],
+               question: Optional[str] = None) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Find the closest cached question (with the same numbers as `question`, if given)
+
+        Returns:
+            (cached value, similarity) if the best match clears the threshold, else None
+        """
+        if not self._size:
+            self.misses += 1
+            return None
+
+        query = self._normalise(embedding)
+        similarities = self._embeddings[:self._size] @ query
+        self._record_similarity(float(similarities.max()))
+
+        numbers = _numbers(question) if question is not None else None
+        candidates = np.flatnonzero(similarities >= self.threshold)
+        for slot in candidates[np.argsort(-similarities[candidates], kind="stable")]:
+            entry = self._entries[slot]
+            if entry is None:
+                continue
+            cached_question, value, expires_at = entry
+            if expires_at < time.time():
+                self._evict(int(slot))
+                continue
+            if numbers is not None and _numbers(cached_question) != numbers:
+                continue
+            self.hits += 1
+            return value, float(similarities[slot])
+
+        self.misses += 1
+        return None
+
+    def add(self, question: str, embedding: Sequence[float], value: Dict[str, Any]):
+        """Remember an answered question, overwriting the oldest entry when full"""
+        vector = self._normalise(embedding)
+        if self._embeddings is None:
+            self._embeddings = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+
+        slot = self._next_slot
+        self._embeddings[slot] = vector
+        self._entries[slot] = (question, value, time.time() + self.ttl)
+        self._next_slot = (slot + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def _evict(self, slot: int):
+        # A zero vector has similarity 0 with everything, so the slot is never matched again
+        self._embeddings[slot] = 0.0
+        self._entries[slot] = None
+
+    def _record_similarity(self, similarity: float):
+        bucket = min(max(int(similarity * HISTOGRAM_BUCKETS), 0), HISTOGRAM_BUCKETS - 1)
+        self._similarity_histogram[bucket] += 1
+
+    def clear(self):
+        if self._embeddings is not None:
+            self._embeddings[:] = 0.0
+        self._entries = [None] * self.capacity
+        self._size = 0
+        self._next_slot = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": sum(entry is not None for entry in self._entries[:self._size]),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "similarity_histogram": {
+                f"{i / HISTOGRAM_BUCKETS:.1f}-{(i + 1) / HISTOGRAM_BUCKETS:.1f}": count
+                for i, count in enumerate(self._similarity_histogram)
+            },
+        }
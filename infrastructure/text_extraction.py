@@ -0,0 +1,146 @@
+"""
+Text extraction for ingestion.
+
+Kept free of heavy imports (Chroma, embedding models) because the ingestion
+pipeline runs these functions in worker processes.
+"""
+import importlib
+import logging
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt', '.docx')
+
+# (1-based page number, page text)
+Page = Tuple[int, str]
+
+
+@lru_cache(maxsize=None)
+def _parser(module_name: str):
+    """
+    Import a document parser on first use (None if not installed)
+
+    API workers import this module through the chunker's token counter
+    but never parse files, so they never load PyMuPDF, PyPDF2 or python-docx.
+    """
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        return None
+
+
+def count_pages(file_path: str) -> int:
+    """Number of pages to extract (TXT/DOCX count as a single page)"""
+    if not file_path.lower().endswith('.pdf'):
+        return 1
+    fitz = _parser("fitz")
+    if fitz is not None:
+        try:
+            with fitz.open(file_path) as doc:
+                return len(doc)
+        except Exception as e:
+            logger.warning("pymupdf error: %s", e)
+    with open(file_path, 'rb') as file:
+        return len(_parser("PyPDF2").PdfReader(file).pages)
+
+
+def extract_page_range(file_path: str, start: int, end: int) -> List[Page]:
+    """
+    Extract pages [start, end) - the unit of work sent to extraction processes,
+    so only a bounded slice of a document is ever in memory at once
+    """
+    return list(iter_pages(file_path, start, end))
+
+
+def iter_pages(file_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Page]:
+    """Yield pages with text one at a time"""
+    try:
+        if file_path.lower().endswith('.pdf'):
+            # Use pymupdf for better PDF extraction
+            if _parser("fitz") is not None:
+                yield from _iter_pages_with_pymupdf(file_path, start, end)
+            else:
+                logger.warning("pymupdf not available, falling back to PyPDF2")
+                yield from _iter_pages_with_pypdf2(file_path, start, end)
+
+        elif file_path.lower().endswith('.txt'):
+            yield from _extract_text_from_txt(file_path)
+
+        elif file_path.lower().endswith('.docx'):
+            yield from _extract_text_from_docx(file_path)
+
+        else:
+            logger.warning("Unsupported file format: %s", file_path)
+
+    except Exception as e:
+        logger.error("Error extracting text from %s: %s", file_path, e)
+
+
+def _iter_pages_with_pymupdf(file_path: str, start: int, end: Optional[int]) -> Iterator[Page]:
+    """Extract text using pymupdf (more robust)"""
+    next_page = start
+    try:
+        doc = _parser("fitz").open(file_path)
+        try:
+            for page_num in range(start, min(end, len(doc)) if end is not None else len(doc)):
+                text = doc[page_num].get_text()
+                next_page = page_num + 1
+                if text and text.strip():
+                    yield (page_num + 1, text)
+        finally:
+            doc.close()
+    except Exception as e:
+        logger.warning("pymupdf error: %s", e)
+        # Continue with PyPDF2 from the first page pymupdf did not finish
+        yield from _iter_pages_with_pypdf2(file_path, next_page, end)
+
+
+def _iter_pages_with_pypdf2(file_path: str, start: int, end: Optional[int]) -> Iterator[Page]:
+    """Extract text using PyPDF2 (fallback)"""
+    try:
+        with open(file_path, 'rb') as file:
+            pdf_reader = _parser("PyPDF2").PdfReader(file)
+            total = len(pdf_reader.pages)
+            for page_num in range(start, min(end, total) if end is not None else total):
+                try:
+                    text = pdf_reader.pages[page_num].extract_text()
+                    if text and text.strip():
+                        yield (page_num + 1, text)
+                except Exception as e:
+                    logger.warning("Error reading page %d: %s", page_num, e)
+    except Exception as e:
+        logger.error("PyPDF2 error: %s", e)
+
+
+def _extract_text_from_txt(file_path: str) -> List[Page]:
+    """Extract text from TXT file"""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            text = file.read()
+            if text.strip():
+                return [(1, text)]
+    except Exception as e:
+        logger.error("Error reading TXT file: %s", e)
+    return []
+
+
+def _extract_text_from_docx(file_path: str) -> List[Page]:
+    """Extract text from DOCX file"""
+    docx = _parser("docx")
+    if docx is None:
+        logger.warning("python-docx not installed. Install with: pip install python-docx")
+        return []
+    try:
+        doc = docx.Document(file_path)
+        full_text = []
+        for para in doc.paragraphs:
+            if para.text.strip():
+                full_text.append(para.text)
+        text = '\n'.join(full_text)
+        if text.strip():
+            return [(1, text)]
+    except Exception as e:
+        logger.error("Error reading DOCX file: %s", e)
+    return []
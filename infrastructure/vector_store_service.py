@@ -1,29 +1,126 @@
-import chromadb
-from typing import List, Optional
+import asyncio
+import logging
+import threading
+import time
+import numpy as np
+from typing import Any, Awaitable, Dict, List, Optional, Sequence, Set, Tuple, Union
 from domain import DocumentChunk, SearchResult, DocumentType
 from infrastructure.embedding_service import EmbeddingService
+from infrastructure.bm25_index import BM25Index
+from infrastructure.inmemory_index import InMemoryVectorIndex
+from infrastructure.metrics import observe_stage, stage
 from core.config import settings
 
+logger = logging.getLogger(__name__)
+
+# One type, several types, or None for every partition
+DocumentTypes = Union[DocumentType, Sequence[DocumentType], None]
+
+
 class VectorStoreService:
-    def __init__(self):
-        self.embedding_service = EmbeddingService()
+    """
+    Chunks are stored in one Chroma collection per DocumentType, so a query
+    only searches the partitions of the types it asks for. Queries over
+    several types fan out to their partitions concurrently and the ranked
+    lists are merged, which keeps single-type latency flat as document
+    families are added.
+    """
+
+    def __init__(self, embedding_service: Optional[EmbeddingService] = None):
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.bm25_index = BM25Index()
+        self._bm25_bootstrapped = False
+        self._bm25_bootstrap_lock = threading.Lock()
         self.setup_vector_db()
     
     def setup_vector_db(self):
-        if settings.VECTOR_DB_TYPE == "chroma":
+        self.indexes: Dict[DocumentType, InMemoryVectorIndex] = {}
+        if settings.VECTOR_DB_TYPE in ("chroma", "inmemory"):
+            # Imported here (~0.6s) so API workers pay for it in the parallel startup phase
+            import chromadb
+
             # Create persistent client
             self.client = chromadb.PersistentClient(path=settings.CHROMA_DB_PATH)
 
-            # Get or create collection
-            self.collection = self.client.get_or_create_collection(
-                name="university_documents",
-                metadata={"description": "University scholarship and policy documents"}
-            )
-            print(f"Connected to ChromaDB collection: {self.collection.name}")
+            # Get or create one collection (partition) per document type
+            self.collections = {
+                document_type: self.client.get_or_create_collection(
+                    name=f"{settings.CHROMA_COLLECTION_PREFIX}_{document_type.value}",
+                    metadata={"description": f"University {document_type.value} documents"}
+                )
+                for document_type in DocumentType
+            }
+            self._migrate_unpartitioned_collection()
+            logger.info("Connected to ChromaDB: %d partitions of %s", len(self.collections), settings.CHROMA_COLLECTION_PREFIX)
+
+            if settings.VECTOR_DB_TYPE == "inmemory":
+                # Dense search is served from RAM; Chroma remains the store every write goes to
+                self.indexes = {
+                    document_type: InMemoryVectorIndex(
+                        collection, settings.CHROMA_DB_PATH, quantize=settings.INMEMORY_INDEX_QUANTIZE
+                    )
+                    for document_type, collection in self.collections.items()
+                }
         else:
             raise ValueError(f"Unsupported vector DB type: {settings.VECTOR_DB_TYPE}")
         # Add Pinecone/Weaviate support here
-    
+
+    def _migrate_unpartitioned_collection(self):
+        """One-off move of chunks from the old single collection into the per-type partitions"""
+        legacy_name = settings.CHROMA_COLLECTION_PREFIX
+        if legacy_name not in [getattr(c, "name", c) for c in self.client.list_collections()]:
+            return
+        legacy = self.client.get_collection(legacy_name)
+        total = legacy.count()
+        if total and any(collection.count() for collection in self.collections.values()):
+            logger.warning("Both %s and its partitions hold chunks - leaving %s untouched", legacy_name, legacy_name)
+            return
+
+        logger.info("Moving %d chunks from %s into per-type partitions", total, legacy_name)
+        for offset in range(0, total, 1000):
+            records = legacy.get(include=["embeddings", "documents", "metadatas"], limit=1000, offset=offset)
+            by_type: Dict[DocumentType, List[int]] = {}
+            for row, metadata in enumerate(records['metadatas']):
+                by_type.setdefault(self._document_type_of(metadata), []).append(row)
+            for document_type, rows in by_type.items():
+                self.collections[document_type].upsert(
+                    ids=[records['ids'][row] for row in rows],
+                    embeddings=np.asarray(records['embeddings'], dtype=np.float32)[rows],
+                    metadatas=[records['metadatas'][row] for row in rows],
+                    documents=[records['documents'][row] for row in rows]
+                )
+
+        moved = sum(collection.count() for collection in self.collections.values())
+        if moved != total:
+            logger.error("Moved %d of %d chunks - keeping %s", moved, total, legacy_name)
+            return
+        self.client.delete_collection(legacy_name)
+        logger.info("Moved %d chunks into partitions", moved)
+
+    @staticmethod
+    def _partitions(document_type: DocumentTypes) -> List[DocumentType]:
+        if document_type is None:
+            return list(DocumentType)
+        if isinstance(document_type, DocumentType):
+            return [document_type]
+        return list(dict.fromkeys(document_type))
+
+    @staticmethod
+    def _document_type_of(metadata: dict) -> DocumentType:
+        return DocumentType(metadata.get('document_type', 'scholarship'))
+
+    def count(self, document_type: DocumentTypes = None) -> int:
+        """Stored chunks in the given partitions"""
+        return sum(self.collections[partition].count() for partition in self._partitions(document_type))
+
+    async def _each_partition(self, document_type: DocumentTypes, call) -> List[Tuple[DocumentType, Any]]:
+        """Run a blocking call(collection) on every partition concurrently"""
+        partitions = self._partitions(document_type)
+        results = await asyncio.gather(*(
+            asyncio.to_thread(call, self.collections[partition]) for partition in partitions
+        ))
+        return list(zip(partitions, results))
+
     async def add_documents(self, chunks: List[DocumentChunk]):
         """
         Add document chunks to vector database
@@ -32,179 +129,432 @@ class VectorStoreService:
             chunks: List of DocumentChunk objects
         """
         if not chunks:
-            print("No chunks to add")
+            logger.info("No chunks to add")
             return
 
-        print(f"Adding {len(chunks)} chunks to vector database...")
+        logger.info("Adding %d chunks to vector database", len(chunks))
 
-        # Prepare data for ChromaDB
-        ids = []
-        documents = []
-        metadatas = []
+        # Get embeddings for all chunks
+        embeddings = await self.embedding_service.get_embeddings([chunk.content for chunk in chunks])
+        await self.upsert_embeddings(chunks, embeddings)
 
-        for chunk in chunks:
-            ids.append(chunk.id)
-            documents.append(chunk.content)
-            metadatas.append(chunk.metadata)
+        logger.info("Successfully added %d chunks", len(chunks))
 
-        # Get embeddings for all chunks
-        embeddings = await self.embedding_service.get_embeddings(documents)
-
-        # Add to collection
-        self.collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            documents=documents
+    async def upsert_embeddings(self, chunks: List[DocumentChunk], embeddings: np.ndarray):
+        """Store chunks whose embeddings were already computed (float32 rows, in chunk order)"""
+        if not chunks:
+            return
+        await asyncio.to_thread(self._ensure_bm25_index)
+
+        rows_by_type: Dict[DocumentType, List[int]] = {}
+        for row, chunk in enumerate(chunks):
+            rows_by_type.setdefault(chunk.document_type, []).append(row)
+
+        for document_type, rows in rows_by_type.items():
+            # Upsert so re-ingesting a chunk id replaces it instead of failing.
+            # Chroma takes the float32 array as is - no per-float Python objects
+            await asyncio.to_thread(
+                self.collections[document_type].upsert,
+                ids=[chunks[row].id for row in rows],
+                embeddings=embeddings if len(rows) == len(chunks) else embeddings[rows],
+                metadatas=[chunks[row].metadata for row in rows],
+                documents=[chunks[row].content for row in rows]
+            )
+
+        # Keep the lexical index in step with the collection
+        await asyncio.to_thread(
+            self.bm25_index.add,
+            [chunk.id for chunk in chunks],
+            [chunk.content for chunk in chunks],
+            [chunk.document_type.value for chunk in chunks]
+        )
+
+    def deferred_bm25_commits(self):
+        """Buffer BM25 writes until flush_bm25() or the end of the block (one index version instead of one per batch)"""
+        self._ensure_bm25_index()
+        return self.bm25_index.deferred()
+
+    async def flush_bm25(self):
+        """Publish buffered BM25 writes"""
+        await asyncio.to_thread(self.bm25_index.flush)
+
+    async def index_missing_bm25(self, chunks: List[DocumentChunk]):
+        """Add stored chunks the BM25 index lacks (stored by a run that stopped before publishing them)"""
+        await asyncio.to_thread(self._ensure_bm25_index)
+        indexed_types = self.bm25_index.document_types([chunk.id for chunk in chunks])
+        missing = [chunk for chunk, type_name in zip(chunks, indexed_types) if type_name is None]
+        if missing:
+            logger.info("Adding %d stored chunks missing from the BM25 index", len(missing))
+            await asyncio.to_thread(
+                self.bm25_index.add,
+                [chunk.id for chunk in missing],
+                [chunk.content for chunk in missing],
+                [chunk.document_type.value for chunk in missing]
+            )
+
+    async def existing_ids(self, ids: List[str], document_type: DocumentTypes = None) -> Set[str]:
+        """Which of these chunk ids are already stored"""
+        if not ids:
+            return set()
+        found = await self._each_partition(document_type, lambda collection: collection.get(ids=ids, include=[]))
+        return {chunk_id for _, records in found for chunk_id in records['ids']}
+
+    async def get_chunks(self, ids: List[str], document_type: DocumentTypes = None) -> List[DocumentChunk]:
+        """Fetch stored chunks by id (in the given order, missing ids skipped)"""
+        if not ids:
+            return []
+        found = await self._each_partition(
+            document_type, lambda collection: collection.get(ids=ids, include=["documents", "metadatas"])
         )
+        by_id = {
+            chunk_id: self._chunk_from_record(chunk_id, document, metadata)
+            for _, records in found
+            for chunk_id, document, metadata in zip(records['ids'], records['documents'], records['metadatas'])
+        }
+        return [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+
+    async def ids_for_source(self, source: str, document_type: DocumentType) -> List[str]:
+        """All chunk ids stored for a source document"""
+        records = await asyncio.to_thread(self.collections[document_type].get, where={"source": source}, include=[])
+        return records['ids']
+
+    async def update_metadata(self, chunks: List[DocumentChunk]):
+        """Refresh metadata of stored chunks without re-embedding them"""
+        by_type: Dict[DocumentType, List[DocumentChunk]] = {}
+        for chunk in chunks:
+            by_type.setdefault(chunk.document_type, []).append(chunk)
+        for document_type, typed_chunks in by_type.items():
+            await asyncio.to_thread(
+                self.collections[document_type].update,
+                ids=[chunk.id for chunk in typed_chunks],
+                metadatas=[chunk.metadata for chunk in typed_chunks]
+            )
 
-        print(f"Successfully added {len(chunks)} chunks")
+    async def delete_documents(self, ids: List[str], document_type: DocumentTypes = None):
+        """Remove chunks from their partitions (all of them if the type is unknown) and the BM25 index"""
+        if not ids:
+            return
+        await asyncio.to_thread(self._ensure_bm25_index)
+        await self._each_partition(document_type, lambda collection: collection.delete(ids=ids))
+        await asyncio.to_thread(self.bm25_index.delete, ids)
+        logger.info("Deleted %d chunks", len(ids))
     
-    async def search(self, query: str, document_type: DocumentType = None,
+    async def search(self, query: str, document_type: DocumentTypes = None,
                     limit: int = 5) -> List[SearchResult]:
         """Advanced hybrid search with dense and sparse components using RRF"""
         return await self.advanced_hybrid_search(query, document_type, limit)
 
-    async def advanced_hybrid_search(self, query: str, document_type: DocumentType = None,
+    async def search_with_metadata(self, query: str, document_type: DocumentTypes = None,
+                                   limit: int = 5,
+                                   query_embedding: Optional[np.ndarray] = None
+                                   ) -> Tuple[List[SearchResult], Dict[str, Any]]:
+        """Hybrid search that also returns per-leg retrieval metadata"""
+        return await self.hybrid_search_with_metadata(query, document_type, limit, query_embedding)
+
+    async def advanced_hybrid_search(self, query: str, document_type: DocumentTypes = None,
                                     limit: int = 10) -> List[SearchResult]:
         """More sophisticated hybrid search with separate components"""
+        results, _ = await self.hybrid_search_with_metadata(query, document_type, limit)
+        return results
 
-        # Run parallel searches
-        dense_results = await self.dense_search(query, document_type, limit * 3)
-        sparse_results = await self.sparse_search(query, document_type, limit * 3)
-
-        # Fuse using Reciprocal Rank Fusion (RRF)
-        fused_results = self._reciprocal_rank_fusion(
-            dense_results, sparse_results, k=60
+    async def hybrid_search_with_metadata(self, query: str, document_type: DocumentTypes = None,
+                                          limit: int = 10,
+                                          query_embedding: Optional[np.ndarray] = None
+                                          ) -> Tuple[List[SearchResult], Dict[str, Any]]:
+        """
+        Run dense and sparse retrieval concurrently and fuse them with RRF.
+
+        BM25 scoring starts together with the query embedding (pass
+        query_embedding when the caller has already embedded the query).
+        Each leg has its own timeout, which covers the search but not the
+        embedding; a leg that times out is abandoned, though its worker
+        thread runs to completion. If one leg times out or fails, the other
+        leg's results are fused on their own. Chroma runs one call at a time
+        per client, so the sparse leg only fetches the hits the dense leg
+        did not return.
+
+        Returns:
+            (fused results scored by normalised RRF in [0, 1], {"retrieval": {"dense": {...}, "sparse": {...}}, "fusion": {"top_score": ...}})
+        """
+        searches = await self._hybrid_search(
+            [query], query_embedding if query_embedding is None else np.asarray(query_embedding).reshape(1, -1),
+            document_type, limit
         )
+        return searches[0]
 
-        return fused_results[:limit]
-
-    async def dense_search(self, query: str, document_type: DocumentType = None,
-                          limit: int = 10) -> List[SearchResult]:
-        """Semantic search using embeddings"""
-        query_embedding = await self.embedding_service.get_embeddings([query])
+    async def hybrid_search_many(self, queries: List[str], query_embeddings: np.ndarray,
+                                 document_type: DocumentTypes = None,
+                                 limit: int = 10) -> List[Tuple[List[SearchResult], Dict[str, Any]]]:
+        """
+        Hybrid search for several queries at once
 
-        # Build filter if document_type is specified
-        where_filter = {}
-        if document_type:
-            where_filter = {"document_type": document_type.value}
+        The dense leg is one multi-query Chroma call per partition and the
+        sparse leg one thread hop for all BM25 lookups; fusion is per query. Keep batches
+        moderate (tens of queries) so the per-leg timeouts still apply.
 
+        Returns:
+            [(fused results, retrieval metadata)] in query order
+        """
+        searches = await self._hybrid_search(queries, query_embeddings, document_type, limit)
+        for _, metadata in searches:
+            for leg in metadata["retrieval"].values():
+                leg["batch_size"] = len(queries)
+        return searches
+
+    async def _hybrid_search(self, queries: List[str], query_embeddings: Optional[np.ndarray],
+                             document_type: DocumentTypes,
+                             limit: int) -> List[Tuple[List[SearchResult], Dict[str, Any]]]:
+        candidates = limit * settings.RETRIEVAL_CANDIDATE_MULTIPLIER
+        sparse_leg = asyncio.create_task(self._run_leg(
+            "sparse", asyncio.to_thread(self._bm25_search_many, queries, document_type, candidates),
+            settings.SPARSE_SEARCH_TIMEOUT
+        ))
+
+        dense_lists: List[List[SearchResult]] = []
         try:
-            results = self.collection.query(
-                query_embeddings=query_embedding,
-                n_results=limit,
-                where=where_filter,
-                include=["documents", "metadatas", "distances"]
+            if query_embeddings is None:
+                query_embeddings = await self.embedding_service.get_embeddings(queries)
+        except Exception as e:
+            logger.error("Error embedding queries for dense search: %s", e)
+            dense_stats = {"status": "error", "latency_ms": 0.0, "results": 0}
+        else:
+            dense_lists, dense_stats = await self._run_leg(
+                "dense", self.dense_search_many(query_embeddings, document_type, candidates),
+                settings.DENSE_SEARCH_TIMEOUT
             )
-
-            search_results = []
-            for i in range(len(results['ids'][0])):
-                chunk = DocumentChunk(
-                    id=results['ids'][0][i],
-                    content=results['documents'][0][i],
-                    metadata=results['metadatas'][0][i],
-                    document_type=DocumentType(results['metadatas'][0][i].get('document_type', 'scholarship')),
-                    source=results['metadatas'][0][i].get('source', 'unknown')
-                )
-                score = 1 - results['distances'][0][i]  # Convert distance to similarity score
-                search_results.append(SearchResult(chunk=chunk, score=score, source=chunk.source))
-
-            return search_results
-
+        dense_lists = dense_lists or [[] for _ in queries]
+
+        all_hits, sparse_stats = await sparse_leg
+        all_hits = all_hits or [[] for _ in queries]
+
+        with stage("fusion"):
+            fused_lists = [
+                self._reciprocal_rank_fusion([result.chunk.id for result in dense_results],
+                                             [chunk_id for chunk_id, _ in hits], k=settings.RRF_K)[:limit]
+                for dense_results, hits in zip(dense_lists, all_hits)
+            ]
+
+        # Only the fused results the dense leg did not return still need their text
+        chunks = {result.chunk.id: result.chunk for results in dense_lists for result in results}
+        missing = list(dict.fromkeys(chunk_id for fused in fused_lists for chunk_id, _ in fused
+                                     if chunk_id not in chunks))
+        if missing:
+            try:
+                with stage("sparse_fetch"):
+                    chunks.update(await asyncio.wait_for(
+                        self._fetch_chunks(missing), timeout=settings.SPARSE_SEARCH_TIMEOUT
+                    ))
+            except asyncio.TimeoutError:
+                sparse_stats["status"] = "timeout"
+                logger.warning("sparse search timed out fetching chunks after %ss", settings.SPARSE_SEARCH_TIMEOUT)
+            except Exception as e:
+                sparse_stats["status"] = "error"
+                logger.error("Error fetching sparse search chunks: %s", e)
+
+        # The legs' scores are on different scales, so every result reports its RRF
+        # score over the best possible (first in both legs), which is in [0, 1]
+        best_fused = 2 / (settings.RRF_K + 1)
+        searches = []
+        for dense_results, hits, fused in zip(dense_lists, all_hits, fused_lists):
+            fused_results = [
+                SearchResult(chunk=chunks[chunk_id], score=round(fused_score / best_fused, 4),
+                             source=chunks[chunk_id].source)
+                for chunk_id, fused_score in fused if chunk_id in chunks
+            ]
+            metadata = {
+                "retrieval": {
+                    "dense": {**dense_stats, "results": len(dense_results)},
+                    "sparse": {**sparse_stats, "results": len(hits)},
+                },
+                "fusion": {"top_score": fused_results[0].score if fused_results else 0.0},
+            }
+            searches.append((fused_results, metadata))
+        return searches
+
+    async def _run_leg(self, name: str, leg: Awaitable[List[SearchResult]],
+                       timeout: float) -> Tuple[List[SearchResult], Dict[str, Any]]:
+        """Await one retrieval leg with a timeout, never raising"""
+        started = time.perf_counter()
+        status = "ok"
+        results: List[SearchResult] = []
+        try:
+            results = await asyncio.wait_for(leg, timeout=timeout)
+        except asyncio.TimeoutError:
+            status = "timeout"
+            logger.warning("%s search timed out after %ss", name, timeout)
         except Exception as e:
-            print(f"Error in dense search: {e}")
+            status = "error"
+            logger.error("Error in %s search: %s", name, e)
+
+        elapsed = time.perf_counter() - started
+        observe_stage(f"{name}_search", elapsed)
+        return results, {
+            "status": status,
+            "latency_ms": round(elapsed * 1000, 2),
+            "results": len(results),
+        }
+
+    async def dense_search(self, query: str, document_type: DocumentTypes = None,
+                          limit: int = 10,
+                          query_embedding: Optional[np.ndarray] = None) -> List[SearchResult]:
+        """Semantic search using embeddings"""
+        if query_embedding is None:
+            query_embedding = (await self.embedding_service.get_embeddings([query]))[0]
+        try:
+            return (await self.dense_search_many(np.asarray(query_embedding).reshape(1, -1), document_type, limit))[0]
+        except Exception as e:
+            logger.error("Error in dense search: %s", e)
             return []
 
-    async def sparse_search(self, query: str, document_type: DocumentType = None,
-                           limit: int = 10) -> List[SearchResult]:
-        """Keyword-based search using BM25-style ranking"""
-
-        # Extract key terms from query
-        key_terms = self._extract_key_terms(query)
-
-        # Build filter for document type
-        where_filter = {}
-        if document_type:
-            where_filter = {"document_type": document_type.value}
-
-        try:
-            # Use Chroma's built-in text search capabilities
-            results = self.collection.query(
-                query_texts=[query],  # This enables text-based search
-                n_results=limit * 2,  # Get more results for better ranking
-                where=where_filter,
-                include=["documents", "metadatas", "distances"]
-            )
+    async def dense_search_many(self, query_embeddings: np.ndarray, document_type: DocumentTypes = None,
+                                limit: int = 10) -> List[List[SearchResult]]:
+        """Semantic search for several query embeddings (one float32 row each), one query per partition"""
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        # Chroma calls block, so keep them off the event loop; partitions are searched concurrently
+        per_partition = await asyncio.gather(*(
+            asyncio.to_thread(self._dense_search_partition, partition, query_embeddings, limit)
+            for partition in self._partitions(document_type)
+        ))
+        if len(per_partition) == 1:
+            return per_partition[0]
+
+        # Scores share one scale across partitions, so the merge is a plain top-limit per query
+        return [
+            sorted((result for lists in per_partition for result in lists[query]),
+                   key=lambda result: result.score, reverse=True)[:limit]
+            for query in range(len(query_embeddings))
+        ]
+
+    def _dense_search_partition(self, partition: DocumentType, query_embeddings: np.ndarray,
+                                limit: int) -> List[List[SearchResult]]:
+        index = self.indexes.get(partition)
+        if index is not None:
+            return self._index_search_many(index, query_embeddings, limit)
+
+        results = self.collections[partition].query(
+            query_embeddings=query_embeddings,
+            n_results=limit,
+            include=["documents", "metadatas", "distances"]
+        )
 
+        all_results = []
+        for ids, documents, metadatas, distances in zip(
+                results['ids'], results['documents'], results['metadatas'], results['distances']):
             search_results = []
-            for i in range(len(results['ids'][0])):
-                chunk = DocumentChunk(
-                    id=results['ids'][0][i],
-                    content=results['documents'][0][i],
-                    metadata=results['metadatas'][0][i],
-                    document_type=DocumentType(results['metadatas'][0][i].get('document_type', 'scholarship')),
-                    source=results['metadatas'][0][i].get('source', 'unknown')
-                )
-
-                # Calculate BM25-style score based on term frequency
-                bm25_score = self._calculate_bm25_score(chunk.content, key_terms)
-                score = min(bm25_score, 1.0)  # Normalize to 0-1
-
+            for chunk_id, document, metadata, distance in zip(ids, documents, metadatas, distances):
+                chunk = self._chunk_from_record(chunk_id, document, metadata)
+                score = 1 - distance  # Convert distance to similarity score
+                search_results.append(SearchResult(chunk=chunk, score=score, source=chunk.source))
+            all_results.append(search_results)
+        return all_results
+
+    def _index_search_many(self, index: InMemoryVectorIndex, query_embeddings: np.ndarray,
+                           limit: int) -> List[List[SearchResult]]:
+        """Dense search against a partition's in-memory index"""
+        all_results = []
+        for hits in index.search_many(query_embeddings, limit=limit):
+            search_results = []
+            for chunk_id, cosine, document, metadata in hits:
+                chunk = self._chunk_from_record(chunk_id, document, metadata)
+                # Same scale as the Chroma path: 1 - squared L2 distance of unit vectors
+                score = 2 * cosine - 1
                 search_results.append(SearchResult(chunk=chunk, score=score, source=chunk.source))
+            all_results.append(search_results)
+        return all_results
 
-            # Sort by BM25 score
-            search_results.sort(key=lambda x: x.score, reverse=True)
-            return search_results[:limit]
+    async def sparse_search(self, query: str, document_type: DocumentTypes = None,
+                           limit: int = 10) -> List[SearchResult]:
+        """Keyword search using the BM25 inverted index"""
+        return (await self.sparse_search_many([query], document_type, limit))[0]
 
-        except Exception as e:
-            print(f"Error in sparse search: {e}")
-            return []
+    async def sparse_search_many(self, queries: List[str], document_type: DocumentTypes,
+                                 limit: int) -> List[List[SearchResult]]:
+        all_hits = await asyncio.to_thread(self._bm25_search_many, queries, document_type, limit)
+        hit_ids = list(dict.fromkeys(chunk_id for hits in all_hits for chunk_id, _ in hits))
+        if not hit_ids:
+            return [[] for _ in queries]
 
-    def _reciprocal_rank_fusion(self, results_a: List[SearchResult],
-                               results_b: List[SearchResult], k: int = 60) -> List[SearchResult]:
-        """Fuse two ranked lists using Reciprocal Rank Fusion"""
-        scores = {}
+        try:
+            chunks = await self._fetch_chunks(hit_ids)
+            all_results = []
+            for hits in all_hits:
+                search_results = []
+                for chunk_id, bm25_score in hits:
+                    if chunk_id not in chunks:
+                        continue
+                    chunk = chunks[chunk_id]
+                    score = bm25_score / hits[0][1]  # Normalize to 0-1
+                    search_results.append(SearchResult(chunk=chunk, score=score, source=chunk.source))
+                all_results.append(search_results)
+            return all_results
 
-        # Score first list
-        for rank, result in enumerate(results_a):
-            scores[result.chunk.id] = scores.get(result.chunk.id, 0) + 1 / (k + rank + 1)
+        except Exception as e:
+            logger.error("Error in sparse search: %s", e)
+            return [[] for _ in queries]
 
-        # Score second list
-        for rank, result in enumerate(results_b):
-            scores[result.chunk.id] = scores.get(result.chunk.id, 0) + 1 / (k + rank + 1)
+    async def _fetch_chunks(self, ids: List[str]) -> Dict[str, DocumentChunk]:
+        """
+        Chunk text/metadata for BM25 hits, fetched only from the partitions
+        they are stored in - no query embedding needed
+        """
+        ids_by_type: Dict[DocumentType, List[str]] = {}
+        for chunk_id, type_name in zip(ids, self.bm25_index.document_types(ids)):
+            if type_name is not None:
+                ids_by_type.setdefault(DocumentType(type_name), []).append(chunk_id)
+        found = await asyncio.gather(*(
+            asyncio.to_thread(self.collections[partition].get, ids=partition_ids, include=["documents", "metadatas"])
+            for partition, partition_ids in ids_by_type.items()
+        ))
+        return {
+            chunk_id: self._chunk_from_record(chunk_id, document, metadata)
+            for records in found
+            for chunk_id, document, metadata in zip(records['ids'], records['documents'], records['metadatas'])
+        }
+
+    def _bm25_search_many(self, queries: List[str], document_type: DocumentTypes,
+                          limit: int) -> List[List[Tuple[str, float]]]:
+        self._ensure_bm25_index()
+        type_names = None if document_type is None else [t.value for t in self._partitions(document_type)]
+        return [self.bm25_index.search(query, limit=limit, document_type=type_names) for query in queries]
+
+    def _ensure_bm25_index(self):
+        """Build the BM25 index from the partitions if it was never built (e.g. existing DB)"""
+        if self._bm25_bootstrapped:
+            return
+        # Concurrent callers wait for the build instead of searching an empty index
+        with self._bm25_bootstrap_lock:
+            if self._bm25_bootstrapped:
+                return
+            if not len(self.bm25_index) and self.count():
+                logger.info("Building BM25 index from existing collections")
+                ids, documents, document_types = [], [], []
+                for document_type, collection in self.collections.items():
+                    records = collection.get(include=["documents"])
+                    ids.extend(records['ids'])
+                    documents.extend(records['documents'])
+                    document_types.extend([document_type.value] * len(records['ids']))
+                self.bm25_index.rebuild(ids, documents, document_types)
+                logger.info("BM25 index built with %d chunks", len(self.bm25_index))
+            # Only once the build succeeded; a failed build is retried by the next caller
+            self._bm25_bootstrapped = True
+
+    def _chunk_from_record(self, chunk_id: str, document: str, metadata: dict) -> DocumentChunk:
+        return DocumentChunk(
+            id=chunk_id,
+            content=document,
+            metadata=metadata,
+            document_type=self._document_type_of(metadata),
+            source=metadata.get('source', 'unknown')
+        )
 
-        # Get all unique chunks
-        all_chunks = {result.chunk.id: result for result in results_a + results_b}
+    @staticmethod
+    def _reciprocal_rank_fusion(ranked_a: List[str], ranked_b: List[str],
+                                k: int = 60) -> List[Tuple[str, float]]:
+        """Fuse two ranked id lists using Reciprocal Rank Fusion; (id, fused score) best first"""
+        scores: Dict[str, float] = {}
+        for ranked in (ranked_a, ranked_b):
+            for rank, chunk_id in enumerate(ranked):
+                scores[chunk_id] = scores.get(chunk_id, 0) + 1 / (k + rank + 1)
 
         # Sort by fused score
-        sorted_ids = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-
-        return [all_chunks[chunk_id] for chunk_id, _ in sorted_ids]
-
-    def _extract_key_terms(self, query: str) -> List[str]:
-        """Extract key terms from query for sparse search"""
-        # Simple term extraction - split and filter
-        terms = query.lower().split()
-        # Remove common stop words and short terms
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'can', 'shall'}
-        key_terms = [term for term in terms if len(term) > 2 and term not in stop_words]
-        return key_terms[:5]  # Limit to top 5 terms
-
-    def _calculate_bm25_score(self, text: str, key_terms: List[str]) -> float:
-        """Calculate BM25-style score for text given key terms"""
-        text_lower = text.lower()
-        score = 0.0
-
-        for term in key_terms:
-            # Simple term frequency
-            tf = text_lower.count(term)
-            if tf > 0:
-                # BM25-like scoring: tf / (tf + k1) where k1=1.5
-                score += tf / (tf + 1.5)
-
-        # Normalize by document length (shorter docs get slight boost)
-        doc_length_factor = min(len(text.split()) / 100.0, 1.0)
-        score = score * (1 + doc_length_factor)
-
-        return score
\ No newline at end of file
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
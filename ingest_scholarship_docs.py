@@ -10,7 +10,9 @@ import sys
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from core.logging_config import configure_logging
 from infrastructure.document_ingestion import DocumentIngestionService
+from infrastructure.ingestion_pipeline import IngestionJob
 from domain import DocumentType
 
 async def main():
@@ -42,24 +44,20 @@ async def main():
     for pdf in pdf_files:
         print(f"   - {pdf}")
 
-    # Ingest each PDF
-    total_chunks = 0
-    for pdf_file in pdf_files:
-        file_path = os.path.join(scholarship_dir, pdf_file)
-        source_name = os.path.splitext(pdf_file)[0]  # Remove .pdf extension
-
-        try:
-            chunks_count = await ingestion_service.ingest_document(
-                file_path=file_path,
-                source_name=source_name,
-                document_type=DocumentType.SCHOLARSHIP
-            )
-            total_chunks += chunks_count
-        except Exception as e:
-            print(f"Error ingesting {pdf_file}: {e}")
+    # Ingest all PDFs through the parallel pipeline
+    jobs = [
+        IngestionJob(
+            file_path=os.path.join(scholarship_dir, pdf_file),
+            source_name=os.path.splitext(pdf_file)[0],  # Remove .pdf extension
+            document_type=DocumentType.SCHOLARSHIP
+        )
+        for pdf_file in pdf_files
+    ]
+    total_chunks = await ingestion_service.ingest_files(jobs)
 
     print(f"\nIngestion complete! Total chunks stored: {total_chunks}")
     print("You can now query the vector database through your FastAPI endpoints!")
 
 if __name__ == "__main__":
+    configure_logging()
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Ingestion worker: runs the jobs queued by POST /admin/ingest-documents.
+
+Ingestion needs the document parsers, a Chroma writer and the embedding
+model for whole documents, so it runs in this process rather than in the
+API workers. Run one worker, because Chroma has a single writer:
+
+    python ingestion_worker.py                    # run queued jobs until interrupted
+    python ingestion_worker.py --once             # run the jobs queued now, then exit
+    python ingestion_worker.py --enqueue --force  # queue a job from the shell
+"""
+
+import time
+
+_import_started = time.perf_counter()
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from typing import Any, Dict, List
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.logging_config import configure_logging
+from domain import DocumentType
+from infrastructure.document_ingestion import DocumentIngestionService
+from infrastructure.ingestion_queue import IngestionQueue
+from infrastructure.model_registry import current_rss_bytes
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+logger = logging.getLogger("ingestion_worker")
+
+DOCUMENT_DIRECTORIES = [
+    ("./data/raw_documents/scholarships", DocumentType.SCHOLARSHIP),
+    ("./data/raw_documents/admission", DocumentType.ADMISSION),
+]
+# Seconds between progress writes while a job runs
+PROGRESS_INTERVAL = 1.0
+# Seconds a blocking wait for the next job lasts before it is renewed
+POLL_TIMEOUT = 5.0
+
+
+async def run_job(service: DocumentIngestionService, queue: IngestionQueue, job: Dict[str, Any]):
+    """Ingest every document directory, publishing per-file progress on the job"""
+    await queue.update(job, status="running", started_at=time.time())
+    logger.info("Running ingestion job %s", job["id"], extra={"force": job["force"]})
+    finished_files: List[Dict[str, Any]] = []
+
+    async def publish_progress():
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            await queue.update(job, files=finished_files + service.progress())
+
+    reporter = asyncio.create_task(publish_progress())
+    chunks = 0
+    error = None
+    try:
+        for directory, document_type in DOCUMENT_DIRECTORIES:
+            chunks += await service.ingest_directory(directory, document_type, force=job["force"])
+            finished_files.extend(service.progress())
+            service.current_pipeline = None
+    except Exception as e:
+        logger.exception("Ingestion job %s failed: %s", job["id"], e)
+        error = str(e)
+    finally:
+        reporter.cancel()
+
+    if error is None:
+        await queue.finish(job, "done", chunks=chunks, files=finished_files)
+        logger.info("Ingestion job %s complete: %d chunks stored", job["id"], chunks)
+    else:
+        await queue.finish(job, "failed", error=error, files=finished_files + service.progress())
+
+
+async def work(once: bool):
+    queue = IngestionQueue()
+    try:
+        await queue.requeue_interrupted()
+        service = DocumentIngestionService()
+        logger.info("Ingestion worker ready (imports %.2fs, RSS %.0f MB)",
+                    IMPORT_SECONDS, current_rss_bytes() / 2 ** 20)
+        while True:
+            job = await queue.take(timeout=None if once else POLL_TIMEOUT)
+            if job is not None:
+                await run_job(service, queue, job)
+            elif once:
+                break
+    finally:
+        await queue.close()
+
+
+async def enqueue(force: bool):
+    queue = IngestionQueue()
+    try:
+        job = await queue.enqueue(force)
+        print(f"Queued ingestion job {job['id']}")
+    finally:
+        await queue.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    parser.add_argument("--enqueue", action="store_true", help="queue a job instead of running jobs")
+    parser.add_argument("--force", action="store_true", help="with --enqueue: re-process unchanged files")
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.enqueue:
+        asyncio.run(enqueue(args.force))
+    else:
+        asyncio.run(work(args.once))
+
+
+if __name__ == "__main__":
+    main()
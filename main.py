@@ -1,14 +1,45 @@
+import time
+
+_import_started = time.perf_counter()
+
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 from core.config import settings
+from core.logging_config import configure_logging
+
+# Before the app modules are imported, so anything they log uses the configured format
+configure_logging()
+
+from infrastructure.metrics import MetricsMiddleware, render_metrics
+from infrastructure.model_registry import current_rss_bytes
+from presentation.dependencies import start_services, startup_report, stop_services
 from presentation.scholarship.routes import router as scholarship_router
 from presentation.admin.routes import router as admin_router
 
+# Kept low by importing parsers and models lazily; reported by GET /ready
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Uvicorn only starts accepting connections once this returns
+    await start_services()
+    startup_report["process"] = {
+        "pid": os.getpid(),
+        "import_seconds": round(IMPORT_SECONDS, 3),
+        "rss_mb": round(current_rss_bytes() / 2 ** 20, 1),
+    }
+    yield
+    await stop_services()
+
 app = FastAPI(
     title="UMS AI Assistant",
     description="Intelligent University Assistant for Admissions, Scholarships, Masters Programs, and Registration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -19,10 +50,27 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Request latency per endpoint (and the endpoint label of the stage timings)
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(scholarship_router, prefix="/scholarship", tags=["Scholarship"])
 app.include_router(admin_router, prefix="/admin", tags=["Admin"])
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Latency histograms per endpoint and per RAG stage, in the Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health", include_in_schema=False)
+async def health():
+    """Liveness: the process is up"""
+    return {"status": "ok"}
+
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    """Readiness: 200 once the models, stores and caches are warm, 503 before (and during shutdown)"""
+    return JSONResponse(startup_report, status_code=200 if startup_report["ready"] else 503)
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
@@ -1,36 +1,56 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from infrastructure.document_ingestion import DocumentIngestionService
-from domain import DocumentType
-import os
+from fastapi import APIRouter, Depends, HTTPException
+from infrastructure.ingestion_queue import IngestionQueue
+from infrastructure.model_registry import model_registry
+from presentation.dependencies import get_ingestion_queue
+import asyncio
+import logging
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
 
 # Initialize the API router for admin routes
 router = APIRouter()
 
-# Initialize the document ingestion service instance
-ingestion_service = DocumentIngestionService()
+def _job_summary(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in job.items() if key != "files"}
+
+@router.post("/ingest-documents", status_code=202)
+async def ingest_documents(force: bool = False, queue: IngestionQueue = Depends(get_ingestion_queue)):
+    """Admin endpoint to queue document ingestion for ingestion_worker.py (only changed files are re-processed unless force=true)"""
+    try:
+        job = await queue.enqueue(force)
+    except Exception as e:
+        logger.exception("Could not queue ingestion: %s", e)
+        raise HTTPException(status_code=503, detail=f"Could not queue ingestion: {e}")
+    return {"message": "Document ingestion queued", "job_id": job["id"]}
 
-@router.post("/ingest-documents")
-async def ingest_documents(background_tasks: BackgroundTasks):
-    """Admin endpoint to trigger document ingestion"""
-    background_tasks.add_task(run_ingestion)
-    return {"message": "Document ingestion started in background"}
+@router.get("/ingestion/progress")
+async def get_ingestion_progress(queue: IngestionQueue = Depends(get_ingestion_queue)):
+    """Status and per-file progress of the latest ingestion job"""
+    jobs = await queue.recent(1)
+    if not jobs:
+        return {"job": None, "files": []}
+    return {"job": _job_summary(jobs[0]), "files": jobs[0].get("files", [])}
 
-async def run_ingestion():
-    """
-    Background task to execute the document ingestion process.
+@router.get("/ingestion/jobs")
+async def list_ingestion_jobs(queue: IngestionQueue = Depends(get_ingestion_queue)):
+    """Latest ingestion jobs first"""
+    return {"jobs": [_job_summary(job) for job in await queue.recent()]}
 
-    This function ingests all documents in the scholarships and admission directories.
-    """
-    try:
-        # Ingest all documents in the scholarships directory
-        scholarships_dir = "./data/raw_documents/scholarships"
-        await ingestion_service.ingest_directory(scholarships_dir, DocumentType.SCHOLARSHIP)
+@router.get("/ingestion/jobs/{job_id}")
+async def get_ingestion_job(job_id: str, queue: IngestionQueue = Depends(get_ingestion_queue)):
+    job = await queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
 
-        # Ingest all documents in the admission directory
-        admission_dir = "./data/raw_documents/admission"
-        await ingestion_service.ingest_directory(admission_dir, DocumentType.ADMISSION)
+@router.get("/models")
+async def get_loaded_models():
+    """Load time and memory footprint of the models held by this worker"""
+    return {"models": model_registry.stats()}
 
-        print("✅ Ingestion completed!")
-    except Exception as e:
-        # Log any exceptions that occur during ingestion
-        print(f"❌ Ingestion failed: {e}")
\ No newline at end of file
+@router.post("/models/warm-up")
+async def warm_up_models():
+    """Load the configured embedding model now instead of on first use"""
+    models = await asyncio.to_thread(model_registry.warm_up)
+    return {"models": models}
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+
+from application.scholarship.scholarship_service import ScholarshipService
+from core.config import settings
+from infrastructure.ingestion_queue import IngestionQueue
+from infrastructure.llm_service import LLMService, close_shared_http_client
+from infrastructure.model_registry import model_registry
+from infrastructure.vector_store_service import VectorStoreService
+
+logger = logging.getLogger(__name__)
+
+_scholarship_service: Optional[ScholarshipService] = None
+_ingestion_queue: Optional[IngestionQueue] = None
+
+# What GET /ready reports: filled in by start_services()
+startup_report: Dict[str, Any] = {"ready": False, "steps": {}}
+
+
+def get_scholarship_service() -> ScholarshipService:
+    """The worker's ScholarshipService (FastAPI dependency)"""
+    if _scholarship_service is None:
+        raise HTTPException(status_code=503, detail="Service is starting")
+    return _scholarship_service
+
+
+def get_ingestion_queue() -> IngestionQueue:
+    """Queue of the ingestion worker (FastAPI dependency); the API only enqueues jobs and reads their status"""
+    if _ingestion_queue is None:
+        raise HTTPException(status_code=503, detail="Service is starting")
+    return _ingestion_queue
+
+
+def _load_models():
+    model_registry.get(settings.EMBEDDING_PROVIDER, settings.EMBEDDING_MODEL, settings.EMBEDDING_DEVICE)
+    if settings.RERANKER_ENABLED:
+        try:
+            model_registry.get("cross-encoder", settings.RERANKER_MODEL, settings.RERANKER_DEVICE)
+        except Exception as e:
+            # Reranking is best effort; the reranker retries (and disables itself) on first use
+            logger.warning("Could not load reranker %s at startup: %s", settings.RERANKER_MODEL, e)
+
+
+async def _timed(name: str, call):
+    started = time.perf_counter()
+    result = await call
+    startup_report["steps"][name] = {"seconds": round(time.perf_counter() - started, 3)}
+    return result
+
+
+async def start_services():
+    """
+    Build and warm the shared services before the worker accepts traffic
+
+    The models, the vector store (Chroma client, BM25 and in-memory
+    indexes) and the LLM clients are initialised in parallel threads, then
+    ScholarshipService.warm_up() runs a query through retrieval and primes
+    the caches with the most-asked questions. Failing to build a service
+    fails startup, as an import-time error did before.
+    """
+    global _scholarship_service, _ingestion_queue
+    started = time.perf_counter()
+    _ingestion_queue = IngestionQueue()
+
+    loads = [
+        _timed("vector_store", asyncio.to_thread(VectorStoreService)),
+        _timed("llm_client", asyncio.to_thread(LLMService)),
+    ]
+    if settings.STARTUP_WARMUP_ENABLED:
+        loads.append(_timed("models", asyncio.to_thread(_load_models)))
+    vector_store, llm_service, *_ = await asyncio.gather(*loads)
+    service = ScholarshipService(llm_service=llm_service, vector_store=vector_store)
+
+    if settings.STARTUP_WARMUP_ENABLED:
+        startup_report["steps"].update(
+            await service.warm_up(settings.STARTUP_WARMUP_QUERY, settings.STARTUP_REPLAY_TOP_N)
+        )
+
+    _scholarship_service = service
+    startup_report["seconds"] = round(time.perf_counter() - started, 3)
+    startup_report["ready"] = True
+    logger.info("Ready to serve after %.2fs", startup_report["seconds"], extra={"steps": startup_report["steps"]})
+
+
+async def stop_services():
+    global _scholarship_service, _ingestion_queue
+    startup_report["ready"] = False
+    if _scholarship_service is not None:
+        await _scholarship_service.cache_service.close()
+        _scholarship_service = None
+    if _ingestion_queue is not None:
+        await _ingestion_queue.close()
+        _ingestion_queue = None
+    await close_shared_http_client()
@@ -1,26 +1,78 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any
+import json
+import logging
 from application.scholarship.scholarship_service import ScholarshipService
-from domain import ChatRequest, ChatResponse, EligibilityRequest, EligibilityResponse
+from core.config import settings
+from domain import BatchChatRequest, ChatRequest, ChatResponse, EligibilityRequest, EligibilityResponse
+from presentation.dependencies import get_scholarship_service
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
-scholarship_service = ScholarshipService()
 
 @router.post("/ask", response_model=ChatResponse, description="Ask a question about scholarships and get AI-powered answers with sources")
-async def ask_scholarship_question(request: ChatRequest):
+async def ask_scholarship_question(request: ChatRequest, scholarship_service: ScholarshipService = Depends(get_scholarship_service)):
     try:
-        print(f"   ❓ Question Received: {request.question}")
+        logger.info("Question received: %s", request.question)
         response = await scholarship_service.ask_question(request.question)
         return ChatResponse(
             answer=response.answer,
             sources=[source.source for source in response.sources],
-            confidence=response.confidence
+            confidence=response.confidence,
+            metadata=response.metadata
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/ask/stream", description="Ask a question and receive the sources, then the answer tokens, as Server-Sent Events")
+async def ask_scholarship_question_stream(request: ChatRequest, scholarship_service: ScholarshipService = Depends(get_scholarship_service)):
+    logger.info("Streaming question received: %s", request.question)
+
+    async def event_stream():
+        try:
+            async for event in scholarship_service.ask_question_stream(request.question):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        except Exception as e:
+            # Headers are already sent, so errors are reported in-band
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/ask/batch", description="Answer many questions in one request; results are streamed as NDJSON lines as each completes")
+async def ask_scholarship_questions_batch(request: BatchChatRequest, scholarship_service: ScholarshipService = Depends(get_scholarship_service)):
+    if len(request.questions) > settings.ASK_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.ASK_BATCH_MAX_QUESTIONS} questions per batch")
+    logger.info("Batch of %d questions received", len(request.questions))
+
+    async def ndjson_lines():
+        try:
+            async for item in scholarship_service.ask_many(request.questions):
+                payload = {"index": item["index"], "question": item["question"]}
+                if "error" in item:
+                    payload["error"] = item["error"]
+                else:
+                    response = item["response"]
+                    payload.update(ChatResponse(
+                        answer=response.answer,
+                        sources=[source.source for source in response.sources],
+                        confidence=response.confidence,
+                        metadata=response.metadata
+                    ).dict())
+                yield json.dumps(payload) + "\n"
+        except Exception as e:
+            # Headers are already sent, so errors are reported in-band
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 @router.post("/check-eligibility", response_model=EligibilityResponse, description="Check student eligibility for scholarships based on provided criteria")
-async def check_eligibility(request: EligibilityRequest):
+async def check_eligibility(request: EligibilityRequest, scholarship_service: ScholarshipService = Depends(get_scholarship_service)):
     try:
         student_data = {
             "gpa": request.gpa,
@@ -29,7 +81,7 @@ async def check_eligibility(request: EligibilityRequest):
             "nationality": request.nationality,
             "academic_level": request.academic_level
         }
-        result = await scholarship_service.check_eligibility(student_data)
+        result = await scholarship_service.check_eligibility(student_data, explain=request.explain)
         return EligibilityResponse(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -44,6 +96,19 @@ async def get_scholarship_deadlines():
         ]
     }
 
+@router.get("/cache/stats", description="Semantic answer cache, embedding cache and reranker statistics")
+async def get_cache_stats(scholarship_service: ScholarshipService = Depends(get_scholarship_service)):
+    embedding_cache = scholarship_service.vector_store.embedding_service.cache
+    return {
+        "semantic_cache": scholarship_service.semantic_cache.stats(),
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "reranker": scholarship_service.reranker.stats()
+    }
+
+@router.get("/llm/stats", description="LLM requests, errors and latency per provider")
+async def get_llm_stats(scholarship_service: ScholarshipService = Depends(get_scholarship_service)):
+    return scholarship_service.llm_service.stats()
+
 @router.get("/test", description="Test endpoint to verify API functionality")
 async def test_api():
     return {"message": "API is working"}
\ No newline at end of file